@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MIKE21 to Tecplot 转换器 - 派生变量
+在网格上直接计算涡量、散度、弗劳德数等派生变量，以及配置中的自定义表达式
+
+变量按需计算：只有被请求的变量及其依赖才会读取或计算，结果在同一数据集内缓存复用。
+梯度使用按网格预先构建的稀疏梯度算子（单元→节点插值后按三角形线性形函数求导），
+每个时间步只需一次稀疏乘法。
+"""
+
+import ast
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# 重力加速度 (m/s²)
+GRAVITY = 9.81
+
+# 常用变量名到 dfsu 数据项名称的对应关系
+ITEM_ALIASES = {
+    'u': 'U velocity',
+    'v': 'V velocity',
+    'w': 'W velocity',
+    'h': 'Total water depth',
+    'eta': 'Surface elevation',
+    'speed': 'Current speed',
+}
+
+# 派生变量：名称 -> (计算函数, 说明, 依赖的变量, 是否需要网格)，计算函数参数为 VariableContext
+DERIVED_VARIABLES: Dict[str, Tuple[Callable, str, Tuple[str, ...], bool]] = {}
+
+# 表达式中可用的函数与常量
+EXPRESSION_NAMESPACE = {
+    '__builtins__': {},
+    'sqrt': np.sqrt, 'abs': np.abs, 'exp': np.exp, 'log': np.log, 'log10': np.log10,
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'arctan2': np.arctan2, 'degrees': np.degrees,
+    'where': np.where, 'minimum': np.minimum, 'maximum': np.maximum, 'clip': np.clip,
+    'pi': np.pi, 'g': GRAVITY,
+}
+
+# 表达式允许的语法：变量名、常量、算术/比较运算与白名单函数调用（不允许属性访问、下标、关键字参数等）
+_ALLOWED_NODES = (ast.Expression, ast.Name, ast.Load, ast.Constant, ast.BinOp, ast.UnaryOp, ast.Compare,
+                  ast.Call, ast.operator, ast.unaryop, ast.cmpop)
+
+
+@lru_cache(maxsize=None)
+def compile_expression(expression: str, name: str = "expression"):
+    """
+    校验并编译自定义表达式
+
+    Returns:
+        (代码对象, 引用的变量名元组)
+
+    Raises:
+        ValueError: 表达式语法错误，或包含白名单以外的语法与函数
+    """
+    try:
+        tree = ast.parse(expression, f"<{name}>", mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"表达式 {name} 语法错误: {e.msg}")
+    variables = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"表达式 {name} 中不允许使用 {type(node).__name__}: {expression}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"表达式 {name} 中只能使用数值常量: {expression}")
+        if isinstance(node, ast.Call):
+            if not (isinstance(node.func, ast.Name) and callable(EXPRESSION_NAMESPACE.get(node.func.id))):
+                raise ValueError(f"表达式 {name} 中只能调用 "
+                                 f"{', '.join(k for k, v in EXPRESSION_NAMESPACE.items() if callable(v))}: "
+                                 f"{expression}")
+        elif isinstance(node, ast.Name):
+            if node.id.startswith('__'):
+                raise ValueError(f"表达式 {name} 中不允许使用名称 {node.id}")
+            if node.id not in EXPRESSION_NAMESPACE and node.id not in variables:
+                variables.append(node.id)
+    return compile(tree, f"<{name}>", 'eval'), tuple(variables)
+
+
+def register_derived_variable(name: str, description: str = "", requires: Iterable[str] = (),
+                              uses_mesh: bool = False):
+    """
+    注册派生变量的装饰器
+
+    requires 列出计算所依赖的变量，用于确定需要从 dfsu 文件读取的数据项。
+    uses_mesh 表示计算需要完整网格（梯度、床面高程等），此时不能只读取部分单元。
+
+    示例::
+
+        @register_derived_variable('kinetic_energy', "单位质量动能", requires=('u', 'v'))
+        def _kinetic_energy(ctx):
+            return 0.5 * (ctx['u'] ** 2 + ctx['v'] ** 2)
+    """
+    def decorator(func: Callable) -> Callable:
+        DERIVED_VARIABLES[name] = (func, description, tuple(requires), bool(uses_mesh))
+        return func
+    return decorator
+
+
+def _resolve_item(name: str, item_names: List[str]):
+    """变量名对应的数据项名称（别名、原名、下划线代替空格），不存在时返回 None"""
+    for candidate in (ITEM_ALIASES.get(name), name, name.replace('_', ' ')):
+        if candidate in item_names:
+            return candidate
+    return None
+
+
+def _resolve_dependencies(names: Iterable[str], item_names: List[str],
+                          expressions: Dict[str, str] = None) -> Tuple[set, set]:
+    """
+    展开变量的全部依赖
+
+    Returns:
+        (需要读取的数据项名称集合, 用到的派生变量名称集合)
+
+    Raises:
+        ValueError: 变量既不是数据项也不是派生变量或表达式
+    """
+    expressions = expressions or {}
+    needed, used, seen = set(), set(), set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        item = _resolve_item(name, item_names)
+        if name in expressions:
+            for dependency in compile_expression(expressions[name], name)[1]:
+                visit(dependency)
+        elif item is not None:
+            needed.add(item)
+        elif name in DERIVED_VARIABLES:
+            used.add(name)
+            for dependency in DERIVED_VARIABLES[name][2]:
+                visit(dependency)
+        elif name == 'w':
+            visit('u')
+        else:
+            raise ValueError(f"未知变量: {name}（文件中的数据项: {', '.join(item_names)}）")
+
+    for name in names:
+        visit(name)
+    return needed, used
+
+
+def required_items(names: Iterable[str], item_names: List[str], expressions: Dict[str, str] = None) -> List[str]:
+    """
+    计算给定变量所需读取的数据项
+
+    Args:
+        names: 需要的变量名
+        item_names: 文件中的数据项名称
+        expressions: 自定义表达式
+
+    Returns:
+        需要读取的数据项名称，按文件中的顺序排列
+
+    Raises:
+        ValueError: 变量既不是数据项也不是派生变量或表达式
+    """
+    needed, _ = _resolve_dependencies(names, item_names, expressions)
+    return [item for item in item_names if item in needed]
+
+
+def uses_mesh(names: Iterable[str], item_names: List[str], expressions: Dict[str, str] = None) -> bool:
+    """给定变量（含表达式的间接依赖）的计算是否需要完整网格，需要时不能只读取部分单元"""
+    _, used = _resolve_dependencies(names, item_names, expressions)
+    return any(DERIVED_VARIABLES[name][3] for name in used)
+
+
+def gradient_operators(node_xy: np.ndarray, conn: np.ndarray):
+    """
+    三角形单元上的线性梯度算子
+
+    Args:
+        node_xy: 节点坐标，形状 (节点数, 2)
+        conn: 三角形连接表（从0开始），形状 (单元数, 3)
+
+    Returns:
+        (Bx, By)：形状 (单元数, 节点数) 的CSR矩阵，单元梯度 = B @ 节点值
+    """
+    from scipy import sparse
+
+    x, y = node_xy[conn, 0], node_xy[conn, 1]
+    det = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+    det = np.where(det == 0, np.inf, det)
+    # 形函数 N_k 的偏导数
+    dndx = np.column_stack([y[:, 1] - y[:, 2], y[:, 2] - y[:, 0], y[:, 0] - y[:, 1]]) / det[:, np.newaxis]
+    dndy = np.column_stack([x[:, 2] - x[:, 1], x[:, 0] - x[:, 2], x[:, 1] - x[:, 0]]) / det[:, np.newaxis]
+
+    rows = np.repeat(np.arange(len(conn)), 3)
+    shape = (len(conn), len(node_xy))
+    return (sparse.csr_matrix((dndx.ravel(), (rows, conn.ravel())), shape=shape),
+            sparse.csr_matrix((dndy.ravel(), (rows, conn.ravel())), shape=shape))
+
+
+class VariableContext:
+    """
+    单个数据集的变量求值上下文
+
+    ctx['名称'] 依次查找：已计算的缓存、数据项（含 ITEM_ALIASES 别名，下划线可代替空格）、
+    注册的派生变量、配置的自定义表达式。数组形状与数据项一致，(..., 单元数或节点数)。
+    """
+
+    def __init__(self, ds, dtype=None, expressions: Dict[str, str] = None, mesh_loader: Callable = None,
+                 gradient_loader: Callable = None):
+        """
+        Args:
+            ds: mikeio 数据集
+            dtype: 数据项转换的精度，None 表示保持读取时的精度
+            expressions: 自定义表达式，名称 -> 表达式字符串
+            mesh_loader: 返回网格缓存项的函数（水深回退计算时使用）
+            gradient_loader: 参数为数据位置（'cell'/'node'），返回 (Gx, Gy) 梯度算子的函数
+        """
+        self.ds = ds
+        self.dtype = dtype
+        self.expressions = dict(expressions or {})
+        self._mesh_loader = mesh_loader
+        self._gradient_loader = gradient_loader
+        self._values: Dict[str, np.ndarray] = {}
+        self._evaluating = set()
+        self._item_names = [getattr(item, 'name', item) for item in ds.items]
+
+    def _item_name(self, name: str):
+        """变量名对应的数据项名称，不存在时返回 None"""
+        return _resolve_item(name, self._item_names)
+
+    def available(self, name: str) -> bool:
+        """变量能否求值（数据项、派生变量或表达式）"""
+        return (name in self._values or self._item_name(name) is not None or name in DERIVED_VARIABLES
+                or name in self.expressions or name == 'w')
+
+    def __contains__(self, name: str) -> bool:
+        return self.available(name)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name in self._values:
+            return self._values[name]
+        if name in self._evaluating:
+            raise ValueError(f"派生变量 {name} 存在循环引用")
+
+        self._evaluating.add(name)
+        try:
+            item = self._item_name(name)
+            if name in self.expressions:
+                value = eval(compile_expression(self.expressions[name], name)[0], EXPRESSION_NAMESPACE, self)
+            elif item is not None:
+                value = self.ds[item].values
+                if self.dtype is not None:
+                    value = np.asarray(value, dtype=self.dtype)
+            elif name in DERIVED_VARIABLES:
+                value = DERIVED_VARIABLES[name][0](self)
+            elif name == 'w':
+                # 二维模型没有垂向流速
+                value = np.zeros_like(self['u'])
+            else:
+                raise KeyError(name)
+        finally:
+            self._evaluating.discard(name)
+
+        self._values[name] = value
+        return value
+
+    @property
+    def location(self) -> str:
+        """数据位置：'cell' 单元中心 / 'node' 节点"""
+        mesh = self.mesh
+        n_columns = np.shape(self.ds[self._item_names[0]].values)[-1]
+        if n_columns == len(mesh['elem_xy']):
+            return 'cell'
+        if n_columns == len(mesh['node_xy']):
+            return 'node'
+        raise ValueError(f"数据长度 {n_columns} 与网格不匹配")
+
+    @property
+    def mesh(self) -> Dict:
+        if self._mesh_loader is None:
+            raise ValueError("未提供网格，无法计算该派生变量")
+        return self._mesh_loader()
+
+    def gradient(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        计算变量的空间梯度
+
+        Returns:
+            (∂/∂x, ∂/∂y)，形状与输入一致
+        """
+        if self._gradient_loader is None:
+            raise ValueError("未提供梯度算子，无法计算该派生变量")
+        gx, gy = self._gradient_loader(self.location)
+        values = np.asarray(values)
+        n_columns = values.shape[-1]
+        columns = values.reshape(-1, n_columns).T
+        return tuple((g @ columns).T.reshape(values.shape).astype(values.dtype, copy=False) for g in (gx, gy))
+
+
+@register_derived_variable('velocity', "流速大小 √(u²+v²+w²)", requires=('u', 'v', 'w'))
+def _velocity(ctx):
+    return np.sqrt(ctx['u'] ** 2 + ctx['v'] ** 2 + ctx['w'] ** 2)
+
+
+@register_derived_variable('h', "总水深（数据中没有时取水位减去床面高程）", requires=('eta',),
+                           uses_mesh=True)
+def _depth(ctx):
+    if ctx.location != 'cell':
+        raise ValueError("缺少 Total water depth，且节点数据无法由床面高程推算水深")
+    return ctx['eta'] - ctx.mesh['elem_xy'][:, 2].astype(np.asarray(ctx['eta']).dtype)
+
+
+@register_derived_variable('vorticity', "垂向涡量 ∂v/∂x - ∂u/∂y (1/s)", requires=('u', 'v'),
+                           uses_mesh=True)
+def _vorticity(ctx):
+    _, du_dy = ctx.gradient(ctx['u'])
+    dv_dx, _ = ctx.gradient(ctx['v'])
+    return dv_dx - du_dy
+
+
+@register_derived_variable('divergence', "水平散度 ∂u/∂x + ∂v/∂y (1/s)", requires=('u', 'v'),
+                           uses_mesh=True)
+def _divergence(ctx):
+    du_dx, _ = ctx.gradient(ctx['u'])
+    _, dv_dy = ctx.gradient(ctx['v'])
+    return du_dx + dv_dy
+
+
+@register_derived_variable('froude', "弗劳德数 √(u²+v²)/√(g·h)", requires=('u', 'v', 'h'))
+def _froude(ctx):
+    h = np.asarray(ctx['h'])
+    speed = np.sqrt(ctx['u'] ** 2 + ctx['v'] ** 2)
+    wet = h > 0
+    return np.where(wet, speed / np.sqrt(GRAVITY * np.where(wet, h, 1.0)), 0.0).astype(speed.dtype, copy=False)
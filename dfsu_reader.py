@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MIKE21 to Tecplot 转换器 - 内存映射 DFSU 读取
+直接内存映射 dfsu 文件的动态数据区，按数据项/时间步返回零拷贝的 NumPy 视图
+
+文件头、时间轴与网格几何仍由 mikeio 解析，只有动态数据绕过 mikeio 的逐块读取与拷贝。
+动态数据区位于文件末尾，每个时间步的布局为::
+
+    时间步标记 (4字节) + 各数据项 [ 类型标记 (1字节) + 数值个数 (int32) + float32 数值 ]
+
+打开时校验文件大小、每个时间步的标记与每个数据块的数值个数，布局不符
+（分层三维、谱文件、双精度数据项、未写完的文件等）时抛出 UnsupportedLayout，
+调用方回退到 mikeio 读取。
+
+单独运行可对比读取耗时::
+
+    python dfsu_reader.py result.dfsu [重复次数]
+"""
+
+import sys
+import time as _time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+# 每个时间步开头的标记值
+TIMESTEP_TAG = 0xFFC351FE
+# float32 数据块的类型标记
+FLOAT_BLOCK_TAG = 1
+
+
+class UnsupportedLayout(ValueError):
+    """文件的动态数据布局不支持内存映射读取"""
+
+
+def _step_dtype(n_items: int, n_values: int) -> np.dtype:
+    """单个时间步的紧凑结构化类型（无对齐填充）"""
+    fields = [('tag', '<u4')]
+    for i in range(n_items):
+        fields += [(f'type{i}', 'u1'), (f'count{i}', '<i4'), (f'data{i}', '<f4', (n_values,))]
+    return np.dtype(fields)
+
+
+class MemmapDfsu:
+    """
+    内存映射的二维 dfsu 文件
+
+    items / n_timesteps / time / geometry 与 mikeio.open() 返回的对象一致，
+    read() 返回 mikeio.Dataset，其中的数组是映射区的视图（按元素子集或非连续时间步读取时为拷贝）。
+    映射为写时复制模式：删除值（dry 单元等）原地替换为 NaN 时只复制含删除值的内存页，不会修改文件。
+    """
+
+    def __init__(self, path, dfs=None):
+        """
+        Args:
+            path: dfsu 文件路径
+            dfs: 已打开的 mikeio 文件对象，None 时在此打开
+
+        Raises:
+            UnsupportedLayout: 文件布局不支持内存映射读取
+        """
+        import mikeio
+
+        self.path = Path(path)
+        self.dfs = dfs if dfs is not None else mikeio.open(self.path)
+        geometry = self.dfs.geometry
+        if getattr(geometry, 'is_layered', False) or getattr(geometry, 'is_spectral', False):
+            raise UnsupportedLayout(f"{self.path.name}: 仅支持二维 dfsu 文件")
+
+        n_items, n_values, n_steps = len(self.dfs.items), geometry.n_elements, self.dfs.n_timesteps
+        step_dtype = _step_dtype(n_items, n_values)
+        offset = self.path.stat().st_size - n_steps * step_dtype.itemsize
+        if n_steps == 0 or offset <= 0:
+            raise UnsupportedLayout(f"{self.path.name}: 文件大小与 {n_steps} 个时间步不符")
+
+        steps = np.memmap(self.path, dtype=step_dtype, mode='c', offset=offset, shape=(n_steps,))
+        if not (steps['tag'] == TIMESTEP_TAG).all():
+            raise UnsupportedLayout(f"{self.path.name}: 未识别的时间步标记")
+        for i in range(n_items):
+            if not ((steps[f'type{i}'] == FLOAT_BLOCK_TAG).all() and (steps[f'count{i}'] == n_values).all()):
+                raise UnsupportedLayout(f"{self.path.name}: 数据项 {self.dfs.items[i].name} 不是 float32 单元数据")
+
+        self._steps = steps
+        self._delete_value = np.float32(getattr(self.dfs, 'deletevalue', 1e-35))
+
+    @property
+    def items(self):
+        return self.dfs.items
+
+    @property
+    def n_timesteps(self) -> int:
+        return self.dfs.n_timesteps
+
+    @property
+    def time(self):
+        return self.dfs.time
+
+    @property
+    def geometry(self):
+        return self.dfs.geometry
+
+    def _item_index(self, item) -> int:
+        """数据项名称或序号对应的序号"""
+        if isinstance(item, (int, np.integer)):
+            return int(item)
+        names = [it.name for it in self.dfs.items]
+        if item not in names:
+            raise KeyError(f"数据项不存在: {item}")
+        return names.index(item)
+
+    def _mask_deleted(self, values: np.ndarray) -> np.ndarray:
+        """把删除值原地替换为 NaN（与 mikeio 一致），视图只复制含删除值的内存页"""
+        values[values == self._delete_value] = np.nan
+        return values
+
+    def values(self, item) -> np.ndarray:
+        """数据项全部时间步的零拷贝视图，形状 (时间步数, 单元数)"""
+        return self._mask_deleted(self._steps[f'data{self._item_index(item)}'])
+
+    def read(self, items=None, time=None, elements=None, dtype=np.float32, keepdims: bool = False):
+        """
+        读取数据，参数含义与 mikeio 的 Dfsu.read 相同
+
+        Args:
+            items: 数据项名称或序号列表，None 表示全部
+            time: 时间步序号、序号列表或切片，None 表示全部
+            elements: 单元序号，None 表示全部
+            dtype: 数据精度，非 float32 时会拷贝
+            keepdims: 单个时间步/单元时是否保留该维度
+
+        Returns:
+            mikeio.Dataset
+        """
+        import mikeio
+        import pandas as pd
+
+        if items is None:
+            item_indices = list(range(len(self.dfs.items)))
+        else:
+            item_indices = [self._item_index(item) for item in ([items] if isinstance(items, (str, int)) else items)]
+
+        # 连续时间步用切片，保持视图
+        squeeze_time = isinstance(time, (int, np.integer)) and not keepdims
+        if time is None:
+            time_key = slice(None)
+        elif isinstance(time, (int, np.integer)):
+            time_key = slice(int(time) % self.n_timesteps, int(time) % self.n_timesteps + 1)
+        elif isinstance(time, slice):
+            time_key = time
+        else:
+            time_key = np.arange(self.n_timesteps)[np.asarray(time)]
+            if len(time_key) and (np.diff(time_key) == 1).all():
+                time_key = slice(int(time_key[0]), int(time_key[-1]) + 1)
+        times = pd.DatetimeIndex(self.dfs.time)[time_key]
+
+        geometry = self.dfs.geometry
+        if elements is not None:
+            elements = np.atleast_1d(np.asarray(elements))
+            geometry = geometry.isel(elements, keepdims=keepdims)
+
+        data_arrays = []
+        for index in item_indices:
+            values = self._steps[f'data{index}'][time_key]
+            if elements is not None:
+                values = values[:, elements]
+                if len(elements) == 1 and not keepdims:
+                    values = values[:, 0]
+            values = self._mask_deleted(values)
+            if squeeze_time:
+                values = values[0]
+            if dtype is not None and np.dtype(dtype) != values.dtype:
+                values = values.astype(dtype)
+            data_arrays.append(mikeio.DataArray(data=values, time=times[0] if squeeze_time else times,
+                                                geometry=geometry, item=self.dfs.items[index]))
+        return mikeio.Dataset(data_arrays)
+
+
+def open_dfsu(path, dfs=None, logger=None):
+    """
+    尝试以内存映射方式打开 dfsu 文件，布局不支持时返回 mikeio 的文件对象
+
+    Args:
+        path: dfsu 文件路径
+        dfs: 已打开的 mikeio 文件对象
+        logger: 记录回退原因的日志对象
+    """
+    import mikeio
+
+    dfs = dfs if dfs is not None else mikeio.open(path)
+    try:
+        return MemmapDfsu(path, dfs)
+    except (UnsupportedLayout, OSError, AttributeError) as e:
+        if logger is not None:
+            logger.info(f"ℹ️ 内存映射读取不可用，使用 mikeio 读取: {e}")
+        return dfs
+
+
+def benchmark(path, repeat: int = 3) -> Dict[str, float]:
+    """
+    对比 mikeio.open(...).read() 与内存映射读取的耗时
+
+    两种方式共用文件头与网格的解析（open），单独计时；读取计时包含访问全部数值（求和）的时间，
+    避免内存映射只计算映射本身。
+
+    Returns:
+        {'open': 秒, 'mikeio': 秒, 'memmap': 秒, 'speedup': 倍数}，取多次运行的最短时间
+    """
+    import mikeio
+
+    def run_open():
+        return mikeio.open(path)
+
+    def run_mikeio():
+        return sum(float(np.nansum(da.values)) for da in dfs.read())
+
+    def run_memmap():
+        return sum(float(np.nansum(da.values)) for da in MemmapDfsu(path, dfs).read())
+
+    dfs = mikeio.open(path)
+    results, checks = {}, {}
+    for name, fn in (('open', run_open), ('mikeio', run_mikeio), ('memmap', run_memmap)):
+        best = float('inf')
+        for _ in range(repeat):
+            start = _time.perf_counter()
+            checks[name] = fn()
+            best = min(best, _time.perf_counter() - start)
+        results[name] = best
+    if not np.isclose(checks['mikeio'], checks['memmap'], rtol=1e-5):
+        raise AssertionError(f"读取结果不一致: mikeio={checks['mikeio']}, memmap={checks['memmap']}")
+    results['speedup'] = results['mikeio'] / results['memmap'] if results['memmap'] > 0 else float('inf')
+    return results
+
+
+def main(argv: Optional[list] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("用法: python dfsu_reader.py result.dfsu [重复次数]")
+        return 1
+    path = Path(argv[0])
+    repeat = int(argv[1]) if len(argv) > 1 else 3
+    results = benchmark(path, repeat)
+    size_mb = path.stat().st_size / 1024 / 1024
+    print(f"📊 {path.name} ({size_mb:.1f} MB, 最短 {repeat} 次)")
+    print(f"   mikeio.open() 文件头与网格: {results['open']:.3f}s")
+    print(f"   mikeio read():        {results['mikeio']:.3f}s ({size_mb / max(results['mikeio'], 1e-9):.0f} MB/s)")
+    print(f"   内存映射读取:         {results['memmap']:.3f}s ({size_mb / max(results['memmap'], 1e-9):.0f} MB/s)")
+    print(f"   加速比: {results['speedup']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,445 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MIKE21 to Tecplot 转换器 - 附加输出格式
+VTK (VTU) 与 XDMF+HDF5 写出，供 ParaView 等后处理软件直接读取；
+Parquet 列式写出，供 pandas 等分析工具直接加载
+
+与 Tecplot 写出共用同一份内存中的网格与变量数组，一次读取即可同时输出多种格式。
+所有文件先写入同目录的 .part 文件，完整写完后原子重命名，中断时不会留下不完整的输出。
+可续写的时间序列每个时间步块写成一个完整的数据块文件（.piece），全部完成后合并为最终文件，
+中断后从检查点继续时保留已完成的数据块。
+"""
+
+import contextlib
+import glob
+import json
+import os
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+# VTK 单元类型
+VTK_VERTEX = 1
+VTK_TRIANGLE = 5
+
+
+def part_path(out_path: Path) -> Path:
+    """输出文件写入过程中使用的临时文件路径"""
+    out_path = Path(out_path)
+    return out_path.with_name(out_path.name + '.part')
+
+
+def piece_path(out_path: Path, start: int) -> Path:
+    """可续写时间序列中从时间步 start 开始的数据块文件路径"""
+    out_path = Path(out_path)
+    return out_path.with_name(f"{out_path.name}.{start:06d}.piece")
+
+
+def series_pieces(out_path: Path) -> List[Path]:
+    """时间序列已写完的数据块文件，按起始时间步排序"""
+    out_path = Path(out_path)
+    pieces = out_path.parent.glob(glob.escape(out_path.name) + '.*.piece')
+    return sorted(pieces, key=lambda p: int(p.name[len(out_path.name) + 1:-len('.piece')]))
+
+
+def piece_target(piece: Path) -> Path:
+    """数据块文件所属的最终输出文件路径"""
+    piece = Path(piece)
+    return piece.with_name(piece.name.rsplit('.', 2)[0])
+
+
+@contextlib.contextmanager
+def atomic_output(out_path: Path):
+    """
+    原子写出：产出临时文件路径，正常结束时重命名为 out_path，出错时删除临时文件
+
+    示例::
+
+        with atomic_output(path) as tmp, open(tmp, 'wb') as f:
+            f.write(data)
+    """
+    tmp = part_path(out_path)
+    try:
+        yield tmp
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, out_path)
+
+
+def _vtk_type(array: np.ndarray) -> str:
+    """NumPy 数据类型对应的 VTK 类型名"""
+    return {
+        np.dtype(np.float32): "Float32",
+        np.dtype(np.float64): "Float64",
+        np.dtype(np.int32): "Int32",
+        np.dtype(np.int64): "Int64",
+        np.dtype(np.uint8): "UInt8",
+    }[array.dtype]
+
+
+def write_vtu(out_path: Path, xy: np.ndarray, conn: Optional[np.ndarray],
+              names: List[str], values: np.ndarray, location: str = 'node'):
+    """
+    写出二进制 VTU 文件（appended raw 编码，无 base64 开销）
+
+    Args:
+        out_path: 输出文件路径
+        xy: 点坐标，形状 (点数, 2)
+        conn: 三角形连接表（从0开始），None 表示散点（每个点一个 VTK_VERTEX 单元）
+        names: 变量名
+        values: 变量值，形状 (点数或单元数, 变量数)
+        location: 'node'/'point' 变量位于点上，'cell' 变量位于单元上
+    """
+    n_points = len(xy)
+    points = np.zeros((n_points, 3), dtype=np.float64)
+    points[:, :2] = xy[:, :2]
+    if conn is None:
+        connectivity = np.arange(n_points, dtype=np.int64)
+        offsets = connectivity + 1
+        types = np.full(n_points, VTK_VERTEX, dtype=np.uint8)
+    else:
+        connectivity = np.ascontiguousarray(conn, dtype=np.int64).ravel()
+        offsets = np.arange(1, len(conn) + 1, dtype=np.int64) * 3
+        types = np.full(len(conn), VTK_TRIANGLE, dtype=np.uint8)
+
+    data_arrays = [(name, np.ascontiguousarray(values[:, i]), 1) for i, name in enumerate(names)]
+    if all(c in names for c in ('u', 'v', 'w')):
+        # 额外输出速度矢量，便于在 ParaView 中直接绘制箭头
+        uvw = np.column_stack([values[:, names.index(c)] for c in ('u', 'v', 'w')])
+        data_arrays.append(("velocity_vector", np.ascontiguousarray(uvw), 3))
+
+    root = ET.Element("VTKFile", type="UnstructuredGrid", version="1.0",
+                      byte_order="LittleEndian", header_type="UInt64")
+    piece = ET.SubElement(ET.SubElement(root, "UnstructuredGrid"), "Piece",
+                          NumberOfPoints=str(n_points), NumberOfCells=str(len(types)))
+
+    blocks = []
+    offset = 0
+
+    def add_array(parent, name, array, components):
+        nonlocal offset
+        attrs = {"type": _vtk_type(array), "format": "appended", "offset": str(offset)}
+        if name:
+            attrs["Name"] = name
+        if components > 1:
+            attrs["NumberOfComponents"] = str(components)
+        ET.SubElement(parent, "DataArray", **attrs)
+        raw = np.ascontiguousarray(array).astype(array.dtype.newbyteorder('<'), copy=False).tobytes()
+        blocks.append(np.uint64(len(raw)).tobytes() + raw)
+        offset += 8 + len(raw)
+
+    data_parent = ET.SubElement(piece, "CellData" if location == 'cell' else "PointData")
+    for name, array, components in data_arrays:
+        add_array(data_parent, name, array, components)
+    add_array(ET.SubElement(piece, "Points"), None, points, 3)
+    cells = ET.SubElement(piece, "Cells")
+    add_array(cells, "connectivity", connectivity, 1)
+    add_array(cells, "offsets", offsets, 1)
+    add_array(cells, "types", types, 1)
+    ET.SubElement(root, "AppendedData", encoding="raw")
+
+    # 二进制数据紧跟在 "_" 之后，XML 的结尾标签在数据之后手工写出
+    header = ET.tostring(root, encoding="unicode")
+    header = header[:header.index('<AppendedData')] + '<AppendedData encoding="raw">\n_'
+    with atomic_output(out_path) as tmp, open(tmp, "wb") as f:
+        f.write(b'<?xml version="1.0"?>\n')
+        f.write(header.encode('utf-8'))
+        for block in blocks:
+            f.write(block)
+        f.write(b"\n</AppendedData>\n</VTKFile>\n")
+
+
+class XdmfTimeSeriesWriter:
+    """
+    XDMF + HDF5 时间序列写出
+
+    几何（坐标与连接表）只在 HDF5 中保存一次，每个时间步的变量作为新数据集追加，
+    XDMF 文件中各时间步引用同一份几何数据。需要安装 h5py。
+
+    resumable=True 时按数据块写出：append 的时间步写入从 start 开始的数据块 HDF5 文件
+    （含几何与各时间步的时间、变量名），flush 时数据块写完；close 时把全部数据块合并为最终文件。
+    """
+
+    def __init__(self, out_path: Path, xy: np.ndarray, conn: Optional[np.ndarray], location: str = 'node',
+                 resumable: bool = False):
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError("输出 XDMF 格式需要安装 h5py: pip install h5py")
+
+        self.xmf_path = Path(out_path).with_suffix('.xmf')
+        self.h5_path = self.xmf_path.with_suffix('.h5')
+        self.location = location
+        self.n_points = len(xy)
+        self.n_cells = len(conn) if conn is not None else len(xy)
+        self.has_topology = conn is not None
+        self.steps = []
+        self.resumable = resumable
+        # 本次写完的数据块文件
+        self.pieces: List[Path] = []
+
+        self._xy, self._conn = xy, conn
+        self._piece = None
+        self._h5 = None if resumable else self._create_h5(part_path(self.h5_path))
+
+    def _create_h5(self, path: Path):
+        import h5py
+
+        h5 = h5py.File(path, 'w')
+        h5.create_dataset('geometry', data=np.ascontiguousarray(self._xy[:, :2], dtype=np.float64))
+        if self._conn is not None:
+            h5.create_dataset('topology', data=np.ascontiguousarray(self._conn, dtype=np.int64))
+        h5.attrs['location'] = self.location
+        return h5
+
+    def append(self, time_value: float, names: List[str], values: np.ndarray, start: int = 0):
+        """追加一个时间步，values 形状 (点数或单元数, 变量数)；start 为所在时间步块的起始时间步（按数据块写出时）"""
+        if self.resumable and self._piece is None:
+            self._piece = piece_path(self.h5_path, start)
+            self._h5 = self._create_h5(part_path(self._piece))
+            self.steps = []
+        step = len(self.steps)
+        for i, name in enumerate(names):
+            self._h5.create_dataset(f'{name}/{step:06d}', data=np.ascontiguousarray(values[:, i]))
+        self.steps.append((float(time_value), list(names), values.dtype.itemsize))
+
+    def flush(self):
+        """按数据块写出时写完当前数据块（先于检查点完成）"""
+        if self._piece is None:
+            return
+        self._h5.attrs['steps'] = json.dumps(self.steps)
+        self._h5.close()
+        os.replace(part_path(self._piece), self._piece)
+        self.pieces.append(self._piece)
+        self._piece = self._h5 = None
+
+    def close(self):
+        """关闭 HDF5 文件并写出 XDMF 描述文件（HDF5 先于 XDMF 重命名，XDMF 出现时数据已完整）"""
+        if self.resumable:
+            self.flush()
+            assemble_xdmf(self.xmf_path)
+            return
+        self._h5.close()
+        os.replace(part_path(self.h5_path), self.h5_path)
+        h5_name = self.h5_path.name
+
+        root = ET.Element("Xdmf", Version="3.0")
+        collection = ET.SubElement(ET.SubElement(root, "Domain"), "Grid", Name="TimeSeries",
+                                   GridType="Collection", CollectionType="Temporal")
+        for step, (time_value, names, itemsize) in enumerate(self.steps):
+            grid = ET.SubElement(collection, "Grid", Name=f"step_{step}", GridType="Uniform")
+            ET.SubElement(grid, "Time", Value=repr(time_value))
+            if self.has_topology:
+                topology = ET.SubElement(grid, "Topology", TopologyType="Triangle",
+                                         NumberOfElements=str(self.n_cells))
+                ET.SubElement(topology, "DataItem", Dimensions=f"{self.n_cells} 3", NumberType="Int",
+                              Precision="8", Format="HDF").text = f"{h5_name}:/topology"
+            else:
+                ET.SubElement(grid, "Topology", TopologyType="Polyvertex",
+                              NumberOfElements=str(self.n_points), NodesPerElement="1")
+            geometry = ET.SubElement(grid, "Geometry", GeometryType="XY")
+            ET.SubElement(geometry, "DataItem", Dimensions=f"{self.n_points} 2", NumberType="Float",
+                          Precision="8", Format="HDF").text = f"{h5_name}:/geometry"
+
+            center = "Cell" if self.location == 'cell' else "Node"
+            n_values = self.n_cells if self.location == 'cell' else self.n_points
+            for name in names:
+                attribute = ET.SubElement(grid, "Attribute", Name=name, AttributeType="Scalar", Center=center)
+                ET.SubElement(attribute, "DataItem", Dimensions=str(n_values), NumberType="Float",
+                              Precision=str(itemsize), Format="HDF").text = f"{h5_name}:/{name}/{step:06d}"
+
+        with atomic_output(self.xmf_path) as tmp:
+            ET.ElementTree(root).write(tmp, encoding="utf-8", xml_declaration=True)
+
+    def abort(self):
+        """放弃写出：关闭并删除临时 HDF5 文件（已写完的数据块保留，供从检查点继续）"""
+        if self._h5 is None:
+            return
+        self._h5.close()
+        with contextlib.suppress(OSError):
+            os.remove(part_path(self._piece if self.resumable else self.h5_path))
+        self._piece = self._h5 = None
+
+
+def assemble_xdmf(out_path: Path):
+    """把按数据块写出的 XDMF 时间序列合并为一个 XDMF + HDF5 文件，完成后删除数据块；没有数据块时不做任何事"""
+    import h5py
+
+    xmf_path = Path(out_path).with_suffix('.xmf')
+    pieces = series_pieces(xmf_path.with_suffix('.h5'))
+    if not pieces:
+        return
+    writer = None
+    try:
+        for piece in pieces:
+            with h5py.File(piece, 'r') as h5:
+                if writer is None:
+                    conn = h5['topology'][()] if 'topology' in h5 else None
+                    writer = XdmfTimeSeriesWriter(xmf_path, h5['geometry'][()], conn, h5.attrs['location'])
+                for step, (time_value, names, _) in enumerate(json.loads(h5.attrs['steps'])):
+                    values = np.column_stack([h5[f'{name}/{step:06d}'][()] for name in names])
+                    writer.append(time_value, names, values)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    writer.close()
+    for piece in pieces:
+        with contextlib.suppress(OSError):
+            os.remove(piece)
+
+
+def write_xdmf(out_path: Path, xy: np.ndarray, conn: Optional[np.ndarray],
+               names: List[str], values: np.ndarray, location: str = 'node', time_value: float = 0.0):
+    """写出单个时间步的 XDMF + HDF5 文件"""
+    writer = XdmfTimeSeriesWriter(out_path, xy, conn, location)
+    try:
+        writer.append(time_value, names, values)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+
+def _import_pyarrow():
+    """延迟导入 pyarrow（可选依赖）"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("输出 Parquet 格式需要安装 pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+class ParquetTimeSeriesWriter:
+    """
+    Parquet 列式写出
+
+    append 的数据先缓存，flush 时合并写成一个行组（一个时间步块），下游可按列、按时间选择性读取，
+    无需解析 ASCII 文本。列：X, Y, 各变量, time, element_id/node_id。
+
+    resumable=True 时每次 flush 把缓存的数据写成一个数据块文件（从该块首次 append 的 start 开始），
+    close 时按起始时间步顺序合并为最终文件，每个数据块一个行组。
+    """
+
+    def __init__(self, out_path: Path, names: List[str], id_name: str = 'element_id',
+                 compression: str = 'zstd', resumable: bool = False):
+        pa = _import_pyarrow()
+        self._pa = pa
+        self.out_path = Path(out_path)
+        self.names = list(names)
+        self.id_name = id_name
+        self.resumable = resumable
+        # 本次写完的数据块文件
+        self.pieces: List[Path] = []
+        self._writer = None
+        self._compression = compression
+        self._pending = []
+        self._start = None
+
+    def append(self, xy: np.ndarray, values: np.ndarray, ids: np.ndarray, time_value=None, start: int = 0):
+        """
+        追加数据块
+
+        Args:
+            xy: 坐标，形状 (行数, 2)
+            values: 变量值，形状 (行数, 变量数) 或 (时间步数, 行数, 变量数)
+            ids: 单元或节点编号
+            time_value: 时间（datetime64 或其数组，与 values 的时间维对应），None 表示不写时间列
+            start: 所在时间步块的起始时间步（按数据块写出时）
+        """
+        pa = self._pa
+        values = np.asarray(values)
+        if values.ndim == 2:
+            values = values[np.newaxis]
+        n_steps, n_rows = values.shape[:2]
+
+        columns = {
+            'X': np.tile(np.asarray(xy[:, 0]), n_steps),
+            'Y': np.tile(np.asarray(xy[:, 1]), n_steps),
+        }
+        for i, name in enumerate(self.names):
+            columns[name] = values[:, :, i].ravel()
+        if time_value is not None:
+            times = np.atleast_1d(np.asarray(time_value, dtype='datetime64[ms]'))
+            columns['time'] = np.repeat(times, n_rows)
+        columns[self.id_name] = np.tile(np.asarray(ids, dtype=np.int64), n_steps)
+
+        if self._start is None:
+            self._start = start
+        self._pending.append(pa.table(columns))
+
+    def flush(self):
+        """把缓存的数据写成一个行组（按数据块写出时写成一个数据块文件）"""
+        if not self._pending:
+            return
+        table = self._pa.concat_tables(self._pending)
+        self._pending = []
+        if self.resumable:
+            piece = piece_path(self.out_path, self._start)
+            with atomic_output(piece) as tmp:
+                self._pa.parquet.write_table(table, tmp, row_group_size=len(table), compression=self._compression)
+            self.pieces.append(piece)
+            self._start = None
+            return
+        if self._writer is None:
+            self._writer = self._pa.parquet.ParquetWriter(part_path(self.out_path), table.schema,
+                                                          compression=self._compression)
+        self._writer.write_table(table, row_group_size=len(table))
+
+    def close(self):
+        """写出缓存的数据，关闭文件（写出 Parquet 尾部元数据）并重命名为最终文件名"""
+        self.flush()
+        if self.resumable:
+            assemble_parquet(self.out_path, self._compression)
+        elif self._writer is not None:
+            self._writer.close()
+            os.replace(part_path(self.out_path), self.out_path)
+
+    def abort(self):
+        """放弃写出：关闭并删除临时文件（已写完的数据块保留，供从检查点继续）"""
+        self._pending = []
+        self._start = None
+        if self._writer is not None:
+            self._writer.close()
+            with contextlib.suppress(OSError):
+                os.remove(part_path(self.out_path))
+
+
+def assemble_parquet(out_path: Path, compression: str = 'zstd'):
+    """把按数据块写出的 Parquet 文件按起始时间步顺序合并（每个数据块一个行组），完成后删除数据块"""
+    pa = _import_pyarrow()
+    pieces = series_pieces(out_path)
+    if not pieces:
+        return
+    with atomic_output(out_path) as tmp:
+        writer = None
+        try:
+            for piece in pieces:
+                table = pa.parquet.read_table(piece)
+                if writer is None:
+                    writer = pa.parquet.ParquetWriter(tmp, table.schema, compression=compression)
+                writer.write_table(table, row_group_size=len(table))
+        finally:
+            if writer is not None:
+                writer.close()
+    for piece in pieces:
+        with contextlib.suppress(OSError):
+            os.remove(piece)
+
+
+def write_parquet(out_path: Path, xy: np.ndarray, names: List[str], values: np.ndarray,
+                  ids: np.ndarray, id_name: str = 'element_id', time_value=None, compression: str = 'zstd'):
+    """写出单个数据块的 Parquet 文件"""
+    writer = ParquetTimeSeriesWriter(out_path, names, id_name, compression)
+    try:
+        writer.append(xy, values, ids, time_value)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
@@ -13,16 +13,85 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
 import sys
 import queue
+import time
+import collections
 from pathlib import Path
 
 # 导入授权管理器
 from license_manager import check_license_and_activate, LicenseManager
 
 import yaml
-from mike21_converter import MIKE21Converter
+# mike21_converter 对 numpy/mikeio/shapely/ezdxf 延迟导入，窗口显示前不加载重量级依赖
+from mike21_converter import MIKE21Converter, warm_up_imports, import_time_report
 import logging
 
 
+# 日志窗口最多保留的行数（超出后删除最早的行）
+LOG_MAX_LINES = 5000
+# 每个线程每秒最多显示的 INFO 级日志条数，WARNING 及以上不限流
+LOG_RATE_PER_THREAD = 20.0
+
+
+class GUILogHandler(logging.Handler):
+    """
+    批量日志处理器
+
+    工作线程只把格式化后的消息追加到环形缓冲区，不触碰Tk控件；GUI每个刷新周期
+    调用 drain() 一次性取出并合并插入。按线程做令牌桶限流，避免16线程并行时
+    日志淹没主循环，被丢弃的条数会汇总提示。
+    """
+
+    def __init__(self, max_pending: int = LOG_MAX_LINES, rate_per_thread: float = LOG_RATE_PER_THREAD):
+        super().__init__()
+        self.pending = collections.deque(maxlen=max_pending)
+        self.rate = rate_per_thread
+        self._buckets = {}
+        self._dropped = 0
+
+    def _allow(self, thread_id) -> bool:
+        """令牌桶限流，调用方已持有 self.lock"""
+        now = time.monotonic()
+        tokens, last = self._buckets.get(thread_id, (self.rate, now))
+        tokens = min(self.rate, tokens + (now - last) * self.rate)
+        if tokens < 1.0:
+            self._buckets[thread_id] = (tokens, now)
+            return False
+        self._buckets[thread_id] = (tokens - 1.0, now)
+        return True
+
+    def emit(self, record):
+        # logging.Handler.handle() 已持有 self.lock
+        try:
+            if record.levelno < logging.WARNING and not self._allow(record.thread):
+                self._dropped += 1
+                return
+            msg = self.format(record)
+            # 确保消息是UTF-8编码的字符串
+            if isinstance(msg, bytes):
+                msg = msg.decode('utf-8', errors='ignore')
+            if len(self.pending) == self.pending.maxlen:
+                self._dropped += 1
+            self.pending.append(msg)
+        except Exception:
+            # 如果编码失败，忽略这条日志消息
+            pass
+
+    def drain(self):
+        """取出当前缓冲的全部消息（在GUI线程调用）"""
+        with self.lock:
+            messages = list(self.pending)
+            self.pending.clear()
+            dropped, self._dropped = self._dropped, 0
+            # 令牌已补满的桶与不存在时等价，删除后批量运行结束的线程不再占用条目
+            now = time.monotonic()
+            for thread_id, (tokens, last) in list(self._buckets.items()):
+                if tokens + (now - last) * self.rate >= self.rate:
+                    del self._buckets[thread_id]
+        if dropped:
+            messages.append(f"…… 日志过多，已省略 {dropped} 条消息")
+        return messages
+
+
 class ConverterGUI:
     """MIKE21转换器图形界面"""
 
@@ -67,6 +136,13 @@ class ConverterGUI:
         # 启动消息处理
         self.process_queue()
 
+        # 窗口显示后在后台线程预加载重量级依赖
+        self.root.after(300, self.start_import_warmup)
+
+    def start_import_warmup(self):
+        """后台预加载 numpy/mikeio 等依赖，使首次转换无需等待导入"""
+        threading.Thread(target=warm_up_imports, name="import-warmup", daemon=True).start()
+
     def setup_modern_theme(self):
         """设置浅色主题样式（楷体字体）"""
         style = ttk.Style()
@@ -167,6 +243,7 @@ class ConverterGUI:
         menubar.add_cascade(label="帮助", menu=help_menu)
         help_menu.add_command(label="软件授权", command=self.show_license_info)
         help_menu.add_command(label="重新激活", command=self.reactivate_software)
+        help_menu.add_command(label="启动诊断", command=self.show_diagnostics)
         help_menu.add_separator()
         help_menu.add_command(label="关于软件", command=self.show_about)
 
@@ -182,6 +259,16 @@ class ConverterGUI:
         if dialog.show_activation_dialog():
             messagebox.showinfo("成功", "软件重新激活成功！")
 
+    def show_diagnostics(self):
+        """在后台统计导入耗时，完成后通过消息队列显示"""
+        def run():
+            try:
+                self.message_queue.put(('diagnostics', import_time_report()))
+            except Exception as e:
+                self.message_queue.put(('diagnostics', f"生成诊断报告失败: {e}"))
+
+        threading.Thread(target=run, daemon=True).start()
+
     def show_about(self):
         """显示关于信息"""
         about_text = """
@@ -458,6 +545,8 @@ MIKE21 to Tecplot 转换器 v2.1 - Professional Edition
                                      state=tk.DISABLED)
         self.stop_button.pack(side=tk.LEFT, padx=(0, 10))
 
+        ttk.Button(left_buttons, text="📋 资源预估", command=self.show_plan).pack(side=tk.LEFT, padx=(0, 10))
+
         # 右侧按钮组
         right_buttons = ttk.Frame(button_frame)
         right_buttons.grid(row=0, column=3, sticky=tk.E)
@@ -492,26 +581,8 @@ MIKE21 to Tecplot 转换器 v2.1 - Professional Edition
 
     def setup_logging(self):
         """设置日志处理器"""
-        # 创建自定义日志处理器
-        class GUILogHandler(logging.Handler):
-            def __init__(self, text_widget, queue_obj):
-                super().__init__()
-                self.text_widget = text_widget
-                self.queue = queue_obj
-
-            def emit(self, record):
-                try:
-                    msg = self.format(record)
-                    # 确保消息是UTF-8编码的字符串
-                    if isinstance(msg, bytes):
-                        msg = msg.decode('utf-8', errors='ignore')
-                    self.queue.put(('log', msg))
-                except Exception:
-                    # 如果编码失败，忽略这条日志消息
-                    pass
-
         # 配置日志
-        self.log_handler = GUILogHandler(self.log_text, self.message_queue)
+        self.log_handler = GUILogHandler()
         self.log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 
         # 获取根日志记录器并添加处理器
@@ -524,6 +595,26 @@ MIKE21 to Tecplot 转换器 v2.1 - Professional Edition
         directory = filedialog.askdirectory(title="选择DFSU文件目录", initialdir=self.input_dir_var.get())
         if directory:
             self.input_dir_var.set(directory)
+            self.show_file_list()
+
+    def show_file_list(self):
+        """在日志区显示输入目录中的DFSU文件摘要（文件头来自输出目录中的索引，只读取新增或变化的文件）"""
+        input_dir = Path(self.input_dir_var.get())
+        dfsu_files = sorted(input_dir.glob("*.dfsu"))
+        if not dfsu_files:
+            return
+        self.update_config_from_gui()
+        converter = MIKE21Converter(config=self.config)
+
+        def run():
+            try:
+                from header_index import summarize
+                lines = summarize(converter.scan_headers(dfsu_files))
+                self.message_queue.put(('files', [f"📇 {input_dir}: {len(dfsu_files)} 个DFSU文件"] + lines))
+            except Exception as e:
+                self.message_queue.put(('files', [f"读取文件头失败: {e}"]))
+
+        threading.Thread(target=run, daemon=True).start()
 
     def browse_output_dir(self):
         """浏览输出目录"""
@@ -795,16 +886,25 @@ MIKE21 to Tecplot 转换器 v2.1 - Professional Edition
         self.conversion_thread = threading.Thread(target=self.run_conversion, daemon=True)
         self.conversion_thread.start()
 
+    def show_plan(self):
+        """在日志区显示资源预估（只读取文件头与DXF，不转换）"""
+        self.update_config_from_gui()
+        converter = MIKE21Converter(config=self.config)
+
+        def run():
+            try:
+                plan = converter.plan()
+                self.message_queue.put(('files', converter.format_plan(plan)))
+            except Exception as e:
+                self.message_queue.put(('files', [f"资源预估失败: {e}"]))
+
+        threading.Thread(target=run, daemon=True).start()
+
     def run_conversion(self):
         """在后台线程中运行转换"""
         try:
-            # 创建临时配置文件
-            temp_config_path = Path("temp_gui_config.yaml")
-            with open(temp_config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(self.config, f, default_flow_style=False, allow_unicode=True)
-
-            # 创建转换器
-            converter = MIKE21Converter(str(temp_config_path))
+            # 直接使用内存中的配置创建转换器
+            converter = MIKE21Converter(config=self.config)
 
             # 运行转换
             result = converter.run()
@@ -812,10 +912,6 @@ MIKE21 to Tecplot 转换器 v2.1 - Professional Edition
             # 发送结果消息
             self.message_queue.put(('result', result))
 
-            # 清理临时文件
-            if temp_config_path.exists():
-                temp_config_path.unlink()
-
         except Exception as e:
             self.message_queue.put(('error', str(e)))
         finally:
@@ -846,17 +942,26 @@ MIKE21 to Tecplot 转换器 v2.1 - Professional Edition
         else:
             messagebox.showwarning("警告", "输出目录不存在")
 
+    def append_log_lines(self, lines):
+        """一次性插入多行日志，并把日志窗口裁剪到 LOG_MAX_LINES 行"""
+        if not lines:
+            return
+        self.log_text.insert(tk.END, '\n'.join(lines) + '\n')
+        line_count = int(self.log_text.index('end-1c').split('.')[0])
+        if line_count > LOG_MAX_LINES:
+            self.log_text.delete('1.0', f'{line_count - LOG_MAX_LINES + 1}.0')
+        self.log_text.see(tk.END)
+
     def process_queue(self):
         """处理消息队列"""
+        # 每个周期合并渲染一次日志
+        self.append_log_lines(self.log_handler.drain())
+
         try:
             while True:
                 msg_type, msg_data = self.message_queue.get_nowait()
 
-                if msg_type == 'log':
-                    self.log_text.insert(tk.END, msg_data + '\n')
-                    self.log_text.see(tk.END)
-
-                elif msg_type == 'result':
+                if msg_type == 'result':
                     if msg_data['success']:
                         messagebox.showinfo("成功",
                             f"转换完成！\n成功处理 {msg_data['successful_files']}/{msg_data['total_files']} 个文件")
@@ -866,6 +971,13 @@ MIKE21 to Tecplot 转换器 v2.1 - Professional Edition
                 elif msg_type == 'error':
                     messagebox.showerror("错误", f"转换过程中发生错误：{msg_data}")
 
+                elif msg_type == 'files':
+                    self.append_log_lines(msg_data)
+
+                elif msg_type == 'diagnostics':
+                    self.append_log_lines(msg_data.splitlines())
+                    messagebox.showinfo("启动诊断", "导入耗时报告已输出到运行日志")
+
                 elif msg_type == 'finished':
                     self.processing = False
                     self.start_button.config(state=tk.NORMAL)
@@ -931,4 +1043,6 @@ def main():
 
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MIKE21 to Tecplot 转换器 - DFSU 文件头索引
+在输出目录中保存各 dfsu 文件的文件头信息（时间轴、数据项、网格规模与网格指纹）
+
+索引是一个 SQLite 文件（output_dir/.dfsu_index.sqlite），按文件路径记录，文件大小或修改时间
+变化后记录自动失效、重新读取。批量调度、GUI 文件列表与增量运行只需 stat 即可拿到文件头，
+无需逐个用 mikeio 打开。同一记录中还保存最近一次完整转换所用配置的指纹，供增量运行判断是否跳过。
+runs 表记录每次转换的数据量与各阶段耗时，用于资源预估的耗时标定。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# 索引文件名（位于输出目录）
+INDEX_FILENAME = '.dfsu_index.sqlite'
+# 记录格式版本，文件头字段变化时递增，旧记录自动失效
+SCHEMA_VERSION = 1
+
+
+def mesh_fingerprint(geometry) -> str:
+    """网格指纹：节点坐标的 SHA1 + 单元数，与转换器的网格缓存键一致"""
+    node_xy = np.ascontiguousarray(np.asarray(geometry.node_coordinates))
+    return f"{hashlib.sha1(node_xy.tobytes()).hexdigest()}_{geometry.n_elements}"
+
+
+def read_header(dfsu_path: Path, dfs=None) -> Dict:
+    """
+    提取 dfsu 文件头信息
+
+    Args:
+        dfsu_path: dfsu 文件路径
+        dfs: 已打开的 mikeio 文件对象，None 时在此打开（只解析文件头与网格，不读取动态数据）
+
+    Returns:
+        文件头字典：n_timesteps, start_time, end_time, timestep（秒）, items（[名称, 单位]）,
+        n_elements, n_nodes, mesh（网格指纹）, bbox（[xmin, ymin, xmax, ymax]）, layered
+    """
+    import pandas as pd
+
+    if dfs is None:
+        import mikeio
+        dfs = mikeio.open(dfsu_path)
+
+    geometry = dfs.geometry
+    times = pd.DatetimeIndex(dfs.time)
+    node_xy = np.asarray(geometry.node_coordinates)
+    return {
+        'n_timesteps': int(dfs.n_timesteps),
+        'start_time': times[0].isoformat() if len(times) else None,
+        'end_time': times[-1].isoformat() if len(times) else None,
+        'timestep': float((times[1] - times[0]).total_seconds()) if len(times) > 1 else 0.0,
+        'items': [[item.name, str(getattr(item.unit, 'name', item.unit))] for item in dfs.items],
+        'n_elements': int(geometry.n_elements),
+        'n_nodes': int(len(node_xy)),
+        'mesh': mesh_fingerprint(geometry),
+        'bbox': [float(v) for v in (*node_xy[:, :2].min(axis=0), *node_xy[:, :2].max(axis=0))],
+        'layered': bool(getattr(geometry, 'is_layered', False)),
+    }
+
+
+class HeaderIndex:
+    """
+    dfsu 文件头的持久化索引
+
+    线程安全；多个进程同时写入时由 SQLite 的文件锁串行化。
+    """
+
+    def __init__(self, output_dir: Path):
+        self.path = Path(output_dir) / INDEX_FILENAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, version INTEGER, "
+                "header TEXT, converted TEXT)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "path TEXT, finished_at REAL, signature TEXT, work REAL, seconds REAL, stages TEXT)")
+
+    @staticmethod
+    def _key(dfsu_path: Path) -> str:
+        return str(Path(dfsu_path).resolve())
+
+    def _row(self, dfsu_path: Path):
+        """文件当前签名对应的有效记录 (header, converted)，不存在或已失效时返回 None"""
+        try:
+            stat = Path(dfsu_path).stat()
+        except OSError:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT header, converted FROM files WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+                (self._key(dfsu_path), stat.st_size, stat.st_mtime_ns, SCHEMA_VERSION)).fetchone()
+        return row
+
+    def get(self, dfsu_path: Path) -> Optional[Dict]:
+        """有效的文件头记录（含 size），不存在或文件已变化时返回 None"""
+        row = self._row(dfsu_path)
+        if row is None:
+            return None
+        header = json.loads(row[0])
+        header['size'] = Path(dfsu_path).stat().st_size
+        return header
+
+    def put(self, dfsu_path: Path, header: Dict):
+        """写入文件头记录；文件变化后写入会清除之前的转换记录"""
+        stat = Path(dfsu_path).stat()
+        header = {k: v for k, v in header.items() if k != 'size'}
+        with self._lock, self._db:
+            row = self._db.execute("SELECT size, mtime_ns, converted FROM files WHERE path = ?",
+                                   (self._key(dfsu_path),)).fetchone()
+            converted = row[2] if row is not None and tuple(row[:2]) == (stat.st_size, stat.st_mtime_ns) else None
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                             (self._key(dfsu_path), stat.st_size, stat.st_mtime_ns, SCHEMA_VERSION,
+                              json.dumps(header), converted))
+
+    def headers(self, dfsu_files: Iterable[Path], loader: Callable[[Path], Dict] = read_header,
+                max_workers: Optional[int] = None, refresh: bool = True) -> Dict[Path, Optional[Dict]]:
+        """
+        批量获取文件头
+
+        Args:
+            dfsu_files: 文件列表
+            loader: 读取单个文件头的函数
+            max_workers: 并行读取失效文件头的线程数
+            refresh: 是否读取缺失或失效的记录；False 时只返回索引中已有的记录
+
+        Returns:
+            文件路径 -> 文件头（读取失败或未刷新时为 None）
+        """
+        dfsu_files = [Path(p) for p in dfsu_files]
+        result = {p: self.get(p) for p in dfsu_files}
+        stale = [p for p, header in result.items() if header is None]
+        if refresh and stale:
+            def load(dfsu_path):
+                try:
+                    header = loader(dfsu_path)
+                except Exception:
+                    return None
+                self.put(dfsu_path, header)
+                return self.get(dfsu_path)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                result.update(zip(stale, executor.map(load, stale)))
+        return result
+
+    def mark_converted(self, dfsu_path: Path, signature: str):
+        """记录文件已用给定配置指纹完整转换"""
+        stat = Path(dfsu_path).stat()
+        with self._lock, self._db:
+            self._db.execute("UPDATE files SET converted = ? WHERE path = ? AND size = ? AND mtime_ns = ?",
+                             (signature, self._key(dfsu_path), stat.st_size, stat.st_mtime_ns))
+
+    def is_converted(self, dfsu_path: Path, signature: str) -> bool:
+        """文件自上次以相同配置完整转换后是否未变化"""
+        row = self._row(dfsu_path)
+        return row is not None and row[1] == signature
+
+    def record_run(self, dfsu_path: Path, signature: str, work: float, timings: Dict[str, float]):
+        """
+        记录一次转换的耗时
+
+        Args:
+            dfsu_path: dfsu 文件路径
+            signature: 配置指纹
+            work: 数据量（读取的单元数 × 时间步数）
+            timings: 各阶段耗时（秒），含 total
+        """
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                             (self._key(dfsu_path), time.time(), signature, float(work),
+                              float(timings.get('total', 0.0)), json.dumps(timings)))
+
+    def run_history(self, signature: Optional[str] = None, limit: int = 200) -> List[Dict]:
+        """最近的转换记录（新的在前），signature 不为 None 时只返回该配置的记录"""
+        query = "SELECT path, finished_at, signature, work, seconds, stages FROM runs"
+        args = ()
+        if signature is not None:
+            query += " WHERE signature = ?"
+            args = (signature,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY finished_at DESC LIMIT ?", args + (limit,)).fetchall()
+        return [{'path': r[0], 'finished_at': r[1], 'signature': r[2], 'work': r[3], 'seconds': r[4],
+                 'stages': json.loads(r[5])} for r in rows]
+
+    def prune(self, keep: Iterable[Path]) -> int:
+        """删除不在 keep 中且已不存在的文件记录，返回删除数"""
+        keep = {self._key(p) for p in keep}
+        with self._lock, self._db:
+            paths = [row[0] for row in self._db.execute("SELECT path FROM files")]
+            removed = [p for p in paths if p not in keep and not Path(p).exists()]
+            self._db.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+        return len(removed)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def summarize(headers: Dict[Path, Optional[Dict]]) -> List[str]:
+    """文件列表摘要（每个文件一行），供日志与 GUI 显示"""
+    lines = []
+    for dfsu_path, header in headers.items():
+        if header is None:
+            lines.append(f"{Path(dfsu_path).name}: 无法读取文件头")
+            continue
+        items = ', '.join(name for name, _ in header['items'])
+        lines.append(f"{Path(dfsu_path).name}: {header['size'] / 1024 / 1024:.1f} MB | "
+                     f"{header['n_elements']} 单元 | {header['n_timesteps']} 个时间步 "
+                     f"({header['start_time']} ~ {header['end_time']}) | {items}")
+    return lines
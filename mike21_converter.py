@@ -8,36 +8,303 @@ MIKE21 to Tecplot 转换器
 版本: 2.2 - 添加线程池并行处理支持
 """
 
+from __future__ import annotations
+
 import logging
 import sys
+import copy
+import contextlib
+import importlib
+import io
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Tuple
-import numpy as np
-import mikeio
-from shapely.geometry import Point, Polygon, LineString
-import ezdxf
+from typing import Dict, List, Optional, Union, Tuple, TYPE_CHECKING
 # 使用线程池替代进程池，避免PyInstaller环境问题
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import yaml
 import os
 import threading
+import time
+import hashlib
+import collections
+import itertools
+
+
+
+class _LazyModule:
+    """
+    延迟导入的模块代理，首次访问属性时才真正导入，加快GUI和命令行启动
+
+    导入后把本模块中的同名全局变量换成真正的模块，之后的访问（含逐单元循环中的 np.xxx）不再经过代理。
+    """
+
+    def __init__(self, name: str, binding: str):
+        self._name = name
+        self._binding = binding
+
+    def _load(self):
+        module = importlib.import_module(self._name)
+        if globals().get(self._binding) is self:
+            globals()[self._binding] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+# 重量级依赖延迟导入（打包时需在 hidden-import 中列出）
+if TYPE_CHECKING:
+    import numpy as np
+    from shapely.geometry import Polygon, LineString
+else:
+    np = _LazyModule('numpy', 'np')
+mikeio = _LazyModule('mikeio', 'mikeio')
+ezdxf = _LazyModule('ezdxf', 'ezdxf')
+shapely = _LazyModule('shapely', 'shapely')
+shapely_geometry = _LazyModule('shapely.geometry', 'shapely_geometry')
+
+HEAVY_MODULES = ('numpy', 'shapely.geometry', 'ezdxf', 'mikeio')
+
+# warm_up_imports 首次导入各重量级依赖的实际耗时（秒），供打包环境的导入耗时报告使用
+_import_timings: Dict[str, float] = {}
+
+
+def warm_up_imports() -> Dict[str, float]:
+    """
+    预先导入重量级依赖（GUI窗口显示后在后台线程调用）
+
+    Returns:
+        各模块导入耗时（秒），已导入的模块耗时接近0
+    """
+    timings = {}
+    for name in HEAVY_MODULES:
+        loaded = name in sys.modules
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            timings[name] = float('nan')
+        else:
+            timings[name] = time.perf_counter() - start
+        if not loaded:
+            _import_timings.setdefault(name, timings[name])
+    # 已导入模块的代理直接换成模块
+    for value in list(globals().values()):
+        if isinstance(value, _LazyModule) and value._name in sys.modules:
+            value._load()
+    return timings
+
+
+def import_time_report(top: int = 20) -> str:
+    """
+    生成启动导入耗时报告（类似 python -X importtime）
+
+    源码运行时启动子进程以 -X importtime 统计完整导入树（用 import 语句导入，各依赖作为顶层条目）；
+    打包环境下无法使用解释器参数，改为报告本进程中 warm_up_imports 首次导入各重量级依赖的实际耗时。
+    """
+    import subprocess
+
+    lines = ["导入耗时报告"]
+    if not getattr(sys, 'frozen', False):
+        code = "; ".join(f"import {name}" for name in ('mike21_converter',) + HEAVY_MODULES)
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              capture_output=True, text=True,
+                              cwd=str(Path(__file__).resolve().parent))
+        entries = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            entries.append((int(cumulative_us), int(self_us), depth, name.strip()))
+        if entries:
+            total = sum(e[0] for e in entries if e[2] == 0)
+            lines.append(f"总导入耗时: {total / 1e6:.3f}s（{len(entries)} 个模块）")
+            lines.append(f"{'累计(s)':>9} {'自身(s)':>9}  模块")
+            for cumulative_us, self_us, depth, name in sorted(entries, reverse=True)[:top]:
+                lines.append(f"{cumulative_us / 1e6:9.3f} {self_us / 1e6:9.3f}  {'  ' * depth}{name}")
+            return "\n".join(lines)
+
+    # 已导入的模块再计时只会得到接近 0 的耗时，报告首次导入时记录的耗时
+    warm_up_imports()
+    for name in HEAVY_MODULES:
+        if name in _import_timings:
+            lines.append(f"{_import_timings[name]:9.3f}s  {name}")
+        else:
+            lines.append(f"{'-':>9}   {name}（预热前已导入，未计时）")
+    return "\n".join(lines)
+
+
+# 默认配置，命令行在没有 config.yaml 时使用
+DEFAULT_CONFIG = {
+    'paths': {'input_dir': './dfsu_files', 'output_dir': './output'},
+    'coordinate_transform': {'x_shift': 0, 'y_shift': 0},
+    'time_settings': {'time_index': None},
+    'regions': {},
+    'output_settings': {'export_full_field': True, 'export_regions': True, 'precision': 6,
+                        'format': 'tecplot', 'dtype': 'float64', 'interpolation': 'mean',
+                        'full_field_mode': 'points', 'compression': 'none'},
+    'processing': {'parallel_workers': None, 'enable_parallel': True, 'backend': 'thread',
+                   'verbose': True, 'profile': False, 'reader': 'mikeio', 'header_index': True,
+                   'incremental': False, 'checkpoint': True, 'checkpoint_steps': 10, 'mesh_cache_size': 8},
+}
+
+# 支持的输出格式
+OUTPUT_FORMATS = ('tecplot', 'vtu', 'xdmf', 'parquet')
+
+# 多时间步时每个输出只写一个文件、逐时间步追加的格式（其余格式每个时间步一个文件）
+SERIES_FORMATS = ('xdmf', 'parquet')
+
+# ASCII 输出的压缩方式及文件后缀
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# 资源预估：没有历史记录时的处理耗时（秒 / 单元·时间步），以及输出体积的经验压缩比
+PLAN_SECONDS_PER_WORK = 2e-5
+PLAN_COMPRESSION_RATIOS = {'none': 1.0, 'gzip': 0.4, 'zstd': 0.35}
+PLAN_PARQUET_RATIO = 0.8
+
+# 逐时间步输出的检查点文件（位于每个文件的输出目录）
+CHECKPOINT_FILENAME = '.checkpoint.json'
+
+# 单元中心数据的全场输出方式
+FULL_FIELD_MODES = ('points', 'nodes', 'cellcentered')
+
+# 单元值到节点值的插值方法
+INTERPOLATION_SCHEMES = ('mean', 'area', 'idw', 'pseudo_laplacian')
+
+# 进程内只配置一次日志，避免同一进程多次创建转换器时重复添加处理器
+_logging_configured = False
+
+
+def deep_update(base: Dict, overrides: Dict) -> Dict:
+    """递归合并配置字典，overrides 中的值覆盖 base"""
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            deep_update(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+class _CountingStream(io.RawIOBase):
+    """统计写入字节数后转发给压缩流，用于计算压缩比"""
+
+    def __init__(self, target):
+        self._target = target
+        self.bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._target.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._target.close()
+        super().close()
+
+
+class _WriteBehind:
+    """
+    后台写出线程
+
+    计算线程提交写出任务后立即继续计算下一个区域，格式化与磁盘写入在独立线程中顺序执行。
+    已提交但未写完的数据按字节数计量，超过 max_bytes 时提交方阻塞等待（背压）。
+    """
+
+    def __init__(self, converter: "MIKE21Converter", max_bytes: int, timings: Optional[Dict] = None):
+        self._converter = converter
+        self._max_bytes = max_bytes
+        self._timings = timings
+        self._cond = threading.Condition()
+        self._jobs = collections.deque()
+        self._buffered = 0
+        self._active = 0
+        self._closed = False
+        self.errors: Dict[str, Exception] = {}
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"writer-{threading.current_thread().name}")
+        self._thread.start()
+
+    def submit(self, key: str, nbytes: int, fn, *args, on_done=None):
+        """提交写出任务；缓冲数据超过上限时阻塞，直到写出线程释放空间"""
+        with self._cond:
+            while self._buffered > 0 and self._buffered + nbytes > self._max_bytes:
+                self._cond.wait()
+            self._jobs.append((key, nbytes, fn, args, on_done))
+            self._buffered += nbytes
+            self._cond.notify_all()
+
+    def _run(self):
+        # 写出阶段耗时计入所属文件
+        self._converter._file_local.timings = self._timings
+        while True:
+            with self._cond:
+                while not self._jobs and not self._closed:
+                    self._cond.wait()
+                if not self._jobs:
+                    return
+                key, nbytes, fn, args, on_done = self._jobs.popleft()
+                self._active += 1
+            try:
+                fn(*args)
+                if on_done is not None:
+                    on_done()
+            except Exception as e:
+                self.errors[key] = e
+            finally:
+                with self._cond:
+                    self._buffered -= nbytes
+                    self._active -= 1
+                    self._cond.notify_all()
+
+    def flush(self) -> Dict[str, Exception]:
+        """等待已提交的任务全部写完（线程继续运行），返回到目前为止写出失败的任务"""
+        with self._cond:
+            while self._jobs or self._active:
+                self._cond.wait()
+            return dict(self.errors)
+
+    def close(self) -> Dict[str, Exception]:
+        """等待所有任务写完，返回写出失败的任务"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        return self.errors
 
 
 class MIKE21Converter:
     """MIKE21 DFSU 文件到 Tecplot 格式转换器"""
 
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, config: Optional[Dict] = None):
         """
         初始化转换器
 
         Args:
             config_path: 配置文件路径，默认为 config.yaml
+            config: 内存中的配置字典，提供时不读取配置文件
         """
         self.config_path = config_path or "config.yaml"
-        self.config = self._load_config()
+        if config is not None:
+            self.config = copy.deepcopy(config)
+        else:
+            self.config = self._load_config()
         self._setup_logging()
         self.logger = logging.getLogger(__name__)
 
+        # 当前线程正在处理的文件状态（阶段耗时、后台写出线程）
+        self._file_local = threading.local()
+
+        # 跨文件复用的缓存（DXF几何、网格几何），监视模式下保持热状态；
+        # 网格缓存按最近使用保留 processing.mesh_cache_size 个，DXF 缓存只保留每个文件的最新版本
+        self._cache_lock = threading.Lock()
+        self._dxf_cache: Dict[Tuple[str, str, float], Union[Polygon, LineString]] = {}
+        self._mesh_cache: collections.OrderedDict[str, Dict] = collections.OrderedDict()
+        self._header_index = None
+
     def _load_config(self) -> Dict:
         """加载配置文件"""
         try:
@@ -48,9 +315,31 @@ class MIKE21Converter:
         except yaml.YAMLError as e:
             raise ValueError(f"配置文件格式错误: {e}")
 
+    @classmethod
+    def from_config(cls, config: Dict, **overrides) -> "MIKE21Converter":
+        """
+        从内存配置创建转换器，无需写入临时YAML文件
+
+        Args:
+            config: 配置字典（会被深拷贝）
+            **overrides: 按配置节覆盖的设置，如 processing={'parallel_workers': 4}
+        """
+        config = deep_update(copy.deepcopy(config), overrides)
+        return cls(config=config)
+
+    def update_config(self, overrides: Dict):
+        """在同一转换器上更新配置，便于同一进程内连续运行多次转换"""
+        deep_update(self.config, copy.deepcopy(overrides))
+        self._setup_logging()
+
     def _setup_logging(self):
         """设置日志记录"""
+        global _logging_configured
         log_level = logging.INFO if self.config.get('processing', {}).get('verbose', True) else logging.WARNING
+        if _logging_configured:
+            logging.getLogger().setLevel(log_level)
+            return
+        _logging_configured = True
         logging.basicConfig(
             level=log_level,
             format='%(asctime)s - %(levelname)s - %(message)s',
@@ -60,39 +349,636 @@ class MIKE21Converter:
             ]
         )
 
+    @contextlib.contextmanager
+    def _stage(self, name: str):
+        """记录处理阶段耗时（秒），结果随单文件处理结果返回"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings = getattr(self._file_local, 'timings', None)
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+    def _cached_dxf(self, kind: str, dxf_path: Path, loader) -> Union[Polygon, LineString]:
+        """按文件路径和修改时间缓存DXF几何，文件变动后自动重新加载并丢弃旧版本"""
+        dxf_path = Path(dxf_path)
+        key = (kind, str(dxf_path.resolve()), dxf_path.stat().st_mtime)
+        with self._cache_lock:
+            if key in self._dxf_cache:
+                return self._dxf_cache[key]
+        geom = loader(dxf_path)
+        if isinstance(geom, shapely_geometry.Polygon) and hasattr(shapely, 'prepare'):
+            # 缓存中的多边形由多个线程共用，放入缓存前预处理一次，之后只读
+            shapely.prepare(geom)
+        with self._cache_lock:
+            for stale in [k for k in self._dxf_cache if k[:2] == key[:2] and k != key]:
+                del self._dxf_cache[stale]
+            self._dxf_cache[key] = geom
+        return geom
+
     def load_closed_polyline(self, dxf_path: Path) -> Polygon:
         """从DXF文件加载闭合多段线"""
+        return self._cached_dxf('region', dxf_path, self._read_closed_polyline)
+
+    def load_axis_polyline(self, dxf_path: Path) -> LineString:
+        """从DXF文件加载轴线"""
+        return self._cached_dxf('axis', dxf_path, self._read_axis_polyline)
+
+    def _read_closed_polyline(self, dxf_path: Path) -> Polygon:
+        """读取DXF文件中的闭合多段线"""
         try:
             doc = ezdxf.readfile(dxf_path)
             pl = next((e for e in doc.modelspace().query("LWPOLYLINE") if e.closed), None)
             if pl is None:
                 raise ValueError("DXF 中找不到闭合多段线！请确认已执行 C 闭合。")
             coords = [(x, y) for x, y, *_ in pl.get_points("xy")]
-            return Polygon(coords)
+            return shapely_geometry.Polygon(coords)
         except Exception as e:
             self.logger.error(f"加载DXF文件 {dxf_path} 失败: {e}")
             raise
 
-    def load_axis_polyline(self, dxf_path: Path) -> LineString:
-        """从DXF文件加载轴线"""
+    def _read_axis_polyline(self, dxf_path: Path) -> LineString:
+        """读取DXF文件中的轴线"""
         try:
             doc = ezdxf.readfile(dxf_path)
             line = next((e for e in doc.modelspace().query("LWPOLYLINE")), None)
             if line is None:
                 raise ValueError("DXF 中找不到多段线")
             coords = [(x, y) for x, y, *_ in line.get_points("xy")]
-            return LineString(coords)
+            return shapely_geometry.LineString(coords)
         except Exception as e:
             self.logger.error(f"加载轴线文件 {dxf_path} 失败: {e}")
             raise
 
+    def get_mesh(self, geometry) -> Dict:
+        """
+        获取网格几何数组，按网格指纹缓存
+
+        同一网格的多个DFSU文件（如同一模型的不同工况）共享节点坐标、单元中心和连接表，
+        后续基于网格的预计算结果也存放在同一缓存项中。
+
+        Returns:
+            包含 node_xy, elem_xy, elem_tab 的字典
+        """
+        import header_index
+
+        node_xy_all = np.asarray(geometry.node_coordinates)
+        key = header_index.mesh_fingerprint(geometry)
+        with self._cache_lock:
+            mesh = self._mesh_cache.get(key)
+            if mesh is not None:
+                self._mesh_cache.move_to_end(key)
+        if mesh is not None:
+            return mesh
+
+        mesh = {
+            'key': key,
+            'node_xy': np.array(node_xy_all),
+            'elem_xy': np.array(geometry.element_coordinates),
+            'elem_tab': np.array([np.array(e, dtype=int) for e in geometry.element_table if len(e) == 3]),
+        }
+        max_meshes = max(int(self.config.get('processing', {}).get('mesh_cache_size', 8)), 1)
+        with self._cache_lock:
+            # 并发线程可能同时构建，保留先写入的结果；超出上限时淘汰最久未使用的网格
+            mesh = self._mesh_cache.setdefault(key, mesh)
+            while len(self._mesh_cache) > max_meshes:
+                self._mesh_cache.popitem(last=False)
+        return mesh
+
+    def _element_grid(self, mesh: Dict) -> Dict:
+        """
+        将单元中心按均匀网格分桶（每桶约16个单元），作为区域标记的空间索引，按网格缓存
+
+        Returns:
+            包含网格原点、间距、桶数、按桶排序的单元索引 order 及各桶起始位置 starts 的字典
+        """
+        with self._cache_lock:
+            grid = mesh.get('elem_grid')
+        if grid is not None:
+            return grid
+
+        xy = mesh['elem_xy'][:, :2]
+        x0, y0 = xy.min(axis=0)
+        width, height = np.maximum(xy.max(axis=0) - (x0, y0), 1e-9)
+        n_cells = max(len(xy) // 16, 1)
+        nx = max(int(np.sqrt(n_cells * width / height)), 1)
+        ny = max(int(n_cells // nx), 1)
+        dx, dy = width / nx, height / ny
+
+        ix = np.clip(((xy[:, 0] - x0) / dx).astype(np.int64), 0, nx - 1)
+        iy = np.clip(((xy[:, 1] - y0) / dy).astype(np.int64), 0, ny - 1)
+        cell = iy * nx + ix
+        order = np.argsort(cell, kind='stable')
+        starts = np.searchsorted(cell[order], np.arange(nx * ny + 1))
+
+        grid = {'x0': x0, 'y0': y0, 'dx': dx, 'dy': dy, 'nx': nx, 'ny': ny,
+                'order': order, 'starts': starts}
+        with self._cache_lock:
+            grid = mesh.setdefault('elem_grid', grid)
+        return grid
+
+    @staticmethod
+    def _gather_cells(grid: Dict, cells: np.ndarray) -> np.ndarray:
+        """取出若干网格桶中的全部单元索引（向量化拼接各桶区间）"""
+        lo = grid['starts'][cells]
+        lengths = grid['starts'][cells + 1] - lo
+        offsets = np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+        return grid['order'][offsets + np.arange(lengths.sum())]
+
+    @staticmethod
+    def _contains_points(polygon: Polygon, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """精确判断点是否在多边形内部（边界上的点不算）"""
+        if hasattr(shapely, 'contains_xy'):
+            return shapely.contains_xy(polygon, x, y)
+        # 旧版 shapely：使用预处理几何逐点判断
+        from shapely.prepared import prep
+        prepared = prep(polygon)
+        return np.array([prepared.contains(shapely_geometry.Point(px, py)) for px, py in zip(x, y)], dtype=bool)
+
+    def label_regions(self, mesh: Dict, polygons: Dict[str, Polygon]) -> Dict[str, np.ndarray]:
+        """
+        为所有区域标记单元
+
+        单元中心按均匀网格分桶后，每个区域只访问与其外包矩形相交的网格桶，不再扫描全网格。
+        启用 processing.region_raster（默认）时，先用粗栅格对网格桶分类：完全位于多边形内部的桶
+        整体接受，与多边形不相交的桶整体排除，只有跨越边界的桶内单元才做精确判断。
+        结果按区域几何缓存在网格缓存项中。
+
+        Args:
+            mesh: get_mesh 返回的网格缓存项
+            polygons: 区域名 -> 区域多边形
+
+        Returns:
+            区域名 -> 区域内单元索引（升序）
+        """
+        digest = hashlib.sha1()
+        for name in sorted(polygons):
+            digest.update(name.encode('utf-8'))
+            digest.update(polygons[name].wkb)
+        key = digest.hexdigest()
+
+        with self._cache_lock:
+            cache = mesh.setdefault('region_labels', {})
+            labels = cache.get(key)
+        if labels is not None:
+            return labels
+
+        use_raster = self.config.get('processing', {}).get('region_raster', True) and hasattr(shapely, 'box')
+        elem_xy = mesh['elem_xy']
+        n_candidates = n_exact = 0
+        labels = {}
+        with self._stage('region_prefilter'):
+            grid = self._element_grid(mesh)
+
+        for name, polygon in polygons.items():
+            with self._stage('region_prefilter'):
+                # 外包矩形覆盖的网格桶
+                minx, miny, maxx, maxy = polygon.bounds
+                ix0, ix1 = (np.clip(np.floor((np.array([minx, maxx]) - grid['x0']) / grid['dx']),
+                                    0, grid['nx'] - 1).astype(np.int64))
+                iy0, iy1 = (np.clip(np.floor((np.array([miny, maxy]) - grid['y0']) / grid['dy']),
+                                    0, grid['ny'] - 1).astype(np.int64))
+                gx, gy = np.meshgrid(np.arange(ix0, ix1 + 1), np.arange(iy0, iy1 + 1))
+                gx, gy = gx.ravel(), gy.ravel()
+                cells = gy * grid['nx'] + gx
+
+                if use_raster:
+                    # 粗栅格分类：内部桶整体接受，外部桶整体排除
+                    boxes = shapely.box(grid['x0'] + gx * grid['dx'], grid['y0'] + gy * grid['dy'],
+                                        grid['x0'] + (gx + 1) * grid['dx'], grid['y0'] + (gy + 1) * grid['dy'])
+                    if not shapely.is_prepared(polygon):
+                        # 只预处理副本：传入的多边形可能被其他线程共用
+                        polygon = shapely.from_wkb(polygon.wkb)
+                        shapely.prepare(polygon)
+                    inside = shapely.contains_properly(polygon, boxes)
+                    touching = shapely.intersects(polygon, boxes)
+                    accepted = self._gather_cells(grid, cells[inside])
+                    band = self._gather_cells(grid, cells[touching & ~inside])
+                    n_candidates += len(accepted) + len(band)
+                else:
+                    accepted = np.empty(0, dtype=np.int64)
+                    band = self._gather_cells(grid, cells)
+                    # 外包矩形的精确范围过滤
+                    bx, by = elem_xy[band, 0], elem_xy[band, 1]
+                    band = band[(bx >= minx) & (bx <= maxx) & (by >= miny) & (by <= maxy)]
+                    n_candidates += len(band)
+
+            with self._stage('region_exact'):
+                inner = self._contains_points(polygon, elem_xy[band, 0], elem_xy[band, 1])
+                n_exact += len(band)
+            labels[name] = np.sort(np.concatenate([accepted, band[inner]]))
+
+        if polygons:
+            n_full = len(elem_xy) * len(polygons)
+            self.logger.info(f"📐 区域标记: {len(polygons)} 个区域，候选单元 {n_candidates}，"
+                             f"精确判断 {n_exact}（逐区域全扫描需 {n_full} 次，"
+                             f"节省 {(1 - n_exact / max(n_full, 1)) * 100:.1f}%）")
+
+        with self._cache_lock:
+            cache[key] = labels
+        return labels
+
+    def load_probes(self) -> Tuple[List[str], np.ndarray]:
+        """
+        加载 probes 配置中的测点（模型原始坐标）
+
+        csv: 每行 "名称,x,y" 或 "x,y"（可带表头）；dxf: 文件中的全部 POINT 实体；
+        points: 名称 -> [x, y]。DXF/CSV 按文件修改时间缓存。
+
+        Returns:
+            (测点名称列表, 形状 (测点数, 2) 的坐标数组)
+        """
+        probes = self.config.get('probes') or {}
+        names, coords = [], []
+        if probes.get('csv'):
+            for name, x, y in self._cached_dxf('probes_csv', Path(probes['csv']), self._read_probe_csv):
+                names.append(name)
+                coords.append((x, y))
+        if probes.get('dxf'):
+            for x, y in self._cached_dxf('probes_dxf', Path(probes['dxf']), self._read_probe_dxf):
+                names.append(f"P{len(names) + 1}")
+                coords.append((x, y))
+        for name, (x, y) in (probes.get('points') or {}).items():
+            names.append(str(name))
+            coords.append((float(x), float(y)))
+        return names, np.array(coords, dtype=np.float64).reshape(-1, 2)
+
+    @staticmethod
+    def _read_probe_csv(csv_path: Path) -> List[Tuple[str, float, float]]:
+        """读取测点CSV文件"""
+        import csv
+        rows = []
+        with open(csv_path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.reader(f):
+                row = [c.strip() for c in row if c.strip()]
+                if not row:
+                    continue
+                try:
+                    x, y = float(row[-2]), float(row[-1])
+                except (ValueError, IndexError):
+                    continue  # 表头或无效行
+                name = row[0] if len(row) >= 3 else f"P{len(rows) + 1}"
+                rows.append((name, x, y))
+        return rows
+
+    def _read_probe_dxf(self, dxf_path: Path) -> List[Tuple[float, float]]:
+        """读取DXF文件中的全部 POINT 实体"""
+        try:
+            doc = ezdxf.readfile(dxf_path)
+            return [(p.dxf.location.x, p.dxf.location.y) for p in doc.modelspace().query("POINT")]
+        except Exception as e:
+            self.logger.error(f"加载测点文件 {dxf_path} 失败: {e}")
+            raise
+
+    def locate_probes(self, mesh: Dict, probe_xy: np.ndarray) -> np.ndarray:
+        """
+        查找测点所在单元，按网格和测点坐标缓存
+
+        单元中心的 KD 树（按网格缓存）给出每个测点最近的若干候选单元，再用重心坐标判断
+        包含关系；候选中找不到的测点对全部单元做一次向量化判断。
+
+        Returns:
+            每个测点所在单元的索引，不在网格内的测点为 -1
+        """
+        key = hashlib.sha1(np.ascontiguousarray(probe_xy, dtype=np.float64).tobytes()).hexdigest()
+        with self._cache_lock:
+            cache = mesh.setdefault('probe_locations', {})
+            located = cache.get(key)
+        if located is not None:
+            return located
+
+        from scipy.spatial import cKDTree
+
+        with self._cache_lock:
+            tree = mesh.get('elem_kdtree')
+        if tree is None:
+            tree = cKDTree(mesh['elem_xy'][:, :2])
+            with self._cache_lock:
+                tree = mesh.setdefault('elem_kdtree', tree)
+
+        located = np.full(len(probe_xy), -1, dtype=np.int64)
+        if len(probe_xy) == 0:
+            return located
+        elem_tab = mesh['elem_tab']
+        if len(elem_tab) != len(mesh['elem_xy']):
+            # 含非三角形单元时无法做重心坐标判断，退化为最近单元中心
+            _, located = tree.query(probe_xy, k=1)
+        else:
+            tri_xy = mesh['node_xy'][:, :2][elem_tab]
+            k = min(8, len(elem_tab))
+            _, candidates = tree.query(probe_xy, k=k)
+            candidates = candidates.reshape(len(probe_xy), k)
+            inside = self._in_triangles(tri_xy[candidates], probe_xy[:, np.newaxis, :])
+            found = inside.any(axis=1)
+            located[found] = candidates[found, inside[found].argmax(axis=1)]
+            for i in np.flatnonzero(~found):
+                hits = np.flatnonzero(self._in_triangles(tri_xy, probe_xy[i]))
+                if len(hits):
+                    located[i] = hits[0]
+
+        with self._cache_lock:
+            located = cache.setdefault(key, located)
+        return located
+
+    @staticmethod
+    def _in_triangles(tri_xy: np.ndarray, point_xy: np.ndarray) -> np.ndarray:
+        """重心坐标判断点是否在三角形内（含边界），tri_xy 形状 (..., 3, 2)"""
+        a, b, c = tri_xy[..., 0, :], tri_xy[..., 1, :], tri_xy[..., 2, :]
+        v0, v1, v2 = b - a, c - a, point_xy - a
+        det = v0[..., 0] * v1[..., 1] - v1[..., 0] * v0[..., 1]
+        safe_det = np.where(det == 0, 1.0, det)
+        l1 = (v2[..., 0] * v1[..., 1] - v1[..., 0] * v2[..., 1]) / safe_det
+        l2 = (v0[..., 0] * v2[..., 1] - v2[..., 0] * v0[..., 1]) / safe_det
+        eps = 1e-9
+        return (det != 0) & (l1 >= -eps) & (l2 >= -eps) & (l1 + l2 <= 1 + eps)
+
+    def section_geometry(self, mesh: Dict, line: LineString, n_samples: int = 101) -> Dict:
+        """
+        断面线与网格的相交关系，按网格、断面几何和采样点数缓存
+
+        单元三角形及其 STRtree 按网格缓存；断面线先拆分为直线段，各直线段与候选单元一次向量化求交，
+        得到断面在每个单元内的线段长度与法向（取所在直线段切向的左侧为正，与 project_uv_along_axis 的 Vy
+        方向一致；折点落在单元内时该单元按直线段分为多段），沿线等距采样点的所在单元由 locate_probes 查找。
+
+        Returns:
+            字典：elem/length/normal 为各相交线段的单元、长度、单位法向；
+            sample_elem/sample_station/sample_xy/sample_tangent 为网格内采样点的单元、里程、坐标、单位切向
+        """
+        if not hasattr(shapely, 'STRtree') or not hasattr(shapely, 'polygons'):
+            raise ImportError("断面计算需要 shapely>=2.0")
+
+        key = (hashlib.sha1(line.wkb).hexdigest(), n_samples)
+        with self._cache_lock:
+            cache = mesh.setdefault('sections', {})
+            section = cache.get(key)
+        if section is not None:
+            return section
+
+        with self._cache_lock:
+            tree = mesh.get('elem_strtree')
+        if tree is None:
+            polygons = shapely.polygons(mesh['node_xy'][:, :2][mesh['elem_tab']])
+            tree = shapely.STRtree(polygons)
+            with self._cache_lock:
+                tree = mesh.setdefault('elem_strtree', tree)
+
+        # 断面线各折线段的里程与单位切向
+        line_xy = np.asarray(line.coords)[:, :2]
+        seg_vec = np.diff(line_xy, axis=0)
+        seg_len = np.hypot(*seg_vec.T)
+        seg_dir = seg_vec / np.maximum(seg_len, 1e-12)[:, np.newaxis]
+        seg_start = np.concatenate([[0.0], np.cumsum(seg_len)[:-1]])
+
+        def tangent_at(station):
+            seg = np.clip(np.searchsorted(seg_start, station, side='right') - 1, 0, len(seg_len) - 1)
+            return seg_dir[seg]
+
+        # 每个直线段单独求交，相交线段的法向取所在直线段的法向
+        segments = shapely.linestrings(np.stack([line_xy[:-1], line_xy[1:]], axis=1))
+        seg_index, candidates = tree.query(segments, predicate='intersects')
+        parts, index = shapely.get_parts(
+            shapely.intersection(tree.geometries[candidates], segments[seg_index]), return_index=True)
+        is_line = shapely.get_type_id(parts) == 1
+        parts, elem, seg = parts[is_line], candidates[index[is_line]], seg_index[index[is_line]]
+        length = shapely.length(parts)
+        s0 = seg_start[seg] + shapely.line_locate_point(segments[seg], shapely.get_point(parts, 0))
+        s1 = seg_start[seg] + shapely.line_locate_point(segments[seg], shapely.get_point(parts, -1))
+        s0, s1 = np.minimum(s0, s1), np.maximum(s0, s1)
+        order = np.argsort(s0, kind='stable')
+        elem, length, seg, s0, s1 = elem[order], length[order], seg[order], s0[order], s1[order]
+        # 断面沿单元边走时两侧单元都会得到同一线段，只保留一次
+        covered = np.maximum.accumulate(np.concatenate([[-np.inf], s1[:-1]]))
+        keep = (length > 1e-9) & (s1 > covered + 1e-9)
+        elem, length, tangent = elem[keep], length[keep], seg_dir[seg[keep]]
+
+        stations = np.linspace(0.0, line.length, max(int(n_samples), 2))
+        sample_xy = shapely.get_coordinates(shapely.line_interpolate_point(line, stations))
+        sample_elem = self.locate_probes(mesh, sample_xy)
+        inside = sample_elem >= 0
+
+        section = {
+            'elem': elem, 'length': length, 'normal': np.column_stack([-tangent[:, 1], tangent[:, 0]]),
+            'sample_elem': sample_elem[inside], 'sample_station': stations[inside],
+            'sample_xy': sample_xy[inside], 'sample_tangent': tangent_at(stations[inside]),
+        }
+        with self._cache_lock:
+            section = cache.setdefault(key, section)
+        return section
+
+    def clip_elements(self, mesh: Dict) -> Optional[np.ndarray]:
+        """
+        全场输出裁剪范围（output_settings.clip）内的单元，按单元中心判断，结果随区域标记缓存
+
+        Returns:
+            范围内的单元索引（升序），未配置裁剪时返回 None
+        """
+        polygon = self.clip_polygon()
+        if polygon is None:
+            return None
+        return self.label_regions(mesh, {'__clip__': polygon})['__clip__']
+
+    def clip_polygon(self) -> Optional[Polygon]:
+        """全场输出裁剪范围的多边形（box 优先，其次 dxf），未配置时返回 None"""
+        clip = self.config.get('output_settings', {}).get('clip') or {}
+        if clip.get('box') is not None:
+            return shapely_geometry.box(*(float(c) for c in clip['box']))
+        if clip.get('dxf'):
+            return self.load_closed_polyline(Path(clip['dxf']))
+        return None
+
+    def clip_subset(self, mesh: Dict, geometry, clip_idx: np.ndarray,
+                    item_names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        裁剪输出读取、计算变量所用的单元子集
+
+        需要完整网格的派生变量（梯度等）另加一圈与范围内单元共用节点的相邻单元，
+        范围内单元的节点插值与梯度因此与在完整网格上计算的一致。
+
+        Returns:
+            (单元编号, 节点编号)，均为原始编号且升序，与 mikeio 按单元取子集后的网格顺序一致
+        """
+        elem_tab = mesh['elem_tab']
+        triangles = len(elem_tab) == len(mesh['elem_xy'])
+        elements = clip_idx
+        if triangles and self._uses_mesh(item_names):
+            # 非三角形网格无法求梯度，其余需要网格的派生变量只用到本单元
+            touched = np.zeros(len(mesh['node_xy']), dtype=bool)
+            touched[elem_tab[clip_idx]] = True
+            elements = np.flatnonzero(touched[elem_tab].any(axis=1))
+        if triangles:
+            nodes = np.unique(elem_tab[elements])
+        else:
+            nodes = np.unique(np.concatenate([np.asarray(geometry.element_table[i]) for i in elements]))
+        return elements, nodes
+
+    def node_interpolation(self, mesh: Dict, elem_idx: Optional[np.ndarray] = None,
+                           scheme: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, "scipy.sparse.csr_matrix"]:
+        """
+        构建单元值到节点值的稀疏插值矩阵，按网格、单元子集、插值方法和输出精度缓存
+
+        插值方法（output_settings.interpolation）:
+            mean             相邻单元简单平均（默认，与早期版本一致）
+            area             按相邻单元面积加权
+            idw              按节点到单元中心距离的倒数加权
+            pseudo_laplacian 伪拉普拉斯加权（MIKE 自身采用的方法），权重截断到 [0, 2]
+
+        Args:
+            mesh: get_mesh 返回的网格缓存项
+            elem_idx: 参与插值的单元索引，None 表示全部单元
+            scheme: 插值方法，默认取配置
+
+        Returns:
+            (nodes_keep, conn_reindex, W)：涉及的原始节点编号、重新编号后的连接表、
+            形状为 (节点数, 单元数) 的CSR矩阵，节点值 = W @ 单元值
+        """
+        scheme = scheme or self.config.get('output_settings', {}).get('interpolation', 'mean')
+        if scheme not in INTERPOLATION_SCHEMES:
+            raise ValueError(f"不支持的插值方法: {scheme}（可选 {', '.join(INTERPOLATION_SCHEMES)}）")
+
+        subset_key = 'all' if elem_idx is None else hashlib.sha1(np.ascontiguousarray(elem_idx).tobytes()).hexdigest()
+        dtype = self._output_dtype()
+        key = (scheme, subset_key, str(dtype))
+        with self._cache_lock:
+            cache = mesh.setdefault('interpolation', {})
+            cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        from scipy import sparse
+
+        elem_tab = mesh['elem_tab'] if elem_idx is None else mesh['elem_tab'][elem_idx]
+        elem_xy = (mesh['elem_xy'] if elem_idx is None else mesh['elem_xy'][elem_idx])[:, :2]
+        nodes_keep = np.unique(elem_tab)
+        conn_reindex = np.searchsorted(nodes_keep, elem_tab)
+        node_xy = mesh['node_xy'][nodes_keep, :2]
+
+        n_elem, n_corner = conn_reindex.shape
+        rows = conn_reindex.ravel()
+        cols = np.repeat(np.arange(n_elem), n_corner)
+
+        if scheme == 'mean':
+            weights = np.ones(len(rows))
+        elif scheme == 'area':
+            p0, p1, p2 = (node_xy[conn_reindex[:, k]] for k in range(3))
+            area = 0.5 * np.abs((p1[:, 0] - p0[:, 0]) * (p2[:, 1] - p0[:, 1])
+                                - (p2[:, 0] - p0[:, 0]) * (p1[:, 1] - p0[:, 1]))
+            weights = np.repeat(area, n_corner)
+        elif scheme == 'idw':
+            dist = np.hypot(*(elem_xy[cols] - node_xy[rows]).T)
+            weights = 1.0 / np.maximum(dist, 1e-12)
+        else:
+            # 伪拉普拉斯权重：w_i = 1 + λx·Δx_i + λy·Δy_i
+            dx, dy = (elem_xy[cols] - node_xy[rows]).T
+            n_nodes = len(nodes_keep)
+            rx, ry = (np.bincount(rows, d, n_nodes) for d in (dx, dy))
+            ixx, iyy, ixy = (np.bincount(rows, d, n_nodes) for d in (dx * dx, dy * dy, dx * dy))
+            det = ixx * iyy - ixy * ixy
+            valid = np.abs(det) > 1e-12 * np.maximum(ixx * iyy, 1e-300)
+            safe_det = np.where(valid, det, 1.0)
+            lam_x = np.where(valid, (ixy * ry - iyy * rx) / safe_det, 0.0)
+            lam_y = np.where(valid, (ixy * rx - ixx * ry) / safe_det, 0.0)
+            weights = np.clip(1.0 + lam_x[rows] * dx + lam_y[rows] * dy, 0.0, 2.0)
+
+        matrix = sparse.csr_matrix((weights, (rows, cols)), shape=(len(nodes_keep), n_elem))
+        row_sum = np.asarray(matrix.sum(axis=1)).ravel()
+        # 权重全部被截断为0的节点退化为简单平均
+        degenerate = row_sum <= 0
+        if degenerate.any():
+            fallback = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=matrix.shape)
+            matrix = sparse.diags((~degenerate).astype(float)) @ matrix + sparse.diags(degenerate.astype(float)) @ fallback
+            row_sum = np.asarray(matrix.sum(axis=1)).ravel()
+        matrix = sparse.diags(1.0 / row_sum) @ matrix
+        matrix = matrix.astype(dtype).tocsr()
+
+        result = (nodes_keep, conn_reindex, matrix)
+        with self._cache_lock:
+            result = cache.setdefault(key, result)
+        return result
+
+    def grid_interpolation(self, mesh: Dict, xs: np.ndarray, ys: np.ndarray,
+                           location: str = 'cell') -> Tuple["scipy.sparse.csr_matrix", np.ndarray]:
+        """
+        构建网格数据到规则IJ网格点的稀疏插值矩阵，按网格、IJ网格、插值方法和输出精度缓存
+
+        每个IJ网格点在所在三角形内按重心坐标对三个节点插值；单元中心数据先经 node_interpolation
+        的单元→节点矩阵插值到节点，两个矩阵预先相乘，每个时间步只需一次稀疏乘法。
+
+        Args:
+            xs, ys: IJ网格的 x、y 坐标（模型原始坐标），网格点按 I（x）优先排列
+            location: 'cell' 单元中心数据 / 'node' 节点数据
+
+        Returns:
+            (G, inside)：形状 (网格点数, 单元数或节点数) 的CSR矩阵，及网格点是否位于网格内
+        """
+        scheme = self.config.get('output_settings', {}).get('interpolation', 'mean')
+        key = (hashlib.sha1(np.concatenate([xs, ys]).astype(np.float64).tobytes()).hexdigest(),
+               len(xs), location, scheme if location == 'cell' else None, str(self._output_dtype()))
+        with self._cache_lock:
+            cache = mesh.setdefault('grid_interpolation', {})
+            cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        from scipy import sparse
+
+        if len(mesh['elem_tab']) != len(mesh['elem_xy']):
+            raise ValueError("网格包含非三角形单元，无法重采样到IJ网格")
+        gx, gy = np.meshgrid(xs, ys)
+        grid_xy = np.column_stack([gx.ravel(), gy.ravel()])
+        elem = self.locate_probes(mesh, grid_xy)
+        inside = elem >= 0
+
+        # 重心坐标
+        tri_nodes = mesh['elem_tab'][elem[inside]]
+        a, b, c = (mesh['node_xy'][tri_nodes[:, k], :2] for k in range(3))
+        p = grid_xy[inside]
+        det = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+        l1 = ((p[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1])) / det
+        l2 = ((b[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1]) - (p[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])) / det
+        bary = np.clip(np.column_stack([1.0 - l1 - l2, l1, l2]), 0.0, 1.0)
+        bary /= bary.sum(axis=1, keepdims=True)
+
+        rows = np.repeat(np.flatnonzero(inside), 3)
+        n_nodes = len(mesh['node_xy'])
+        matrix = sparse.csr_matrix((bary.ravel(), (rows, tri_nodes.ravel())), shape=(len(grid_xy), n_nodes))
+        if location == 'cell':
+            nodes_keep, _, weights = self.node_interpolation(mesh)
+            matrix = (matrix[:, nodes_keep] @ weights.astype(np.float64)).tocsr()
+        matrix = matrix.astype(self._output_dtype())
+
+        result = (matrix, inside)
+        with self._cache_lock:
+            result = cache.setdefault(key, result)
+        return result
+
+    @staticmethod
+    def interpolate_to_nodes(matrix, *arrays: np.ndarray) -> List[np.ndarray]:
+        """
+        用一次稀疏矩阵乘法把多个单元变量（可含时间维，形状 (..., 单元数)）插值到节点
+
+        Returns:
+            与输入一一对应的节点变量，形状 (..., 节点数)
+        """
+        n_elem = matrix.shape[1]
+        columns = [np.asarray(a).reshape(-1, n_elem).T for a in arrays]
+        widths = [c.shape[1] for c in columns]
+        node_values = matrix @ np.hstack(columns)
+        results = []
+        start = 0
+        for a, width in zip(arrays, widths):
+            block = node_values[:, start:start + width].T
+            results.append(block.reshape(np.shape(a)[:-1] + (matrix.shape[0],)))
+            start += width
+        return results
+
     def project_uv_along_axis(self, elem_xy: np.ndarray, u: np.ndarray,
                              v: np.ndarray, axis: LineString) -> Tuple[np.ndarray, np.ndarray]:
         """将速度矢量投影到轴线坐标系"""
         vx, vy = [], []
         for xyz, uu, vv in zip(elem_xy, u, v):
             x, y = xyz[:2]
-            pt = Point(x, y)
+            pt = shapely_geometry.Point(x, y)
             proj = axis.project(pt)
             axis_pt = axis.interpolate(proj)
             tangent = np.array(axis.interpolate(proj + 1e-6).coords[0]) - np.array(axis_pt.coords[0])
@@ -106,17 +992,486 @@ class MIKE21Converter:
             vy.append(np.dot(vel_vec, normal))
         return np.array(vx), np.array(vy)
 
+    def _output_dtype(self):
+        """计算与输出精度：output_settings.dtype 为 float32 时全程使用单精度"""
+        dtype = self.config.get('output_settings', {}).get('dtype', 'float64')
+        if dtype not in ('float32', 'float64'):
+            raise ValueError(f"不支持的 dtype: {dtype}（可选 float32 / float64）")
+        return np.dtype(dtype)
+
+    def transform_coordinates(self, xy: np.ndarray) -> np.ndarray:
+        """
+        按 coordinate_transform 变换坐标：重投影 → 平移 → 旋转 → 缩放，整个数组一次完成
+
+        coordinate_transform:
+            source_crs/target_crs  配置后先用 pyproj 重投影（如 EPSG:4547 → EPSG:4326）
+            x_shift/y_shift        平移量（在重投影后的坐标系中）
+            rotation               逆时针旋转角度（度），绕 rotation_origin（平移后的坐标，默认原点）
+            scale                  缩放系数，或 [sx, sy]
+
+        全程以 float64 计算再转换为输出精度，避免大地坐标（如 3500000）在单精度下丢失精度。
+        """
+        transform = self.config.get('coordinate_transform', {})
+        xy = np.asarray(xy, dtype=np.float64)[:, :2]
+
+        source_crs, target_crs = transform.get('source_crs'), transform.get('target_crs')
+        if source_crs and target_crs:
+            try:
+                from pyproj import Transformer
+            except ImportError:
+                raise ImportError("坐标重投影需要安装 pyproj: pip install pyproj")
+            # Transformer 不能跨线程共享，每次变换单独创建（每个网格只变换一次）
+            transformer = Transformer.from_crs(source_crs, target_crs, always_xy=True)
+            xy = np.column_stack(transformer.transform(xy[:, 0], xy[:, 1]))
+
+        xy = xy - (transform.get('x_shift', 0), transform.get('y_shift', 0))
+
+        rotation = transform.get('rotation', 0) or 0
+        if rotation:
+            origin = np.asarray(transform.get('rotation_origin') or (0.0, 0.0), dtype=np.float64)
+            angle = np.deg2rad(rotation)
+            matrix = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+            xy = (xy - origin) @ matrix.T + origin
+
+        scale = transform.get('scale', 1)
+        if np.any(np.asarray(scale) != 1):
+            xy = xy * np.asarray(scale, dtype=np.float64)
+
+        return xy.astype(self._output_dtype(), copy=False)
+
+    def vector_rotation(self, xy: Optional[np.ndarray] = None):
+        """
+        模型坐标系中的矢量在输出坐标系中的逆时针转角（弧度），与 transform_coordinates 对应
+
+        rotation 对所有点转角相同；配置重投影时另加各点的子午线收敛角：由模型坐标 x 方向的微小位移
+        在目标坐标系中的方向求得（目标为地理坐标时经度差按纬度余弦折算），此时需要提供模型坐标 xy。
+
+        Returns:
+            不需要旋转时返回 None，否则为标量或每点一个的数组
+        """
+        transform = self.config.get('coordinate_transform', {})
+        angle = np.deg2rad(transform.get('rotation', 0) or 0)
+
+        source_crs, target_crs = transform.get('source_crs'), transform.get('target_crs')
+        if source_crs and target_crs:
+            if xy is None:
+                raise ValueError("重投影时旋转流速矢量需要模型坐标")
+            try:
+                from pyproj import Transformer
+            except ImportError:
+                raise ImportError("坐标重投影需要安装 pyproj: pip install pyproj")
+            transformer = Transformer.from_crs(source_crs, target_crs, always_xy=True)
+            xy = np.asarray(xy, dtype=np.float64)[:, :2]
+            step = 1e-6 * np.maximum(np.abs(xy[:, 0]), 1.0)
+            x0, y0 = transformer.transform(xy[:, 0], xy[:, 1])
+            x1, y1 = transformer.transform(xy[:, 0] + step, xy[:, 1])
+            dx, dy = np.subtract(x1, x0), np.subtract(y1, y0)
+            if transformer.target_crs.is_geographic:
+                dx = dx * np.cos(np.deg2rad(y0))
+            return angle + np.arctan2(dy, dx)
+        return angle if angle else None
+
+    @staticmethod
+    def rotate_vectors(u: np.ndarray, v: np.ndarray, angle) -> Tuple[np.ndarray, np.ndarray]:
+        """把 (u, v) 逆时针旋转 angle（弧度，标量或对应最后一维的数组），保持输入精度"""
+        u, v = np.asarray(u), np.asarray(v)
+        cos, sin = np.cos(angle), np.sin(angle)
+        return (u * cos - v * sin).astype(u.dtype, copy=False), (u * sin + v * cos).astype(v.dtype, copy=False)
+
+    def _dataset_vector_rotation(self, ds, values: np.ndarray):
+        """数据集各列（单元或节点）的矢量转角，重投影时按网格、数据位置和变换参数缓存"""
+        transform = self.config.get('coordinate_transform', {})
+        if not (transform.get('source_crs') and transform.get('target_crs')):
+            return self.vector_rotation()
+
+        geometry = ds.geometry
+        if not hasattr(geometry, 'node_coordinates'):
+            # 只读取了一个单元
+            return self.vector_rotation(np.array([[geometry.x, geometry.y]]))
+        mesh = self.get_mesh(geometry)
+        n_columns = np.shape(values)[-1]
+        if n_columns == len(mesh['elem_xy']):
+            location = 'elem_xy'
+        elif n_columns == len(mesh['node_xy']):
+            location = 'node_xy'
+        else:
+            raise ValueError(f"数据长度 {n_columns} 与网格不匹配")
+        key = (repr(sorted(transform.items())), location)
+        with self._cache_lock:
+            cache = mesh.setdefault('vector_rotation', {})
+            angle = cache.get(key)
+        if angle is None:
+            angle = self.vector_rotation(mesh[location])
+            with self._cache_lock:
+                angle = cache.setdefault(key, angle)
+        return angle
+
+    def transformed_mesh(self, mesh: Dict) -> Dict[str, np.ndarray]:
+        """
+        变换后的节点与单元中心坐标，按网格和变换参数缓存，全场与区域输出共用
+
+        Returns:
+            包含 node_xy、elem_xy 的字典（输出精度）
+        """
+        transform = self.config.get('coordinate_transform', {})
+        key = (repr(sorted(transform.items())), str(self._output_dtype()))
+        with self._cache_lock:
+            cache = mesh.setdefault('transformed', {})
+            transformed = cache.get(key)
+        if transformed is not None:
+            return transformed
+
+        with self._stage('transform'):
+            transformed = {'node_xy': self.transform_coordinates(mesh['node_xy']),
+                           'elem_xy': self.transform_coordinates(mesh['elem_xy'])}
+        with self._cache_lock:
+            transformed = cache.setdefault(key, transformed)
+        return transformed
+
+    @staticmethod
+    def _time_axis(ds, n_steps: int) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """
+        数据集各时间步的时间及距首个时间步的秒数
+
+        Returns:
+            (datetime64 数组或 None, 秒数数组)，无法获取时间时秒数取时间步序号
+        """
+        try:
+            times = np.asarray(ds.time, dtype='datetime64[ms]')[:n_steps]
+        except Exception:
+            times = None
+        if times is None or len(times) != n_steps:
+            return None, np.arange(n_steps, dtype=np.float64)
+        return times, (times - times[0]) / np.timedelta64(1, 's')
+
+    @staticmethod
+    def _dataset_time(ds):
+        """数据集的（首个）时间，无法获取时返回 None"""
+        try:
+            return np.datetime64(ds.time[0], 'ms')
+        except Exception:
+            return None
+
+    def gradient_operator(self, mesh: Dict, location: str = 'cell') -> Tuple["scipy.sparse.csr_matrix", "scipy.sparse.csr_matrix"]:
+        """
+        稀疏梯度算子，按网格、数据位置、插值方法和输出精度缓存
+
+        单元中心数据先按 node_interpolation 插值到节点，再按三角形线性形函数求单元梯度：G = B·W；
+        节点数据求单元梯度后再插值回节点：G = W·B。
+
+        Returns:
+            (Gx, Gy)：梯度 = G @ 变量值，输入输出位置相同
+        """
+        scheme = self.config.get('output_settings', {}).get('interpolation', 'mean')
+        dtype = self._output_dtype()
+        key = (location, scheme, str(dtype))
+        with self._cache_lock:
+            cache = mesh.setdefault('gradient', {})
+            cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        import derived
+        from scipy import sparse
+
+        if len(mesh['elem_tab']) != len(mesh['elem_xy']):
+            raise ValueError("网格包含非三角形单元，无法计算梯度")
+        nodes_keep, _, weights = self.node_interpolation(mesh)
+        weights = weights.astype(np.float64)
+        n_nodes = len(mesh['node_xy'])
+        bx, by = derived.gradient_operators(mesh['node_xy'][:, :2], mesh['elem_tab'])
+        if location == 'cell':
+            operators = tuple((b[:, nodes_keep] @ weights).tocsr() for b in (bx, by))
+        else:
+            scatter = sparse.csr_matrix((np.ones(len(nodes_keep)), (nodes_keep, np.arange(len(nodes_keep)))),
+                                        shape=(n_nodes, len(nodes_keep)))
+            operators = tuple((scatter @ weights @ b).tocsr() for b in (bx, by))
+        operators = tuple(g.astype(dtype) for g in operators)
+
+        with self._cache_lock:
+            operators = cache.setdefault(key, operators)
+        return operators
+
+    def _variable_context(self, ds):
+        """
+        数据集的变量求值上下文（派生变量按需计算），同一文件处理过程中复用，避免重复计算
+        """
+        context = getattr(self._file_local, 'variables', None)
+        if context is not None and context.ds is ds:
+            return context
+
+        import derived
+        context = derived.VariableContext(
+            ds, dtype=np.float32 if self._output_dtype() == np.float32 else None,
+            expressions=self.config.get('derived_variables') or {},
+            mesh_loader=lambda: self.get_mesh(ds.geometry),
+            gradient_loader=lambda location: self.gradient_operator(self.get_mesh(ds.geometry), location))
+        self._file_local.variables = context
+        return context
+
+    def output_variable_names(self) -> List[str]:
+        """
+        输出的变量列：output_settings.variables（默认 u/v/w/velocity），
+        再追加 output_settings.derived 中请求的派生变量
+
+        变量可以是 dfsu 数据项（名称或别名 u/v/w/h/eta，空格可写作下划线）、派生变量或自定义表达式。
+        """
+        output_settings = self.config.get('output_settings', {})
+        names = list(output_settings.get('variables') or ["u", "v", "w", "velocity"])
+        for name in output_settings.get('derived') or []:
+            if name not in names:
+                names.append(name)
+        return names
+
+    def required_items(self, item_names: List[str]) -> List[str]:
+        """
+        根据启用的输出确定需要从文件读取的数据项，未使用的数据项不再读取
+
+        Args:
+            item_names: 文件中的数据项名称
+
+        Returns:
+            需要读取的数据项名称（按文件顺序）
+        """
+        import derived
+
+        output_settings = self.config.get('output_settings', {})
+        names = list(self.output_variable_names())
+        if output_settings.get('export_regions', True) and self.config.get('regions'):
+            names += ['u', 'v']  # 区域输出的轴线投影 Vx、Vy
+        for section_config in (self.config.get('cross_sections') or {}).values():
+            names += ['u', 'v', 'velocity']
+            depth_item = section_config.get('depth_item', 'Total water depth')
+            if depth_item in item_names:
+                names.append(depth_item)
+        return derived.required_items(names, item_names, self.config.get('derived_variables') or {})
+
+    def _uses_mesh(self, item_names: List[str]) -> bool:
+        """输出变量（含自定义表达式的间接依赖）是否需要完整网格，需要时不能只读取部分单元"""
+        import derived
+
+        return derived.uses_mesh(self.output_variable_names(), item_names,
+                                 self.config.get('derived_variables') or {})
+
+    def _read_variables(self, ds) -> Tuple[List[str], List[np.ndarray]]:
+        """
+        读取输出变量，只计算被请求的派生变量
+
+        Returns:
+            (变量名列表, 对应的数组列表)
+        """
+        context = self._variable_context(ds)
+        names = self.output_variable_names()
+        with self._stage('derived'):
+            arrays = [context[name] for name in names]
+        if 'u' in names and 'v' in names:
+            # 坐标旋转或重投影时 u/v 分量随坐标一起旋转到输出坐标系
+            iu, iv = names.index('u'), names.index('v')
+            angle = self._dataset_vector_rotation(ds, arrays[iu])
+            if angle is not None:
+                arrays = list(arrays)
+                arrays[iu], arrays[iv] = self.rotate_vectors(arrays[iu], arrays[iv], angle)
+        return names, arrays
+
+    def _read_velocity(self, ds) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """读取 u/v/w 分量并计算流速大小，单精度模式下保持 float32"""
+        context = self._variable_context(ds)
+        return context['u'], context['v'], context['w'], context['velocity']
+
+    def _write_output(self, key: str, fn, *args, on_done=None, nbytes: Optional[int] = None):
+        """
+        写出输出文件：存在后台写出线程时排队异步写出，否则立即写出
+
+        Args:
+            key: 输出标识（full_field 或 region:名称），写出失败时据此标记结果
+            fn: 写出函数，其余位置参数原样传入
+            on_done: 写出成功后的回调（用于输出完成日志）
+            nbytes: 待写出数据量，用于写出缓冲限流，默认为参数中数组大小之和
+        """
+        writer = getattr(self._file_local, 'writer', None)
+        if writer is None:
+            fn(*args)
+            if on_done is not None:
+                on_done()
+            return
+        if nbytes is None:
+            nbytes = sum(a.nbytes for a in args if isinstance(a, np.ndarray))
+        writer.submit(key, nbytes, fn, *args, on_done=on_done)
+
+    def _output_formats(self) -> List[str]:
+        """配置的输出格式列表（output_settings.format 可为单个格式或列表）"""
+        formats = self.config.get('output_settings', {}).get('format', 'tecplot')
+        formats = [formats] if isinstance(formats, str) else list(formats)
+        unknown = [f for f in formats if f not in OUTPUT_FORMATS]
+        if unknown:
+            raise ValueError(f"不支持的输出格式: {', '.join(unknown)}（可选 {', '.join(OUTPUT_FORMATS)}）")
+        return formats
+
+    def _write_field(self, key: str, out_base: Path, xy: np.ndarray, conn: Optional[np.ndarray],
+                     names: List[str], values: np.ndarray, title: str, location: str, on_done=None,
+                     ids: Optional[np.ndarray] = None, time_value=None, suffix: str = ""):
+        """
+        按配置的全部输出格式写出同一份内存数据（一次读取、多种格式）
+
+        _process_steps 逐时间步输出期间，SERIES_FORMATS 中的格式追加到该输出的时间序列文件
+        （out_base + 扩展名），其余格式每个时间步写一个文件（out_base + suffix + 扩展名）。
+
+        Args:
+            key: 输出标识，见 _write_output
+            out_base: 不含扩展名和时间步后缀的输出路径
+            xy: 已平移的点坐标
+            conn: 三角形连接表（从0开始），散点输出时为 None
+            names: 变量名（不含 X、Y）
+            values: 变量值，形状 (点数或单元数, 变量数)
+            location: 'node' 节点变量 / 'cell' 单元中心变量 / 'point' 散点
+            on_done: 全部格式写出后的回调，参数为输出文件名列表
+            ids: 每行数据对应的原始单元（cell/point）或节点（node）编号，用于列式输出
+            time_value: 数据时间（datetime64），用于列式输出与 XDMF 时间
+            suffix: 每个时间步一个文件时附加在文件名后的时间步后缀
+        """
+        formats = self._output_formats()
+        output_settings = self.config.get('output_settings', {})
+        # 线程局部状态在提交线程中取出，写出任务可能在后台线程执行
+        series = getattr(self._file_local, 'series', None)
+        series_chunk = getattr(self._file_local, 'series_chunk', None)
+        origin = getattr(self._file_local, 'time_origin', None)
+        # XDMF 时间：距文件首个时间步的秒数
+        seconds = (float((time_value - origin) / np.timedelta64(1, 's'))
+                   if time_value is not None and origin is not None else 0.0)
+        step_base = out_base.with_name(out_base.name + suffix)
+
+        def write_all():
+            files = []
+            for fmt in formats:
+                if fmt == 'tecplot':
+                    out_path = step_base.with_name(step_base.name + '.dat')
+                    var_names = ["X", "Y"] + list(names)
+                    if location == 'cell':
+                        self.write_tecplot_cellcentered(out_path, xy, conn, values, title, var_names=var_names)
+                    elif location == 'point':
+                        self.write_tecplot_elements(out_path, xy, np.column_stack([xy, values]), title,
+                                                    var_names=var_names)
+                    else:
+                        self.write_tecplot_nodes(out_path, xy, conn, np.column_stack([xy, values]), title,
+                                                 var_names=var_names)
+                    out_path = self._text_output_path(out_path)
+                elif fmt == 'vtu':
+                    import exporters
+                    out_path = step_base.with_name(step_base.name + '.vtu')
+                    with self._stage('write'):
+                        exporters.write_vtu(out_path, xy, conn, names, values, location)
+                elif fmt == 'xdmf':
+                    import exporters
+                    with self._stage('write'):
+                        if series is None:
+                            out_path = step_base.with_name(step_base.name + '.xmf')
+                            exporters.write_xdmf(out_path, xy, conn, names, values, location, seconds)
+                        else:
+                            # 几何只在创建时写入一次，之后每个时间步只追加变量
+                            out_path = out_base.with_name(out_base.name + '.xmf')
+                            series_writer = series.get((key, fmt))
+                            if series_writer is None:
+                                series_writer = exporters.XdmfTimeSeriesWriter(
+                                    out_path, xy, conn, location, resumable=series_chunk is not None)
+                                series[(key, fmt)] = series_writer
+                            series_writer.append(seconds, names, values, start=series_chunk or 0)
+                else:
+                    import exporters
+                    # 单元中心变量对应的坐标取三角形形心
+                    value_xy = xy[conn].mean(axis=1) if location == 'cell' else xy
+                    row_ids = ids if ids is not None else np.arange(len(values))
+                    id_name = 'node_id' if location == 'node' else 'element_id'
+                    compression = output_settings.get('parquet_compression', 'zstd')
+                    with self._stage('write'):
+                        if series is None:
+                            out_path = step_base.with_name(step_base.name + '.parquet')
+                            exporters.write_parquet(out_path, value_xy, names, values, row_ids, id_name,
+                                                    time_value, compression)
+                        else:
+                            # 每个时间步块写成一个行组，见 _process_steps
+                            out_path = out_base.with_name(out_base.name + '.parquet')
+                            series_writer = series.get((key, fmt))
+                            if series_writer is None:
+                                series_writer = exporters.ParquetTimeSeriesWriter(
+                                    out_path, names, id_name, compression, resumable=series_chunk is not None)
+                                series[(key, fmt)] = series_writer
+                            series_writer.append(value_xy, values, row_ids, time_value, start=series_chunk or 0)
+                files.append(out_path.name)
+            if on_done is not None:
+                on_done(files)
+
+        self._write_output(key, write_all, nbytes=xy.nbytes + values.nbytes)
+
+    def _text_output_path(self, out_path: Path) -> Path:
+        """按 output_settings.compression 加上压缩后缀的实际输出路径"""
+        method = self.config.get('output_settings', {}).get('compression', 'none') or 'none'
+        if method not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"不支持的压缩方式: {method}（可选 {', '.join(COMPRESSION_SUFFIXES)}）")
+        return out_path.with_name(out_path.name + COMPRESSION_SUFFIXES[method])
+
+    @contextlib.contextmanager
+    def _open_text_output(self, out_path: Path):
+        """
+        打开ASCII输出流，按 output_settings.compression 直接流式压缩写出（不产生未压缩的临时文件）
+
+        gzip 使用标准库；zstd 需要 zstandard 包，compression_threads 控制压缩线程数（-1 为全部核心）。
+        写完后输出压缩比与吞吐量。先写入同目录的 .part 文件，完整写完后再原子重命名为最终文件名，
+        中断时不会留下不完整的输出文件。
+        """
+        import exporters
+
+        settings = self.config.get('output_settings', {})
+        method = settings.get('compression', 'none') or 'none'
+        final_path = self._text_output_path(out_path)
+        if method == 'none':
+            with exporters.atomic_output(final_path) as part_path, open(part_path, "w", encoding='utf-8') as f:
+                yield f
+            return
+
+        level = settings.get('compression_level')
+        start = time.perf_counter()
+        with exporters.atomic_output(final_path) as part_path, open(part_path, 'wb') as raw:
+            if method == 'gzip':
+                import gzip
+                compressor = gzip.GzipFile(filename=out_path.name, mode='wb', fileobj=raw,
+                                           compresslevel=6 if level is None else level)
+            else:
+                try:
+                    import zstandard
+                except ImportError:
+                    raise ImportError("zstd 压缩需要安装 zstandard: pip install zstandard")
+                cctx = zstandard.ZstdCompressor(level=3 if level is None else level,
+                                                threads=settings.get('compression_threads', -1))
+                compressor = cctx.stream_writer(raw, closefd=False)
+
+            counter = _CountingStream(compressor)
+            with io.TextIOWrapper(io.BufferedWriter(counter, buffer_size=1 << 20), encoding='utf-8') as f:
+                yield f
+
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        compressed = final_path.stat().st_size
+        self.logger.info(f"🗜️ {final_path.name}: {counter.bytes_written / 1e6:.1f} MB → {compressed / 1e6:.1f} MB "
+                         f"(压缩比 {counter.bytes_written / max(compressed, 1):.1f}x, "
+                         f"{counter.bytes_written / 1e6 / elapsed:.1f} MB/s)")
+
+    def _default_var_names(self, n_columns: int) -> List[str]:
+        """未指定变量名时的Tecplot变量名：X, Y, 输出变量列，多出的两列为区域轴线投影 Vx, Vy"""
+        var_names = ["X", "Y"] + self.output_variable_names()
+        if n_columns > len(var_names):
+            var_names.extend(["Vx", "Vy"])
+        return var_names[:n_columns]
+
     def write_tecplot_elements(self, out_path: Path, elem_xy: np.ndarray,
-                              variables: np.ndarray, title: str = "MIKE21 Data"):
+                              variables: np.ndarray, title: str = "MIKE21 Data",
+                              var_names: Optional[List[str]] = None):
         """输出单元中心数据到Tecplot格式"""
         precision = self.config.get('output_settings', {}).get('precision', 6)
         variables = np.nan_to_num(variables, nan=0.0)
 
-        with open(out_path, "w", encoding='utf-8') as f:
+        with self._stage('write'), self._open_text_output(out_path) as f:
             f.write(f'TITLE = "{title}"\n')
-            var_names = ["X", "Y", "u", "v", "w", "velocity"]
-            if variables.shape[1] > 6:
-                var_names.extend(["Vx", "Vy"])
+            if var_names is None:
+                var_names = self._default_var_names(variables.shape[1])
             f.write('VARIABLES = ' + ', '.join(f'"{v}"' for v in var_names) + '\n')
             f.write(f'ZONE I={len(elem_xy)}, DATAPACKING=POINT\n')
             for row in variables:
@@ -124,16 +1479,15 @@ class MIKE21Converter:
 
     def write_tecplot_nodes(self, out_path: Path, node_xy: np.ndarray,
                            conn_reindex: np.ndarray, variables: np.ndarray,
-                           title: str = "MIKE21 Data"):
+                           title: str = "MIKE21 Data", var_names: Optional[List[str]] = None):
         """输出节点数据到Tecplot格式"""
         precision = self.config.get('output_settings', {}).get('precision', 6)
         variables = np.nan_to_num(variables, nan=0.0)
 
-        with open(out_path, "w", encoding='utf-8') as f:
+        with self._stage('write'), self._open_text_output(out_path) as f:
             f.write(f'TITLE = "{title}"\n')
-            var_names = ["X", "Y", "u", "v", "w", "velocity"]
-            if variables.shape[1] > 6:
-                var_names.extend(["Vx", "Vy"])
+            if var_names is None:
+                var_names = self._default_var_names(variables.shape[1])
             f.write('VARIABLES = ' + ', '.join(f'"{v}"' for v in var_names) + '\n')
             f.write(f'ZONE N={len(node_xy)}, E={len(conn_reindex)}, F=FEPOINT, ET=TRIANGLE\n')
             for row in variables:
@@ -141,129 +1495,277 @@ class MIKE21Converter:
             for tri in conn_reindex:
                 f.write(f"{tri[0]+1} {tri[1]+1} {tri[2]+1}\n")
 
-    def process_full_field(self, ds, dfsu_path: Path, out_dir: Path) -> bool:
-        """处理全场数据输出"""
+    def write_tecplot_cellcentered(self, out_path: Path, node_xy: np.ndarray,
+                                   conn: np.ndarray, cell_values: np.ndarray,
+                                   title: str = "MIKE21 Data", var_names: Optional[List[str]] = None):
+        """
+        输出单元中心数据到Tecplot有限元分区（BLOCK格式，变量位于单元中心）
+
+        Args:
+            node_xy: 节点坐标（已平移），形状 (节点数, 2)
+            conn: 三角形连接表（从0开始编号）
+            cell_values: 单元变量，形状 (单元数, 变量数)
+            var_names: 变量名（含 X、Y），默认按 output_settings.variables
+        """
+        precision = self.config.get('output_settings', {}).get('precision', 6)
+        cell_values = np.nan_to_num(cell_values, nan=0.0)
+
+        with self._stage('write'), self._open_text_output(out_path) as f:
+            f.write(f'TITLE = "{title}"\n')
+            if var_names is None:
+                var_names = self._default_var_names(2 + cell_values.shape[1])
+            f.write('VARIABLES = ' + ', '.join(f'"{v}"' for v in var_names) + '\n')
+            f.write(f'ZONE N={len(node_xy)}, E={len(conn)}, DATAPACKING=BLOCK, ZONETYPE=FETRIANGLE, '
+                    f'VARLOCATION=([3-{len(var_names)}]=CELLCENTERED)\n')
+            for block in (node_xy[:, 0], node_xy[:, 1], *cell_values.T):
+                f.write("\n".join(f"{v:.{precision}f}" for v in block) + "\n")
+            for tri in conn:
+                f.write(f"{tri[0]+1} {tri[1]+1} {tri[2]+1}\n")
+
+    def write_tecplot_probes(self, out_path: Path, probe_names: List[str], seconds: np.ndarray,
+                             values: np.ndarray, var_names: List[str], title: str = "MIKE21 测点时间序列"):
+        """
+        输出测点时间序列到Tecplot格式，每个测点一个I有序分区
+
+        Args:
+            probe_names: 测点名称
+            seconds: 各时间步距首个时间步的秒数
+            values: 变量值，形状 (时间步数, 测点数, 变量数)
+        """
+        zones = [(name, np.column_stack([seconds, values[:, i, :]]), None) for i, name in enumerate(probe_names)]
+        self.write_tecplot_line_zones(out_path, zones, ["t"] + list(var_names), title)
+
+    def write_tecplot_line_zones(self, out_path: Path, zones: List[Tuple[str, np.ndarray, Optional[float]]],
+                                 var_names: List[str], title: str = "MIKE21 Data"):
+        """
+        输出若干I有序分区（曲线数据）到Tecplot格式
+
+        Args:
+            zones: (分区名, 形状 (点数, 变量数) 的数组, SOLUTIONTIME 或 None) 列表
+        """
+        precision = self.config.get('output_settings', {}).get('precision', 6)
+
+        with self._stage('write'), self._open_text_output(out_path) as f:
+            f.write(f'TITLE = "{title}"\n')
+            f.write('VARIABLES = ' + ', '.join(f'"{v}"' for v in var_names) + '\n')
+            for name, rows, solution_time in zones:
+                header = f'ZONE T="{name}", I={len(rows)}, DATAPACKING=POINT'
+                if solution_time is not None:
+                    header += f', STRANDID=1, SOLUTIONTIME={solution_time:g}'
+                f.write(header + '\n')
+                for row in np.nan_to_num(rows, nan=0.0):
+                    f.write(" ".join(f"{v:.{precision}f}" for v in row) + "\n")
+
+    def write_tecplot_ij(self, out_path: Path, n_i: int, n_j: int, xy: np.ndarray,
+                         zones: List[Tuple[str, np.ndarray, Optional[float]]], var_names: List[str],
+                         title: str = "MIKE21 Data"):
+        """
+        输出规则网格数据到Tecplot有序分区（ZONE I=, J=，BLOCK格式）
+
+        Args:
+            n_i, n_j: I、J 方向的点数
+            xy: 已变换的网格点坐标，形状 (网格点数, 2)，按 I 优先排列（旋转或重投影后不再与坐标轴平行）
+            zones: (分区名, 形状 (网格点数, 变量数) 的数组, SOLUTIONTIME 或 None) 列表，网格点按 I 优先排列；
+                   第二个分区起通过 VARSHARELIST 共用第一个分区的坐标
+        """
+        precision = self.config.get('output_settings', {}).get('precision', 6)
+
+        with self._stage('write'), self._open_text_output(out_path) as f:
+            f.write(f'TITLE = "{title}"\n')
+            f.write('VARIABLES = ' + ', '.join(f'"{v}"' for v in ["X", "Y"] + list(var_names)) + '\n')
+            for k, (name, values, solution_time) in enumerate(zones):
+                header = f'ZONE T="{name}", I={n_i}, J={n_j}, DATAPACKING=BLOCK'
+                if solution_time is not None:
+                    header += f', STRANDID=1, SOLUTIONTIME={solution_time:g}'
+                blocks = list(np.nan_to_num(values, nan=0.0).T)
+                if k == 0:
+                    blocks = [xy[:, 0], xy[:, 1]] + blocks
+                else:
+                    header += ', VARSHARELIST=([1,2]=1)'
+                f.write(header + '\n')
+                for block in blocks:
+                    f.write("\n".join(f"{v:.{precision}f}" for v in block) + "\n")
+
+    def process_full_field(self, ds, dfsu_path: Path, out_dir: Path, suffix: str = "") -> Optional[bool]:
+        """
+        处理全场数据输出（suffix 附加在输出文件名后，多时间步时区分各时间步）
+
+        Returns:
+            未启用全场输出时返回 None，否则返回是否成功
+        """
         if not self.config.get('output_settings', {}).get('export_full_field', True):
-            return False
+            return None
 
         try:
+            mode = self.config.get('output_settings', {}).get('full_field_mode', 'points')
+            if mode not in FULL_FIELD_MODES:
+                raise ValueError(f"不支持的全场输出方式: {mode}（可选 {', '.join(FULL_FIELD_MODES)}）")
+
+            # 裁剪范围内的单元，None 表示输出整个网格
+            mesh = self.get_mesh(ds.geometry)
+            subset = getattr(self._file_local, 'element_subset', None)
+            if subset is not None:
+                # 读取时已只读取裁剪所需的单元，数据集的编号是子集内的编号
+                clip_idx = np.searchsorted(subset[0], subset[2])
+            else:
+                clip_idx = self.clip_elements(mesh)
+                if clip_idx is not None and len(clip_idx) == 0:
+                    raise ValueError("裁剪范围内没有单元")
+                if clip_idx is not None and np.shape(ds[0].values)[-1] == len(mesh['elem_xy']):
+                    # 读取了完整网格时先取出裁剪所需单元的原始数据，变量只在子集上计算
+                    subset_elements, subset_nodes = self.clip_subset(
+                        mesh, ds.geometry, clip_idx, [item.name for item in ds.items])
+                    subset = (subset_elements, subset_nodes, clip_idx)
+                    ds = ds.isel(subset_elements, axis='space')
+                    mesh = self.get_mesh(ds.geometry)
+                    clip_idx = np.searchsorted(subset_elements, clip_idx)
+
             # 读取速度数据
-            u = ds["U velocity"].values
-            v = ds["V velocity"].values
-            w = ds["W velocity"].values if "W velocity" in ds.items else np.zeros_like(u)
-            velocity = np.sqrt(u**2 + v**2 + w**2)
+            names, arrays = self._read_variables(ds)
+            u = arrays[0]
 
             # 获取几何信息
-            node_xy_all = np.array(ds.geometry.node_coordinates)
-            elem_xy = np.array(ds.geometry.element_coordinates)
-            elem_tab = np.array([np.array(e, dtype=int) for e in ds.geometry.element_table if len(e) == 3])
+            node_xy_all, elem_xy, elem_tab = mesh['node_xy'], mesh['elem_xy'], mesh['elem_tab']
 
-            # 坐标变换参数
-            x_shift = self.config.get('coordinate_transform', {}).get('x_shift', 0)
-            y_shift = self.config.get('coordinate_transform', {}).get('y_shift', 0)
-
-            if u.shape[0] == elem_xy.shape[0]:
+            out_base = out_dir / f"{dfsu_path.stem}_allfield"
+            elem_ids = np.arange(len(elem_xy)) if clip_idx is None else clip_idx
+            if clip_idx is None or u.shape[0] != elem_xy.shape[0]:
+                cell_arrays = arrays
+            else:
+                cell_arrays = [a[clip_idx] for a in arrays]
+
+            if u.shape[0] == elem_xy.shape[0] and mode != 'points':
+                # 单元中心数据直接输出为有限元分区，Tecplot 可直接绘制等值线
+                if len(elem_tab) != len(elem_xy):
+                    raise ValueError("网格包含非三角形单元，无法输出有限元分区，请使用 full_field_mode: points")
+                node_xy_all_out = self.transformed_mesh(mesh)['node_xy']
+                if mode == 'nodes':
+                    # 使用缓存的单元→节点插值矩阵（裁剪时只用范围内的单元）
+                    with self._stage('interpolation'):
+                        nodes_keep, conn, weights = self.node_interpolation(mesh, clip_idx)
+                        node_values = self.interpolate_to_nodes(weights, *cell_arrays)
+                    xy_out, ids = node_xy_all_out[nodes_keep], nodes_keep
+                    values = np.column_stack(node_values)
+                    location, title, label = 'node', "MIKE21 全场流速矢量(单元插值到节点)", "插值到节点"
+                else:
+                    if clip_idx is None:
+                        xy_out, conn = node_xy_all_out, elem_tab
+                    else:
+                        nodes_keep = np.unique(elem_tab[clip_idx])
+                        xy_out, conn = node_xy_all_out[nodes_keep], np.searchsorted(nodes_keep, elem_tab[clip_idx])
+                    ids = elem_ids
+                    values = np.column_stack(cell_arrays)
+                    location, title, label = 'cell', "MIKE21 全场流速矢量(单元中心)", "单元中心FE"
+                summary = f"节点数: {len(xy_out)}, 单元数: {len(conn)}"
+
+            elif u.shape[0] == elem_xy.shape[0]:
                 # 单元中心数据
-                out_all = out_dir / f"{dfsu_path.stem}_allfield.dat"
-                elem_xy_out = elem_xy.copy()
-                elem_xy_out[:, 0] -= x_shift
-                elem_xy_out[:, 1] -= y_shift
-                vars_all = np.column_stack([elem_xy_out[:, 0], elem_xy_out[:, 1], u, v, w, velocity])
-                self.write_tecplot_elements(out_all, elem_xy_out, vars_all,
-                                          "MIKE21 全场流速矢量(单元中心)")
-                self.logger.info(f"✅ 全场输出(单元中心): {out_all.name}, 数据点数: {len(elem_xy_out)}")
+                xy_out, conn, ids = self.transformed_mesh(mesh)['elem_xy'][elem_ids], None, elem_ids
+                values = np.column_stack(cell_arrays)
+                location, title, label = 'point', "MIKE21 全场流速矢量(单元中心)", "单元中心"
+                summary = f"数据点数: {len(xy_out)}"
 
             elif u.shape[0] == node_xy_all.shape[0]:
-                # 节点数据
-                out_all = out_dir / f"{dfsu_path.stem}_allfield.dat"
-                node_xy_all_out = node_xy_all.copy()
-                node_xy_all_out[:, 0] -= x_shift
-                node_xy_all_out[:, 1] -= y_shift
-                vars_all = np.column_stack([node_xy_all_out[:, 0], node_xy_all_out[:, 1], u, v, w, velocity])
-                self.write_tecplot_nodes(out_all, node_xy_all_out, elem_tab, vars_all,
-                                       "MIKE21 全场流速矢量(节点)")
-                self.logger.info(f"✅ 全场输出(节点): {out_all.name}, 节点数: {len(node_xy_all_out)}, 单元数: {len(elem_tab)}")
+                # 节点数据（裁剪时保留范围内单元的节点并重新编号）
+                if clip_idx is None:
+                    ids, conn = np.arange(len(node_xy_all)), elem_tab
+                else:
+                    ids = np.unique(elem_tab[clip_idx])
+                    conn = np.searchsorted(ids, elem_tab[clip_idx])
+                xy_out = self.transformed_mesh(mesh)['node_xy'][ids]
+                values = np.column_stack([a[ids] for a in arrays])
+                location, title, label = 'node', "MIKE21 全场流速矢量(节点)", "节点"
+                summary = f"节点数: {len(xy_out)}, 单元数: {len(conn)}"
             else:
                 raise ValueError(f"数据维度不匹配: 节点数{node_xy_all.shape[0]}, 单元数{elem_xy.shape[0]}, 速度场长度{u.shape[0]}")
 
+            # 在裁剪子集上处理时数据集的编号是子集内的编号，换回原始网格编号，保证各次运行一致
+            if subset is not None:
+                subset_elements, subset_nodes = subset[:2]
+                if location == 'node' and len(subset_nodes) == len(node_xy_all):
+                    ids = subset_nodes[ids]
+                elif location != 'node' and len(subset_elements) == len(elem_xy):
+                    ids = subset_elements[ids]
+
+            self._write_field('full_field', out_base, xy_out, conn, names,
+                              values.astype(self._output_dtype(), copy=False), title, location,
+                              on_done=lambda files: self.logger.info(
+                                  f"✅ 全场输出({label}): {', '.join(files)}, {summary}"),
+                              ids=ids, time_value=self._dataset_time(ds), suffix=suffix)
             return True
 
         except Exception as e:
             self.logger.error(f"全场处理失败: {e}")
             return False
 
-    def process_regions(self, ds, dfsu_path: Path, out_dir: Path) -> Dict[str, bool]:
-        """处理区域数据输出"""
-        if not self.config.get('output_settings', {}).get('export_regions', True):
+    def process_regions(self, ds, dfsu_path: Path, out_dir: Path, suffix: str = "") -> Dict[str, bool]:
+        """处理区域数据输出（suffix 附加在输出文件名后，多时间步时区分各时间步）"""
+        regions = self.config.get('regions', {})
+        if not self.config.get('output_settings', {}).get('export_regions', True) or not regions:
             return {}
 
         results = {}
-        regions = self.config.get('regions', {})
 
         # 读取数据
-        u = ds["U velocity"].values
-        v = ds["V velocity"].values
-        w = ds["W velocity"].values if "W velocity" in ds.items else np.zeros_like(u)
-        velocity = np.sqrt(u**2 + v**2 + w**2)
+        names, arrays = self._read_variables(ds)
+        context = self._variable_context(ds)
+        u, v = context['u'], context['v']
+        dtype = self._output_dtype()
 
-        node_xy_all = np.array(ds.geometry.node_coordinates)
-        elem_xy = np.array(ds.geometry.element_coordinates)
-        elem_tab = np.array([np.array(e, dtype=int) for e in ds.geometry.element_table if len(e) == 3])
+        mesh = self.get_mesh(ds.geometry)
+        node_xy_all, elem_xy, elem_tab = mesh['node_xy'], mesh['elem_xy'], mesh['elem_tab']
 
-        x_shift = self.config.get('coordinate_transform', {}).get('x_shift', 0)
-        y_shift = self.config.get('coordinate_transform', {}).get('y_shift', 0)
+        # 加载全部区域多边形，一次遍历完成单元标记
+        polygons = {}
+        for name, region_config in regions.items():
+            try:
+                polygons[name] = self.load_closed_polyline(Path(region_config["region_dxf"]))
+            except Exception as e:
+                self.logger.error(f"❌ 区域 {name} 处理失败: {e}")
+                results[name] = False
+        with self._stage('region_labeling'):
+            region_elements = self.label_regions(mesh, polygons)
 
         for name, region_config in regions.items():
+            if name not in polygons:
+                continue
             try:
-                # 加载区域和轴线
-                region_poly = self.load_closed_polyline(Path(region_config["region_dxf"]))
+                # 加载轴线
                 axis_line = self.load_axis_polyline(Path(region_config["axis_dxf"]))
 
-                # 筛选区域内的单元
-                mask_elem = np.array([region_poly.contains(Point(xy[0], xy[1])) for xy in elem_xy])
-                if not mask_elem.any():
+                # 区域内的单元
+                elem_idx = region_elements[name]
+                if len(elem_idx) == 0:
                     self.logger.warning(f"⚠️ 区域 {name} 在 {dfsu_path.name} 中无元素，已跳过该区域。")
                     results[name] = False
                     continue
 
                 # 提取区域数据
-                u_r = u[mask_elem]
-                v_r = v[mask_elem]
-                w_r = w[mask_elem]
-                vel_r = velocity[mask_elem]
-                elem_tab_r = elem_tab[mask_elem]
-                elem_xy_r = elem_xy[mask_elem]
+                arrays_r = [a[elem_idx] for a in arrays]
+                u_r, v_r = u[elem_idx], v[elem_idx]
+                elem_xy_r = elem_xy[elem_idx]
 
                 # 投影到轴线坐标系
                 vx_r, vy_r = self.project_uv_along_axis(elem_xy_r, u_r, v_r, axis_line)
 
-                # 重建连接表
-                nodes_keep = np.unique(elem_tab_r)
-                node_map = {old: new for new, old in enumerate(nodes_keep)}
-                conn_reindex = np.vectorize(node_map.get)(elem_tab_r)
-                node_xy = node_xy_all[nodes_keep]
+                # 重建连接表，并以预计算的稀疏矩阵一次完成单元到节点的插值
+                with self._stage('interpolation'):
+                    nodes_keep, conn_reindex, weights = self.node_interpolation(mesh, elem_idx)
+                    node_xy_out = self.transformed_mesh(mesh)['node_xy'][nodes_keep]
+                    node_values = self.interpolate_to_nodes(weights, *arrays_r, vx_r, vy_r)
 
                 # 构建输出变量
-                vars_region = []
-                for i in range(len(node_xy)):
-                    xi, yi = node_xy[i][:2]
-                    xi -= x_shift
-                    yi -= y_shift
-                    idx_match = np.any(elem_tab_r == nodes_keep[i], axis=1)
-                    u_m = u_r[idx_match].mean()
-                    v_m = v_r[idx_match].mean()
-                    w_m = w_r[idx_match].mean()
-                    vel_m = vel_r[idx_match].mean()
-                    vx_m = vx_r[idx_match].mean()
-                    vy_m = vy_r[idx_match].mean()
-                    vars_region.append([xi, yi, u_m, v_m, w_m, vel_m, vx_m, vy_m])
+                vars_region = np.column_stack(node_values).astype(dtype, copy=False)
 
                 # 输出文件
-                out_region = out_dir / f"{dfsu_path.stem}_{name}.dat"
+                out_region = out_dir / f"{dfsu_path.stem}_{name}"
                 description = region_config.get('description', name)
-                self.write_tecplot_nodes(out_region, node_xy, conn_reindex,
-                                       np.array(vars_region), f"MIKE21 区域: {description}")
-                self.logger.info(f"✅ 区域 {name} 输出: {out_region.name}")
+                self._write_field(f"region:{name}", out_region, node_xy_out, conn_reindex,
+                                  names + ["Vx", "Vy"], vars_region,
+                                  f"MIKE21 区域: {description}", 'node',
+                                  on_done=lambda files, name=name: self.logger.info(
+                                      f"✅ 区域 {name} 输出: {', '.join(files)}"),
+                                  ids=nodes_keep, time_value=self._dataset_time(ds), suffix=suffix)
                 results[name] = True
 
             except Exception as e:
@@ -272,38 +1774,1024 @@ class MIKE21Converter:
 
         return results
 
+    def process_probes(self, ds, dfsu_path: Path, out_dir: Path,
+                       probe_elements: Optional[np.ndarray] = None) -> Optional[bool]:
+        """
+        提取测点时间序列
+
+        测点所在单元只查找一次（按网格缓存），全部时间步通过一次花式索引取出。
+        probe_elements 不为 None 时表示数据集只读取了这些单元（去重升序），据此换算列号。
+
+        Returns:
+            未配置测点时返回 None，否则返回是否成功
+        """
+        probe_names, probe_xy = self.load_probes()
+        if not probe_names:
+            return None
+
+        try:
+            n_columns = None
+            if probe_elements is None:
+                probe_elements = self.locate_probes(self.get_mesh(ds.geometry), probe_xy)
+                columns = probe_elements
+            else:
+                subset = np.unique(probe_elements[probe_elements >= 0])
+                columns = np.searchsorted(subset, probe_elements)
+                # 只读取一个单元时 mikeio 会去掉单元维度，按读取的单元数还原
+                n_columns = len(subset)
+
+            found = probe_elements >= 0
+            for name in np.asarray(probe_names, dtype=object)[~found]:
+                self.logger.warning(f"⚠️ 测点 {name} 不在 {dfsu_path.name} 的网格内，已跳过")
+            if not found.any():
+                return False
+            probe_names = [n for n, ok in zip(probe_names, found) if ok]
+            probe_xy, columns = probe_xy[found], columns[found]
+
+            names, arrays = self._read_variables(ds)
+            if n_columns is None:
+                n_columns = np.shape(arrays[0])[-1]
+            if columns.max() >= n_columns:
+                raise ValueError(f"测点提取需要单元中心数据（数据长度 {n_columns}）")
+            # (时间步数, 测点数, 变量数)
+            values = np.stack([np.reshape(a, (-1, n_columns))[:, columns] for a in arrays], axis=-1)
+            values = values.astype(self._output_dtype(), copy=False)
+
+            times, seconds = self._time_axis(ds, len(values))
+
+            out_base = out_dir / f"{dfsu_path.stem}_probes"
+            formats = self._output_formats()
+
+            def write_all():
+                files = []
+                if 'tecplot' in formats or 'parquet' not in formats:
+                    out_path = out_base.with_name(out_base.name + '.dat')
+                    self.write_tecplot_probes(out_path, probe_names, seconds, values, names)
+                    files.append(self._text_output_path(out_path).name)
+                if 'parquet' in formats:
+                    import exporters
+                    out_path = out_base.with_name(out_base.name + '.parquet')
+                    with self._stage('write'):
+                        writer = exporters.ParquetTimeSeriesWriter(
+                            out_path, names, 'probe_id',
+                            self.config.get('output_settings', {}).get('parquet_compression', 'zstd'))
+                        try:
+                            writer.append(self.transform_coordinates(probe_xy), values,
+                                          np.flatnonzero(found), times)
+                        except BaseException:
+                            writer.abort()
+                            raise
+                        writer.close()
+                    files.append(out_path.name)
+                self.logger.info(f"✅ 测点输出: {', '.join(files)}, 测点数: {len(probe_names)}, "
+                                 f"时间步数: {len(values)}")
+
+            self._write_output('probes', write_all, nbytes=values.nbytes)
+            return True
+
+        except Exception as e:
+            self.logger.error(f"❌ 测点提取失败: {e}")
+            return False
+
+    def process_sections(self, ds, dfsu_path: Path, out_dir: Path) -> Dict[str, bool]:
+        """
+        断面流速剖面与流量
+
+        断面线与网格的相交关系按网格缓存，各时间步的剖面与流量均为数组运算：
+        Q = Σ h·(u·n)·L，h 为 depth_item 水深项（缺失时按单位水深计算），n 为断面切向左侧的单位法向。
+        每个断面输出 <文件名>_<断面>_section.dat（每个时间步一个I有序分区），
+        全部断面的流量过程写入 <文件名>_discharge.dat。
+        """
+        sections = self.config.get('cross_sections') or {}
+        if not sections:
+            return {}
+
+        results = {}
+        u, v, w, velocity = self._read_velocity(ds)
+        mesh = self.get_mesh(ds.geometry)
+        n_columns = np.shape(u)[-1]
+        if n_columns != len(mesh['elem_xy']) or len(mesh['elem_tab']) != len(mesh['elem_xy']):
+            self.logger.error("❌ 断面计算需要三角形网格上的单元中心数据")
+            return dict.fromkeys(sections, False)
+
+        u2, v2, vel2 = (np.reshape(a, (-1, n_columns)) for a in (u, v, velocity))
+        times, seconds = self._time_axis(ds, len(u2))
+        item_names = [getattr(item, 'name', item) for item in ds.items]
+        dtype = self._output_dtype()
+        discharge_zones = []
+
+        for name, section_config in sections.items():
+            try:
+                line = self.load_axis_polyline(Path(section_config["line_dxf"]))
+                geometry = self.section_geometry(mesh, line, section_config.get('n_samples', 101))
+                elem, length, normal = geometry['elem'], geometry['length'], geometry['normal']
+                if len(elem) == 0:
+                    self.logger.warning(f"⚠️ 断面 {name} 与 {dfsu_path.name} 的网格不相交，已跳过该断面。")
+                    results[name] = False
+                    continue
+
+                depth_item = section_config.get('depth_item', 'Total water depth')
+                if depth_item in item_names:
+                    depth = np.reshape(ds[depth_item].values, (-1, n_columns))
+                else:
+                    depth = None
+                    self.logger.warning(f"⚠️ {dfsu_path.name} 中没有 {depth_item}，断面 {name} 的流量按单位水深计算（m²/s）")
+
+                # 流量过程
+                q_normal = u2[:, elem] * normal[:, 0] + v2[:, elem] * normal[:, 1]
+                if depth is None:
+                    discharge = q_normal @ length
+                    area = np.full(len(discharge), length.sum())
+                else:
+                    discharge = (q_normal * depth[:, elem]) @ length
+                    area = depth[:, elem] @ length
+                mean_velocity = np.divide(discharge, area, out=np.zeros_like(discharge), where=area > 0)
+                discharge_zones.append((name, np.column_stack([seconds, discharge, area, mean_velocity]), None))
+
+                # 沿线剖面：Vx 沿断面切向，Vy 沿法向
+                sample_elem, tangent = geometry['sample_elem'], geometry['sample_tangent']
+                us, vs = u2[:, sample_elem], v2[:, sample_elem]
+                # u/v 列与输出坐标一致旋转；Vx、Vy 为相对断面的分量，在模型坐标系中计算
+                angle = self.vector_rotation(geometry['sample_xy'])
+                us_out, vs_out = (us, vs) if angle is None else self.rotate_vectors(us, vs, angle)
+                columns = [us_out, vs_out, vel2[:, sample_elem],
+                           us * tangent[:, 0] + vs * tangent[:, 1], vs * tangent[:, 0] - us * tangent[:, 1]]
+                var_names = ["s", "X", "Y", "u", "v", "velocity", "Vx", "Vy"]
+                if depth is not None:
+                    columns.append(depth[:, sample_elem])
+                    var_names.append("depth")
+                xy_out = self.transform_coordinates(geometry['sample_xy'])
+                fixed = [np.broadcast_to(a, us.shape) for a in (geometry['sample_station'], xy_out[:, 0], xy_out[:, 1])]
+                profile = np.stack(fixed + columns, axis=-1).astype(dtype, copy=False)
+
+                zones = [(f"{name} t={sec:g}s", profile[k], sec) for k, sec in enumerate(seconds)]
+                out_path = out_dir / f"{dfsu_path.stem}_{name}_section.dat"
+                description = section_config.get('description', name)
+                self._write_output(f"section:{name}", self.write_tecplot_line_zones, out_path, zones, var_names,
+                                   f"MIKE21 断面: {description}",
+                                   on_done=lambda name=name, out_path=out_path: self.logger.info(
+                                       f"✅ 断面 {name} 输出: {self._text_output_path(out_path).name}"),
+                                   nbytes=profile.nbytes)
+                self.logger.info(f"🌊 断面 {name}: 相交单元 {len(elem)}，长度 {length.sum():.1f} m，"
+                                 f"流量 {discharge[0]:.3f}" + (f" ~ {discharge[-1]:.3f}" if len(discharge) > 1 else ""))
+                results[name] = True
+
+            except Exception as e:
+                self.logger.error(f"❌ 断面 {name} 处理失败: {e}")
+                results[name] = False
+
+        if discharge_zones:
+            out_path = out_dir / f"{dfsu_path.stem}_discharge.dat"
+            self._write_output('sections', self.write_tecplot_line_zones, out_path, discharge_zones,
+                               ["t", "Q", "A", "V_mean"], "MIKE21 断面流量",
+                               on_done=lambda: self.logger.info(
+                                   f"✅ 断面流量输出: {self._text_output_path(out_path).name}"),
+                               nbytes=sum(z[1].nbytes for z in discharge_zones))
+        return results
+
+    def process_grids(self, ds, dfsu_path: Path, out_dir: Path) -> Dict[str, bool]:
+        """
+        重采样到规则IJ网格
+
+        grids 中每个网格由 spacing（间距，或 [dx, dy]）与 extent（[xmin, ymin, xmax, ymax]，模型原始坐标）
+        或 region（取区域多边形的外包矩形，并以多边形为掩膜）确定。插值矩阵按网格缓存，
+        全部时间步与变量通过一次稀疏乘法得到，每个时间步输出一个有序分区；
+        网格外的点 inside=0，可在 Tecplot 中据此设置空白。
+        """
+        grids = self.config.get('grids') or {}
+        if not grids:
+            return {}
+
+        results = {}
+        names, arrays = self._read_variables(ds)
+        mesh = self.get_mesh(ds.geometry)
+        n_columns = np.shape(arrays[0])[-1]
+        if n_columns == len(mesh['elem_xy']):
+            location = 'cell'
+        elif n_columns == len(mesh['node_xy']):
+            location = 'node'
+        else:
+            self.logger.error(f"❌ IJ网格重采样失败: 数据长度 {n_columns} 与网格不匹配")
+            return dict.fromkeys(grids, False)
+
+        # (单元数或节点数, 时间步数 × 变量数)
+        stacked = np.stack([np.reshape(a, (-1, n_columns)) for a in arrays], axis=-1)
+        n_steps = len(stacked)
+        columns = stacked.transpose(1, 0, 2).reshape(n_columns, -1)
+        times, seconds = self._time_axis(ds, n_steps)
+
+        for name, grid_config in grids.items():
+            try:
+                mask_polygon = None
+                if grid_config.get('extent') is not None:
+                    xmin, ymin, xmax, ymax = (float(c) for c in grid_config['extent'])
+                elif grid_config.get('region') is not None:
+                    region_name = grid_config['region']
+                    mask_polygon = self.load_closed_polyline(
+                        Path(self.config.get('regions', {})[region_name]["region_dxf"]))
+                    xmin, ymin, xmax, ymax = mask_polygon.bounds
+                else:
+                    xmin, ymin = mesh['node_xy'][:, :2].min(axis=0)
+                    xmax, ymax = mesh['node_xy'][:, :2].max(axis=0)
+                spacing = grid_config.get('spacing')
+                if spacing is None:
+                    raise ValueError("未配置 spacing")
+                dx, dy = (spacing, spacing) if np.isscalar(spacing) else spacing
+                xs = xmin + np.arange(int(np.floor((xmax - xmin) / dx + 1e-9)) + 1) * dx
+                ys = ymin + np.arange(int(np.floor((ymax - ymin) / dy + 1e-9)) + 1) * dy
+
+                with self._stage('interpolation'):
+                    matrix, inside = self.grid_interpolation(mesh, xs, ys, location)
+                    grid_values = (matrix @ columns).reshape(len(inside), n_steps, len(names))
+                gx, gy = np.meshgrid(xs, ys)
+                if mask_polygon is not None:
+                    inside = inside & self._contains_points(mask_polygon, gx.ravel(), gy.ravel())
+                    grid_values[~inside] = 0.0
+                inside_column = inside.astype(grid_values.dtype)[:, np.newaxis]
+
+                zones = [(f"{name} t={sec:g}s", np.hstack([grid_values[:, k, :], inside_column]),
+                          sec if n_steps > 1 else None) for k, sec in enumerate(seconds)]
+                out_path = out_dir / f"{dfsu_path.stem}_{name}_grid.dat"
+                self._write_output(f"grid:{name}", self.write_tecplot_ij, out_path, len(xs), len(ys),
+                                   self.transform_coordinates(np.column_stack([gx.ravel(), gy.ravel()])),
+                                   zones, names + ["inside"], f"MIKE21 规则网格: {name}",
+                                   on_done=lambda name=name, out_path=out_path: self.logger.info(
+                                       f"✅ IJ网格 {name} 输出: {self._text_output_path(out_path).name}"),
+                                   nbytes=grid_values.nbytes)
+                self.logger.info(f"🔲 IJ网格 {name}: I={len(xs)}, J={len(ys)}，网格内点数 {int(inside.sum())}")
+                results[name] = True
+
+            except Exception as e:
+                self.logger.error(f"❌ IJ网格 {name} 处理失败: {e}")
+                results[name] = False
+
+        return results
+
+    def _time_selection(self, dfs, log: bool = True) -> Optional[List[int]]:
+        """
+        根据 time_settings 确定需要读取的时间步
+
+        time_index 优先；否则依次应用 start/end（整数索引或日期时间字符串，均包含端点）、
+        interval（重采样间隔，如 "6h"、"30min" 或秒数，取最接近各整间隔时刻的时间步）
+        与 stride（每隔几个时间步取一个）。只有选中的时间步会从文件读取。
+
+        Returns:
+            传给 mikeio read(time=...) 的时间步索引列表，None 表示读取全部时间步
+        """
+        time_settings = self.config.get('time_settings', {})
+        time_index = time_settings.get('time_index')
+        if time_index is not None:
+            return [time_index]
+
+        start, end = time_settings.get('start'), time_settings.get('end')
+        stride, interval = time_settings.get('stride'), time_settings.get('interval')
+        if start is None and end is None and not stride and interval is None:
+            return None
+
+        n_steps = dfs.n_timesteps
+        indices = np.arange(n_steps)
+        if start is not None or end is not None:
+            if isinstance(start, str) or isinstance(end, str):
+                import pandas as pd
+                times = pd.DatetimeIndex(dfs.time)
+            if isinstance(start, str):
+                first = int(times.searchsorted(pd.Timestamp(start)))
+            else:
+                first = 0 if start is None else (start + n_steps if start < 0 else start)
+            if isinstance(end, str):
+                last = int(times.searchsorted(pd.Timestamp(end), side='right')) - 1
+            else:
+                last = n_steps - 1 if end is None else (end + n_steps if end < 0 else end)
+            indices = indices[max(first, 0):last + 1]
+
+        if interval is not None and len(indices) > 1:
+            import pandas as pd
+            step = pd.Timedelta(interval) if isinstance(interval, str) else pd.Timedelta(seconds=float(interval))
+            times = pd.DatetimeIndex(dfs.time)[indices]
+            targets = pd.date_range(times[0], times[-1], freq=step)
+            indices = indices[np.unique(times.get_indexer(targets, method='nearest'))]
+        if stride:
+            indices = indices[::int(stride)]
+
+        if len(indices) == 0:
+            raise ValueError("time_settings 选择的时间步为空")
+        if log:
+            self.logger.info(f"🕒 时间步选择: 读取 {len(indices)}/{n_steps} 个时间步")
+        return None if len(indices) == n_steps else indices.tolist()
+
+    def header_index(self):
+        """
+        输出目录中的 dfsu 文件头索引（processing.header_index 为 false 时返回 None）
+
+        Returns:
+            header_index.HeaderIndex
+        """
+        if not self.config.get('processing', {}).get('header_index', True):
+            return None
+        import header_index
+
+        output_dir = Path(self.config['paths']['output_dir'])
+        with self._cache_lock:
+            if self._header_index is None or self._header_index.path.parent != output_dir:
+                self._header_index = header_index.HeaderIndex(output_dir)
+            return self._header_index
+
+    def config_signature(self) -> str:
+        """影响输出内容的配置指纹（不含处理设置与输入目录），用于增量运行判断是否需要重新转换"""
+        import json
+
+        relevant = {k: v for k, v in self.config.items() if k not in ('processing', 'watch')}
+        relevant['paths'] = {k: v for k, v in self.config.get('paths', {}).items() if k != 'input_dir'}
+        text = json.dumps(relevant, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+    def scan_headers(self, dfsu_files: List[Path], refresh: bool = True) -> Dict[Path, Optional[Dict]]:
+        """
+        获取一批 dfsu 文件的文件头，优先使用索引，只重新读取新增或变化的文件
+
+        Args:
+            dfsu_files: 文件列表
+            refresh: False 时只返回索引中已有的记录（不打开任何文件）
+
+        Returns:
+            文件路径 -> 文件头字典（见 header_index.read_header，另含 size），无记录时为 None
+        """
+        import header_index
+
+        index = self.header_index()
+        if index is None:
+            return {Path(p): (header_index.read_header(Path(p)) if refresh else None) for p in dfsu_files}
+        max_workers = self.config.get('processing', {}).get('parallel_workers') or min(8, os.cpu_count() or 1)
+        start = time.perf_counter()
+        headers = index.headers(dfsu_files, max_workers=max_workers, refresh=refresh)
+        self.logger.debug(f"📇 文件头索引: {len(headers)} 个文件，用时 {time.perf_counter() - start:.3f}s")
+        return headers
+
+    def _index_file(self, dfsu_path: Path, dfs):
+        """把已打开文件的文件头写入索引（索引不可用时忽略）"""
+        try:
+            index = self.header_index()
+            if index is not None and index.get(dfsu_path) is None:
+                import header_index
+                index.put(dfsu_path, header_index.read_header(dfsu_path, dfs))
+        except Exception as e:
+            self.logger.debug(f"更新文件头索引失败: {e}")
+
+    def _plan_calibration(self) -> Tuple[float, Dict[str, float], str]:
+        """
+        从索引中的历史运行记录标定耗时
+
+        优先使用相同配置的记录，其次任意配置的记录，都没有时使用 PLAN_SECONDS_PER_WORK。
+
+        Returns:
+            (秒 / 单元·时间步, 各阶段 秒 / 单元·时间步, 来源说明)
+        """
+        index = self.header_index()
+        history, source = [], ""
+        if index is not None:
+            history = index.run_history(self.config_signature())
+            source = "相同配置"
+            if not history:
+                history, source = index.run_history(), "其他配置"
+        history = [h for h in history if h['work'] > 0 and h['seconds'] > 0]
+        if not history:
+            return PLAN_SECONDS_PER_WORK, {}, "默认值（无历史记录）"
+
+        # 按数据量加权（总耗时 / 总数据量），小文件的固定开销不会放大大文件的估计
+        total_work = sum(h['work'] for h in history)
+        rate = sum(h['seconds'] for h in history) / total_work
+        stage_rates = collections.Counter()
+        for h in history:
+            for stage, seconds in h['stages'].items():
+                if stage != 'total':
+                    stage_rates[stage] += seconds / total_work
+        return rate, stage_rates, f"{source} {len(history)} 次运行"
+
+    def _plan_fraction(self, polygon: Polygon, bbox: List[float]) -> float:
+        """多边形覆盖网格外包矩形的面积比例，按单元均匀分布估计多边形内的单元数"""
+        box = shapely_geometry.box(*bbox)
+        if box.area <= 0:
+            return 1.0
+        return min(polygon.intersection(box).area / box.area, 1.0)
+
+    def _plan_output_bytes(self, fmt: str, n_points: float, n_values: float, n_cells: float,
+                           coord_chars: int, value_chars: int) -> float:
+        """
+        单个输出的体积估计
+
+        Args:
+            fmt: 输出格式
+            n_points: 坐标点数
+            n_values: 变量数值个数
+            n_cells: 三角形单元数（连接表）
+            coord_chars, value_chars: ASCII 中每个坐标、数值占用的字符数（含分隔符）
+        """
+        itemsize = self._output_dtype().itemsize
+        if fmt == 'tecplot':
+            compression = self.config.get('output_settings', {}).get('compression', 'none') or 'none'
+            ascii_bytes = n_points * 2 * coord_chars + n_values * value_chars + n_cells * 3 * 8
+            return ascii_bytes * PLAN_COMPRESSION_RATIOS.get(compression, 1.0)
+        if fmt == 'vtu':
+            return n_points * 24 + n_values * itemsize + n_cells * (3 * 8 + 8 + 1)
+        if fmt == 'xdmf':
+            return n_points * 16 + n_values * itemsize + n_cells * 3 * 8
+        # parquet：每行 X、Y、编号（与时间）各 8 字节
+        return (n_values * itemsize + n_points * 32) * PLAN_PARQUET_RATIO
+
+    def _plan_file(self, dfsu_path: Path, header: Dict, rate: float, fractions: Dict[str, float],
+                   grid_bounds: Dict[str, List[float]], n_probes: int) -> Dict:
+        """
+        估计单个文件的读取量、内存、各输出体积与耗时（只使用文件头与 DXF）
+
+        Args:
+            fractions: 区域名（裁剪范围为 '__clip__'）-> 覆盖网格外包矩形的面积比例
+            grid_bounds: IJ 网格名 -> 网格范围（未给出时取网格外包矩形）
+            n_probes: 测点数
+        """
+        import types
+        import pandas as pd
+
+        output_settings = self.config.get('output_settings', {})
+        n_elements, n_nodes = header['n_elements'], header['n_nodes']
+
+        # 选中的时间步数（按文件头重建等间隔时间轴）
+        times = pd.date_range(header['start_time'], periods=header['n_timesteps'],
+                              freq=pd.Timedelta(seconds=header['timestep'] or 1))
+        time_sel = self._time_selection(types.SimpleNamespace(n_timesteps=header['n_timesteps'], time=times), log=False)
+        n_steps = len(time_sel) if time_sel is not None else header['n_timesteps']
+
+        names = self.output_variable_names()
+        n_vars = len(names)
+        item_names = [name for name, _ in header['items']]
+        try:
+            n_items = len(self.required_items(item_names))
+        except ValueError:
+            n_items = len(item_names)
+        itemsize = self._output_dtype().itemsize
+
+        precision = output_settings.get('precision', 6)
+        bbox = header['bbox']
+        coord_chars = len(str(int(max(abs(c) for c in bbox)))) + precision + 3
+        value_chars = precision + 4
+        formats = self._output_formats()
+
+        outputs: Dict[str, float] = collections.Counter()
+
+        def add(kind, n_points, n_values, n_cells, fmts=formats):
+            for fmt in fmts:
+                outputs[f"{kind}:{fmt}"] += self._plan_output_bytes(fmt, n_points, n_values, n_cells,
+                                                                    coord_chars, value_chars)
+
+        if output_settings.get('export_full_field', True):
+            fraction = fractions.get('__clip__', 1.0)
+            e_f, n_f = n_elements * fraction, n_nodes * fraction
+            mode = output_settings.get('full_field_mode', 'points')
+            if mode == 'points':
+                add('full_field', n_steps * e_f, n_steps * e_f * n_vars, 0)
+            elif mode == 'nodes':
+                add('full_field', n_steps * n_f, n_steps * n_f * n_vars, n_steps * e_f)
+            else:
+                add('full_field', n_steps * n_f, n_steps * e_f * n_vars, n_steps * e_f)
+        if output_settings.get('export_regions', True):
+            for name in self.config.get('regions', {}):
+                if name in fractions:
+                    n_r = n_nodes * fractions[name]
+                    add('regions', n_steps * n_r, n_steps * n_r * (n_vars + 2), n_steps * n_elements * fractions[name])
+        if self.config.get('probes'):
+            add('probes', 0, n_steps * n_probes * (n_vars + 1), 0,
+                ['tecplot'] + (['parquet'] if 'parquet' in formats else []))
+        for section_config in (self.config.get('cross_sections') or {}).values():
+            n_samples = section_config.get('n_samples', 101)
+            add('sections', n_steps * n_samples, n_steps * (n_samples * (n_vars + 2) + 4), 0, ['tecplot'])
+        for name, grid_config in (self.config.get('grids') or {}).items():
+            spacing = grid_config.get('spacing')
+            if spacing is None:
+                continue
+            dx, dy = (spacing, spacing) if np.isscalar(spacing) else spacing
+            xmin, ymin, xmax, ymax = grid_bounds.get(name, bbox)
+            n_grid = (int((xmax - xmin) / dx) + 1) * (int((ymax - ymin) / dy) + 1)
+            add('grids', n_grid, n_steps * n_grid * (n_vars + 1), 0, ['tecplot'])
+
+        # 内存：读取的 float32 数据、按计算精度转换的数组、单个时间步的输出数组、网格与插值矩阵、写出缓冲
+        # 没有需要完整时间序列的输出时按 checkpoint_steps 个时间步一块读取
+        whole_series = any(self.config.get(k) for k in ('probes', 'cross_sections', 'grids'))
+        chunk = max(int(self.config.get('processing', {}).get('checkpoint_steps', 10)), 1)
+        read_steps = n_steps if whole_series else min(n_steps, chunk)
+        read_bytes = n_items * read_steps * n_elements * 4
+        variable_bytes = n_vars * n_elements * itemsize * (n_steps if whole_series else 2)
+        convert_bytes = read_bytes * itemsize // 4 if itemsize != 4 else 0
+        mesh_bytes = n_nodes * 3 * 8 + n_elements * (3 * 8 * 2 + 3 * 16)
+        output_bytes = float(sum(outputs.values()))
+        buffer_bytes = min(self.config.get('processing', {}).get('write_buffer_mb', 512) * 1024 * 1024,
+                           output_bytes / max(n_steps, 1))
+        work = n_elements * n_steps
+        return {
+            'file': dfsu_path.name,
+            'size': header['size'],
+            'n_elements': n_elements,
+            'n_steps': n_steps,
+            'work': work,
+            'memory': int(read_bytes + convert_bytes + variable_bytes + mesh_bytes + buffer_bytes),
+            'outputs': {k: int(v) for k, v in outputs.items()},
+            'output_bytes': int(output_bytes),
+            'seconds': rate * work,
+        }
+
+    def plan(self, input_files: Optional[List[str]] = None) -> Dict:
+        """
+        资源预估（不转换）：只读取 dfsu 文件头与 DXF，估计每个文件的内存峰值、各格式输出体积与耗时
+
+        耗时按索引中历史运行的 秒 / (单元 × 时间步) 标定；区域、裁剪范围内的单元数按多边形面积占网格
+        外包矩形的比例估计。配置 limits 时检查 max_output_gb / max_memory_gb / max_hours，
+        并检查输出目录所在磁盘的剩余空间（limits.check_free_disk，默认开启）。
+
+        Returns:
+            包含 files（每个文件的估计）、output_bytes、peak_memory、cpu_seconds、wall_seconds、
+            stage_seconds、calibration、free_disk、violations 的字典
+        """
+        import shutil
+
+        dfsu_files = self._input_files(input_files)
+        headers = self.scan_headers(dfsu_files)
+        rate, stage_rates, calibration = self._plan_calibration()
+
+        # DXF 与测点只读取一次，区域与裁剪范围按文件换算为面积比例
+        polygons = {}
+        for name, region_config in self.config.get('regions', {}).items():
+            try:
+                polygons[name] = self.load_closed_polyline(Path(region_config["region_dxf"]))
+            except Exception as e:
+                self.logger.warning(f"⚠️ 区域 {name} 的DXF无法读取，预估时忽略: {e}")
+        try:
+            clip_polygon = self.clip_polygon()
+        except Exception as e:
+            clip_polygon = None
+            self.logger.warning(f"⚠️ 裁剪范围的DXF无法读取，预估时忽略: {e}")
+        if clip_polygon is not None:
+            polygons['__clip__'] = clip_polygon
+        grid_bounds = {}
+        for name, grid_config in (self.config.get('grids') or {}).items():
+            if grid_config.get('extent') is not None:
+                grid_bounds[name] = [float(c) for c in grid_config['extent']]
+            elif grid_config.get('region') in polygons:
+                grid_bounds[name] = list(polygons[grid_config['region']].bounds)
+        n_probes = len(self.load_probes()[0]) if self.config.get('probes') else 0
+
+        files, unreadable = [], []
+        for dfsu_path in dfsu_files:
+            header = headers.get(dfsu_path)
+            if header is None:
+                unreadable.append(dfsu_path.name)
+                continue
+            fractions = {name: self._plan_fraction(polygon, header['bbox']) for name, polygon in polygons.items()}
+            files.append(self._plan_file(dfsu_path, header, rate, fractions, grid_bounds, n_probes))
+
+        processing = self.config.get('processing', {})
+        workers = processing.get('parallel_workers') or min(len(files), os.cpu_count() or 1) or 1
+        if not processing.get('enable_parallel', True):
+            workers = 1
+        cpu_seconds = sum(f['seconds'] for f in files)
+        wall_seconds = max([cpu_seconds / workers] + [f['seconds'] for f in files])
+        peak_memory = sum(sorted((f['memory'] for f in files), reverse=True)[:workers])
+        output_bytes = sum(f['output_bytes'] for f in files)
+        total_work = sum(f['work'] for f in files)
+
+        output_dir = Path(self.config['paths']['output_dir'])
+        existing = next((p for p in [output_dir, *output_dir.resolve().parents] if p.exists()), Path('.'))
+        free_disk = shutil.disk_usage(existing).free
+
+        limits = self.config.get('limits') or {}
+        violations = []
+        gb = 1024 ** 3
+        if limits.get('max_output_gb') is not None and output_bytes > limits['max_output_gb'] * gb:
+            violations.append(f"输出 {output_bytes / gb:.1f} GB 超过上限 {limits['max_output_gb']} GB")
+        if limits.get('max_memory_gb') is not None and peak_memory > limits['max_memory_gb'] * gb:
+            violations.append(f"内存峰值 {peak_memory / gb:.1f} GB 超过上限 {limits['max_memory_gb']} GB")
+        if limits.get('max_hours') is not None and wall_seconds > limits['max_hours'] * 3600:
+            violations.append(f"耗时 {wall_seconds / 3600:.1f} 小时超过上限 {limits['max_hours']} 小时")
+        if limits.get('check_free_disk', True) and output_bytes > free_disk:
+            violations.append(f"输出 {output_bytes / gb:.1f} GB 超过磁盘剩余空间 {free_disk / gb:.1f} GB")
+
+        return {
+            'files': files,
+            'unreadable': unreadable,
+            'workers': workers,
+            'output_bytes': output_bytes,
+            'peak_memory': peak_memory,
+            'cpu_seconds': cpu_seconds,
+            'wall_seconds': wall_seconds,
+            'stage_seconds': {stage: r * total_work for stage, r in stage_rates.items()},
+            'calibration': calibration,
+            'free_disk': free_disk,
+            'violations': violations,
+        }
+
+    @staticmethod
+    def format_plan(plan: Dict) -> List[str]:
+        """资源预估报告（日志、命令行与 GUI 共用）"""
+        mb, gb = 1024 ** 2, 1024 ** 3
+
+        def duration(seconds):
+            return f"{seconds / 3600:.1f} 小时" if seconds >= 3600 else f"{seconds / 60:.1f} 分钟"
+
+        lines = [f"📋 资源预估: {len(plan['files'])} 个文件，{plan['workers']} 个并行任务（耗时标定: {plan['calibration']}）"]
+        for f in plan['files']:
+            lines.append(f"   {f['file']}: {f['n_elements']} 单元 × {f['n_steps']} 个时间步 | "
+                         f"内存 {f['memory'] / mb:.0f} MB | 输出 {f['output_bytes'] / mb:.1f} MB | "
+                         f"约 {duration(f['seconds'])}")
+        by_format = collections.Counter()
+        for f in plan['files']:
+            for key, nbytes in f['outputs'].items():
+                by_format[key.split(':')[1]] += nbytes
+        if by_format:
+            lines.append("   按格式: " + ", ".join(f"{fmt} {nbytes / mb:.1f} MB" for fmt, nbytes in by_format.items()))
+        if plan['stage_seconds']:
+            top = sorted(plan['stage_seconds'].items(), key=lambda kv: -kv[1])[:4]
+            lines.append("   主要阶段: " + ", ".join(f"{stage} {duration(sec)}" for stage, sec in top))
+        for name in plan['unreadable']:
+            lines.append(f"   ⚠️ {name}: 无法读取文件头，未计入")
+        lines.append(f"   合计: 输出 {plan['output_bytes'] / gb:.2f} GB（剩余 {plan['free_disk'] / gb:.1f} GB）| "
+                     f"内存峰值 {plan['peak_memory'] / gb:.2f} GB | 预计 {duration(plan['wall_seconds'])}")
+        for violation in plan['violations']:
+            lines.append(f"   ❌ {violation}")
+        return lines
+
+    def _checkpoint_path(self, out_dir: Path) -> Path:
+        return out_dir / CHECKPOINT_FILENAME
+
+    def _load_checkpoint(self, out_dir: Path, dfsu_path: Path) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+        """
+        读取检查点：各输出已完成到的原始时间步序号，以及各输出已提交的时间序列数据块
+
+        源文件（大小、修改时间）或输出配置与检查点不一致时视为无效，从头开始。
+        """
+        import json
+
+        outputs, pieces = {}, {}
+        path = self._checkpoint_path(out_dir)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            checkpoint = {}
+        stat = dfsu_path.stat()
+        if (checkpoint.get('source') == [stat.st_size, stat.st_mtime_ns]
+                and checkpoint.get('config') == self.config_signature()):
+            outputs = {key: int(index) for key, index in checkpoint.get('outputs', {}).items()}
+            pieces = {key: list(names) for key, names in checkpoint.get('pieces', {}).items()}
+        return outputs, pieces
+
+    @staticmethod
+    def _remove_stale_parts(out_dir: Path, pieces: Dict[str, List[str]]):
+        """
+        删除之前运行残留的 .part 临时文件与未提交的数据块（中断时写到一半的时间步块、无效检查点的数据块）
+
+        在开始输出前调用：从头开始时清理全部，从检查点继续时只保留检查点中已提交的数据块。
+        """
+        committed = {name for names in pieces.values() for name in names}
+        for path in itertools.chain(out_dir.glob('*.part'), out_dir.glob('*.piece')):
+            if path.name not in committed:
+                with contextlib.suppress(OSError):
+                    path.unlink()
+
+    def _save_checkpoint(self, out_dir: Path, dfsu_path: Path, outputs: Dict[str, int],
+                         pieces: Optional[Dict[str, List[str]]] = None):
+        """原子写出检查点"""
+        import json
+        import exporters
+
+        stat = dfsu_path.stat()
+        checkpoint = {'source': [stat.st_size, stat.st_mtime_ns], 'config': self.config_signature(),
+                      'outputs': outputs, 'pieces': pieces or {}}
+        with exporters.atomic_output(self._checkpoint_path(out_dir)) as tmp, open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+
+    def _process_steps(self, dfs, ds, read_kwargs: Dict, step_indices: List[int],
+                       dfsu_path: Path, out_dir: Path) -> Tuple[Optional[bool], Dict[str, bool]]:
+        """
+        多个时间步时逐个时间步输出全场与区域（文件名带原始时间步序号），按块提交检查点
+
+        每 processing.checkpoint_steps 个时间步为一块，块内的输出全部写完后，把各输出（full_field、
+        region:名称）完成到的时间步写入 out_dir/.checkpoint.json。中断后重新运行时跳过检查点之前的时间步，
+        只读取、输出剩余部分；全部完成后删除检查点。
+
+        SERIES_FORMATS 中的格式每个输出只写一个时间序列文件：启用检查点时每块写成一个数据块文件并随检查点提交，
+        全部时间步完成后合并为最终文件；从检查点继续时保留已提交的数据块，只追加剩余时间步的数据块。
+
+        Args:
+            ds: 已读取的完整数据集；None 时按块读取（没有需要完整时间序列的测点、断面、IJ 网格输出时）
+            step_indices: 原始时间步序号（升序）
+
+        Returns:
+            (全场是否成功（未启用时为 None）, 区域名 -> 是否成功)
+        """
+        processing = self.config.get('processing', {})
+        output_settings = self.config.get('output_settings', {})
+        use_checkpoint = processing.get('checkpoint', True)
+        chunk = max(int(processing.get('checkpoint_steps', 10)), 1)
+
+        keys = ['full_field'] if output_settings.get('export_full_field', True) else []
+        if output_settings.get('export_regions', True):
+            keys += [f"region:{name}" for name in self.config.get('regions', {})]
+        region_keys = [key for key in keys if key.startswith('region:')]
+
+        done, committed = self._load_checkpoint(out_dir, dfsu_path) if use_checkpoint else ({}, {})
+        self._remove_stale_parts(out_dir, committed)
+
+        def finished(key, index):
+            return done.get(key, -1) >= index
+
+        remaining = [index for index in step_indices if not all(finished(key, index) for key in keys)]
+        if len(remaining) < len(step_indices):
+            self.logger.info(f"♻️ 从检查点继续: 跳过已完成的 {len(step_indices) - len(remaining)}/"
+                             f"{len(step_indices)} 个时间步")
+
+        position = {index: k for k, index in enumerate(step_indices)}
+        full_field_success, region_results = (True if 'full_field' in keys else None), {}
+        failed = set()
+        # 各输出的时间序列写出对象：(输出标识, 格式) -> 写出对象
+        self._file_local.series = series = {}
+        writer = getattr(self._file_local, 'writer', None)
+        progress = dict(done)
+
+        def commit(last_index, failed_before):
+            # 写出失败的输出不再推进检查点
+            try:
+                failed_now = set(failed_before) | (set(writer.errors) if writer is not None else set())
+                for key in keys:
+                    if key not in failed_now:
+                        progress[key] = max(progress.get(key, -1), last_index)
+                        names = set(committed.get(key, [])) | {p.name for p in self._series_pieces(series, key)}
+                        if names:
+                            committed[key] = sorted(names)
+                self._save_checkpoint(out_dir, dfsu_path, progress, committed)
+            except Exception as e:
+                self.logger.warning(f"⚠️ 检查点写出失败: {e}")
+        try:
+            for start in range(0, len(remaining), chunk):
+                block = remaining[start:start + chunk]
+                # 时间序列按块写成数据块文件，以块的起始时间步命名
+                self._file_local.series_chunk = block[0] if use_checkpoint else None
+                if ds is None:
+                    with self._stage('read'):
+                        block_ds = dfs.read(time=block, **read_kwargs)
+                    steps = ((block_ds.isel(time=k), index) for k, index in enumerate(block))
+                else:
+                    steps = ((ds.isel(time=position[index]), index) for index in block)
+
+                for ds_step, index in steps:
+                    suffix = f"_t{index:04d}"
+                    if 'full_field' in keys and not finished('full_field', index):
+                        with self._stage('full_field'):
+                            ok = self.process_full_field(ds_step, dfsu_path, out_dir, suffix)
+                        full_field_success = ok and full_field_success
+                        if not ok:
+                            failed.add('full_field')
+                    if region_keys and not all(finished(key, index) for key in region_keys):
+                        with self._stage('regions'):
+                            for name, ok in self.process_regions(ds_step, dfsu_path, out_dir, suffix).items():
+                                region_results[name] = region_results.get(name, True) and ok
+                                if not ok:
+                                    failed.add(f"region:{name}")
+
+                # 块内追加到时间序列文件的数据写成一个行组
+                for key in keys:
+                    try:
+                        self._write_output(key, self._flush_series, series, key, nbytes=0)
+                    except Exception as e:
+                        self.logger.error(f"❌ {key} 时间序列写出失败: {e}")
+                        failed.add(key)
+
+                if use_checkpoint:
+                    # 检查点排在块内的写出任务之后，由后台写出线程在块内输出写完后提交，计算线程不等待
+                    self._write_output('checkpoint', commit, block[-1], frozenset(failed), nbytes=0)
+        except BaseException:
+            self._close_series(series, abort=True)
+            raise
+        finally:
+            self._file_local.series = None
+            self._file_local.series_chunk = None
+        if writer is not None:
+            with self._stage('write_wait'):
+                failed.update(key for key in writer.flush() if key in keys)
+        errors = self._close_series(series, failed)
+        for key in keys:
+            if key in failed:
+                # 未提交的数据块不能续用
+                for piece in self._series_pieces(series, key):
+                    if piece.name not in committed.get(key, []):
+                        with contextlib.suppress(OSError):
+                            piece.unlink()
+            elif key in committed and not self._series_pieces(series, key):
+                # 本次没有剩余时间步的输出：合并之前运行已提交的数据块
+                try:
+                    with self._stage('write'):
+                        self._assemble_pieces(out_dir, committed[key])
+                except Exception as e:
+                    self.logger.error(f"❌ {key} 时间序列合并失败: {e}")
+                    errors.append(key)
+        for key in errors:
+            failed.add(key)
+            if key == 'full_field':
+                full_field_success = False
+            else:
+                region_results[key.split(':', 1)[1]] = False
+
+        if use_checkpoint and not failed:
+            with contextlib.suppress(OSError):
+                self._checkpoint_path(out_dir).unlink()
+        return full_field_success, region_results
+
+    @staticmethod
+    def _series_pieces(series: Dict, key: str) -> List[Path]:
+        """该输出的时间序列本次写完的数据块文件"""
+        return [piece for (series_key, _), series_writer in series.items() if series_key == key
+                for piece in getattr(series_writer, 'pieces', [])]
+
+    def _assemble_pieces(self, out_dir: Path, names: List[str]):
+        """把检查点中已提交的数据块合并为最终的时间序列文件"""
+        import exporters
+
+        targets = {exporters.piece_target(out_dir / name) for name in names}
+        for target in sorted(targets):
+            if target.suffix == '.h5':
+                exporters.assemble_xdmf(target)
+            else:
+                exporters.assemble_parquet(
+                    target, self.config.get('output_settings', {}).get('parquet_compression', 'zstd'))
+
+    @staticmethod
+    def _flush_series(series: Dict, key: str):
+        """写出该输出各时间序列文件中缓存的数据"""
+        for (series_key, _), series_writer in list(series.items()):
+            if series_key == key and hasattr(series_writer, 'flush'):
+                series_writer.flush()
+
+    def _close_series(self, series: Dict, failed=(), abort: bool = False) -> List[str]:
+        """
+        等待已提交的写出完成后关闭时间序列文件，写出失败的输出放弃其临时文件
+
+        Returns:
+            关闭失败的输出标识
+        """
+        if not series:
+            return []
+        writer = getattr(self._file_local, 'writer', None)
+        if writer is not None:
+            with self._stage('write_wait'):
+                failed = set(failed) | set(writer.flush())
+        errors = []
+        for (key, fmt), series_writer in series.items():
+            try:
+                if abort or key in failed:
+                    series_writer.abort()
+                else:
+                    with self._stage('write'):
+                        series_writer.close()
+            except Exception as e:
+                self.logger.error(f"❌ {key} 的 {fmt} 时间序列写出失败: {e}")
+                errors.append(key)
+        return errors
+
     def process_single_file(self, dfsu_path: Path) -> Dict:
         """处理单个DFSU文件"""
         self.logger.info(f"📂 处理文件: {dfsu_path.name}")
+        self._file_local.timings = timings = {}
+        file_start = time.perf_counter()
+
+        # 后台写出：下一个区域的计算与上一个区域的格式化、写盘重叠进行
+        processing = self.config.get('processing', {})
+        writer = None
+        if processing.get('async_write', True):
+            writer = _WriteBehind(self, int(processing.get('write_buffer_mb', 512) * 1024 * 1024), timings)
+        self._file_local.writer = writer
 
         # 创建输出目录
         output_dir = Path(self.config['paths']['output_dir'])
         out_dir = output_dir / dfsu_path.stem
         out_dir.mkdir(parents=True, exist_ok=True)
 
+        self._file_local.element_subset = None
+
         try:
             # 读取DFSU文件
-            dfs = mikeio.open(dfsu_path)
-            time_index = self.config.get('time_settings', {}).get('time_index')
-
-            if time_index is None:
-                ds = dfs.read()
+            with self._stage('read'):
+                dfs = mikeio.open(dfsu_path)
+                if processing.get('reader', 'mikeio') == 'memmap':
+                    # 直接内存映射动态数据区，布局不支持时回退到 mikeio
+                    import dfsu_reader
+                    dfs = dfsu_reader.open_dfsu(dfsu_path, dfs, self.logger)
+                self._index_file(dfsu_path, dfs)
+                time_sel = self._time_selection(dfs)
+                self._file_local.time_origin = self._dataset_time(dfs)
+
+                # mikeio 按 float32 读取动态数据，单精度模式下显式指定以保持全程 float32
+                read_kwargs = {'dtype': np.float32} if self._output_dtype() == np.float32 else {}
+                # 只读取输出所需的数据项
+                read_kwargs['items'] = self.required_items([item.name for item in dfs.items])
+
+                # 只提取测点时仅读取测点所在单元（梯度等需要完整网格的派生变量除外）
+                output_settings = self.config.get('output_settings', {})
+                probe_elements = None
+                if (self.config.get('probes') and not self._uses_mesh([item.name for item in dfs.items])
+                        and not any(self.config.get(k) for k in ('cross_sections', 'grids'))
+                        and not output_settings.get('export_full_field', True)
+                        and not (output_settings.get('export_regions', True) and self.config.get('regions'))):
+                    _, probe_xy = self.load_probes()
+                    probe_elements = self.locate_probes(self.get_mesh(dfs.geometry), probe_xy)
+                    if (probe_elements >= 0).any():
+                        read_kwargs['elements'] = np.unique(probe_elements[probe_elements >= 0])
+                elif (output_settings.get('clip') and output_settings.get('export_full_field', True)
+                        and not (output_settings.get('export_regions', True) and self.config.get('regions'))
+                        and not any(self.config.get(k) for k in ('probes', 'cross_sections', 'grids'))):
+                    # 只输出裁剪后的全场时仅读取范围内的单元（需要完整网格的派生变量另加一圈相邻单元）
+                    mesh = self.get_mesh(dfs.geometry)
+                    clip_idx = self.clip_elements(mesh)
+                    if clip_idx is not None and len(clip_idx):
+                        subset_elements, subset_nodes = self.clip_subset(
+                            mesh, dfs.geometry, clip_idx, [item.name for item in dfs.items])
+                        read_kwargs['elements'] = subset_elements
+                        self._file_local.element_subset = (subset_elements, subset_nodes, clip_idx)
+                # 数据量（读取的单元数 × 时间步数），用于资源预估的耗时标定
+                step_indices = time_sel if time_sel is not None else list(range(dfs.n_timesteps))
+                work = (len(read_kwargs['elements']) if 'elements' in read_kwargs else dfs.geometry.n_elements) \
+                    * len(step_indices)
+
+                # 多个时间步且没有需要完整时间序列的输出时，由 _process_steps 按块读取
+                series = any(self.config.get(k) for k in ('probes', 'cross_sections', 'grids'))
+                ds = None
+                if len(step_indices) == 1 or series:
+                    if time_sel is None:
+                        ds = dfs.read(**read_kwargs)
+                    else:
+                        ds = dfs.read(time=time_sel, **read_kwargs)
+                        if ds.n_timesteps == 1:
+                            ds = ds.isel(time=0)
+
+            # 处理全场和区域数据：多个时间步时逐个时间步输出，文件名带原始时间步序号
+            if len(step_indices) > 1:
+                full_field_success, region_results = self._process_steps(
+                    dfs, ds, read_kwargs, step_indices, dfsu_path, out_dir)
             else:
-                ds = dfs.read(time=[time_index])
-                if ds.n_timesteps == 1:
-                    ds = ds.isel(time=0)
-
-            # 处理全场和区域数据
-            full_field_success = self.process_full_field(ds, dfsu_path, out_dir)
-            region_results = self.process_regions(ds, dfsu_path, out_dir)
+                with self._stage('full_field'):
+                    full_field_success = self.process_full_field(ds, dfsu_path, out_dir)
+                with self._stage('regions'):
+                    region_results = self.process_regions(ds, dfsu_path, out_dir)
+            probe_success, section_results, grid_results = None, {}, {}
+            if ds is not None:
+                with self._stage('probes'):
+                    probe_success = self.process_probes(ds, dfsu_path, out_dir, probe_elements)
+                with self._stage('sections'):
+                    section_results = self.process_sections(ds, dfsu_path, out_dir)
+                with self._stage('grids'):
+                    grid_results = self.process_grids(ds, dfsu_path, out_dir)
+
+            if writer is not None:
+                with self._stage('write_wait'):
+                    write_errors = writer.close()
+                writer = None
+                for key, error in write_errors.items():
+                    if key == 'full_field':
+                        full_field_success = False
+                        self.logger.error(f"全场输出写出失败: {error}")
+                    elif key == 'probes':
+                        probe_success = False
+                        self.logger.error(f"❌ 测点输出写出失败: {error}")
+                    elif key == 'sections':
+                        section_results = dict.fromkeys(section_results, False)
+                        self.logger.error(f"❌ 断面流量写出失败: {error}")
+                    else:
+                        kind, output_name = key.split(':', 1)
+                        target, label = {'region': (region_results, '区域'), 'section': (section_results, '断面'),
+                                         'grid': (grid_results, 'IJ网格')}[kind]
+                        target[output_name] = False
+                        self.logger.error(f"❌ {label} {output_name} 写出失败: {error}")
 
             self.logger.info(f"✅ 完成: {dfsu_path.name}")
 
+            # 所有输出都成功时记录到索引，供增量运行跳过
+            complete = (full_field_success is not False and probe_success is not False
+                        and all(region_results.values()) and all(section_results.values())
+                        and all(grid_results.values()))
+            try:
+                index = self.header_index()
+                if index is not None:
+                    index.record_run(dfsu_path, self.config_signature(), work,
+                                     dict(timings, total=time.perf_counter() - file_start))
+                    if complete:
+                        index.mark_converted(dfsu_path, self.config_signature())
+            except Exception as e:
+                self.logger.debug(f"更新文件头索引失败: {e}")
+
             return {
                 'file': dfsu_path.name,
                 'success': True,
                 'full_field': full_field_success,
-                'regions': region_results
+                'regions': region_results,
+                'probes': probe_success,
+                'sections': section_results,
+                'grids': grid_results,
+                'timings': dict(timings, total=time.perf_counter() - file_start)
             }
 
         except Exception as e:
@@ -311,17 +2799,28 @@ class MIKE21Converter:
             return {
                 'file': dfsu_path.name,
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                'timings': dict(timings, total=time.perf_counter() - file_start)
             }
+        finally:
+            if writer is not None:
+                writer.close()
+            self._file_local.writer = None
+            self._file_local.element_subset = None
+            self._file_local.timings = None
+            self._file_local.variables = None
+
+    def _input_files(self, input_files: Optional[List[str]] = None) -> List[Path]:
+        """确定输入文件：显式给出的文件，否则为 paths.input_dir 中的 *.dfsu"""
+        if input_files:
+            return [Path(f) for f in input_files if Path(f).exists()]
+        input_dir = Path(self.config['paths']['input_dir'])
+        return list(input_dir.glob("*.dfsu"))
 
     def run(self, input_files: Optional[List[str]] = None) -> Dict:
         """运行转换器 - 支持线程池并行处理"""
         # 确定输入文件
-        if input_files:
-            dfsu_files = [Path(f) for f in input_files if Path(f).exists()]
-        else:
-            input_dir = Path(self.config['paths']['input_dir'])
-            dfsu_files = list(input_dir.glob("*.dfsu"))
+        dfsu_files = self._input_files(input_files)
 
         if not dfsu_files:
             self.logger.error("未找到任何DFSU文件！")
@@ -331,13 +2830,38 @@ class MIKE21Converter:
         output_dir = Path(self.config['paths']['output_dir'])
         output_dir.mkdir(exist_ok=True)
 
+        # 增量运行：跳过自上次以相同配置完整转换后未变化的文件
+        index = self.header_index()
+        skipped = []
+        if index is not None and self.config.get('processing', {}).get('incremental', False):
+            signature = self.config_signature()
+            skipped = [p for p in dfsu_files if index.is_converted(p, signature)]
+            if skipped:
+                self.logger.info(f"⏭️ 跳过 {len(skipped)} 个未变化的文件（增量模式）")
+                dfsu_files = [p for p in dfsu_files if p not in skipped]
+            if not dfsu_files:
+                return {'success': True, 'total_files': 0, 'successful_files': 0, 'skipped_files': len(skipped),
+                        'processing_mode': "单线程", 'backend': 'thread', 'max_workers': 1,
+                        'stage_timings': {}, 'results': []}
+
+        # 配置了资源上限时先预估，超出上限则拒绝运行
+        if self.config.get('limits'):
+            plan = self.plan([str(p) for p in dfsu_files])
+            for line in self.format_plan(plan):
+                self.logger.info(line)
+            if plan['violations']:
+                message = "；".join(plan['violations'])
+                self.logger.error(f"❌ 预估超出资源上限，未开始转换: {message}")
+                return {'success': False, 'message': f"预估超出资源上限: {message}", 'plan': plan}
+
         # 并行处理配置
         max_workers = self.config.get('processing', {}).get('parallel_workers')
         if max_workers is None:
             max_workers = min(len(dfsu_files), os.cpu_count() or 1)
 
-        # 在PyInstaller环境中使用线程池而不是进程池
+        # 在PyInstaller环境中默认使用线程池；backend: process 时使用进程池（适合纯Python计算密集的场景）
         use_parallel = self.config.get('processing', {}).get('enable_parallel', True)
+        backend = self.config.get('processing', {}).get('backend', 'thread')
 
         # 如果只有一个文件或配置为禁用并行处理，则使用单线程
         if len(dfsu_files) == 1 or max_workers == 1 or not use_parallel:
@@ -346,19 +2870,35 @@ class MIKE21Converter:
             for dfsu in dfsu_files:
                 results.append(self.process_single_file(dfsu))
         else:
-            # 使用线程池并行处理多个文件
-            self.logger.info(f"开始处理 {len(dfsu_files)} 个文件，使用 {max_workers} 个线程")
+            # 使用线程池（或进程池）并行处理多个文件
+            # 按索引中的数据量从大到小提交，避免最大的文件最后才开始；无索引记录时按文件大小估计
+            if index is not None:
+                headers = self.scan_headers(dfsu_files, refresh=False)
+                dfsu_files.sort(key=lambda p: -(headers[p]['n_elements'] * headers[p]['n_timesteps']
+                                                * len(headers[p]['items']) * 4 if headers[p] else p.stat().st_size))
+            unit = "个进程" if backend == 'process' else "个线程"
+            self.logger.info(f"开始处理 {len(dfsu_files)} 个文件，使用 {max_workers} {unit}")
             results = []
 
             # 创建线程锁来保护日志输出
             log_lock = threading.Lock()
 
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if backend == 'process':
+                from concurrent.futures import ProcessPoolExecutor as executor_cls
+            else:
+                executor_cls = ThreadPoolExecutor
+            with executor_cls(max_workers=max_workers) as executor:
                 # 提交所有任务
-                future_to_file = {
-                    executor.submit(self._process_file_with_lock, dfsu, log_lock): dfsu
-                    for dfsu in dfsu_files
-                }
+                if backend == 'process':
+                    future_to_file = {
+                        executor.submit(_process_file_worker, self.config, str(dfsu)): dfsu
+                        for dfsu in dfsu_files
+                    }
+                else:
+                    future_to_file = {
+                        executor.submit(self._process_file_with_lock, dfsu, log_lock): dfsu
+                        for dfsu in dfsu_files
+                    }
 
                 # 收集结果
                 for future in as_completed(future_to_file):
@@ -388,15 +2928,40 @@ class MIKE21Converter:
         processing_mode = "并行" if len(dfsu_files) > 1 and max_workers > 1 and use_parallel else "单线程"
         self.logger.info(f"处理完成（{processing_mode}模式）: {successful}/{len(dfsu_files)} 个文件成功")
 
+        stage_timings = self.summarize_timings(results)
+        if self.config.get('processing', {}).get('profile', False):
+            self.log_timings(stage_timings)
+
         return {
             'success': True,
             'total_files': len(dfsu_files),
             'successful_files': successful,
+            'skipped_files': len(skipped),
             'processing_mode': processing_mode,
+            'backend': backend if processing_mode == "并行" else 'thread',
             'max_workers': max_workers if processing_mode == "并行" else 1,
+            'stage_timings': stage_timings,
             'results': results
         }
 
+    @staticmethod
+    def summarize_timings(results: List[Dict]) -> Dict[str, float]:
+        """汇总所有文件的阶段耗时（秒）"""
+        totals: Dict[str, float] = {}
+        for result in results:
+            for stage, seconds in result.get('timings', {}).items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def log_timings(self, stage_timings: Dict[str, float]):
+        """输出阶段耗时统计（同步写出时 write 包含在 full_field/regions 中，异步写出时在后台线程中并行）"""
+        total = stage_timings.get('total', 0.0) or 1e-9
+        self.logger.info("⏱️ 阶段耗时统计:")
+        for stage, seconds in sorted(stage_timings.items(), key=lambda kv: -kv[1]):
+            if stage != 'total':
+                self.logger.info(f"   {stage:<16s} {seconds:10.3f}s  {seconds / total * 100:5.1f}%")
+        self.logger.info(f"   {'total':<16s} {total:10.3f}s")
+
     def _process_file_with_lock(self, dfsu_path: Path, log_lock: threading.Lock) -> Dict:
         """带线程锁的文件处理方法，确保日志输出的线程安全"""
         try:
@@ -415,14 +2980,372 @@ class MIKE21Converter:
                 'success': False,
                 'error': str(e)
             }
+
+    def _file_is_settled(self, dfsu_path: Path, state: Dict, settle_seconds: float) -> bool:
+        """判断文件是否写入完成：大小和修改时间在 settle_seconds 内保持不变且可以打开读取"""
+        try:
+            stat = dfsu_path.stat()
+        except OSError:
+            return False
+
+        signature = (stat.st_size, stat.st_mtime)
+        now = time.monotonic()
+        last = state.get(dfsu_path)
+        if last is None or last[0] != signature:
+            state[dfsu_path] = (signature, now)
+            return False
+        if now - last[1] < settle_seconds or stat.st_size == 0:
+            return False
+
+        # Windows下模拟程序仍在写入时文件处于锁定状态
+        try:
+            with open(dfsu_path, 'rb'):
+                pass
+        except OSError:
+            return False
+        return True
+
+    def watch_metrics(self) -> Dict:
+        """返回监视模式的运行指标（队列深度、吞吐量等）"""
+        metrics = getattr(self, '_watch_metrics', None)
+        if metrics is None:
+            return {}
+        with self._cache_lock:
+            snapshot = dict(metrics)
+        elapsed = max(time.monotonic() - snapshot.pop('_started'), 1e-9)
+        snapshot['uptime_s'] = elapsed
+        snapshot['files_per_hour'] = snapshot['completed'] * 3600.0 / elapsed
+        snapshot['mb_per_s'] = snapshot['bytes_processed'] / 1e6 / elapsed
+        return snapshot
+
+    def watch(self, watch_dir: Optional[str] = None,
+              stop_event: Optional[threading.Event] = None) -> Dict:
+        """
+        监视模式：持续监视输入目录，自动转换新增或写入完成的DFSU文件
+
+        文件写入稳定后进入线程池队列；DXF几何与网格几何缓存在整个监视过程中保持热状态，
+        同一网格的后续文件无需重复构建。文件内容变化（大小或修改时间改变）后会重新转换。
+        转换失败的文件（仍在写入、输出被占用等暂时性错误）保持待处理，按 retry_seconds 起
+        逐次加倍（最长 retry_max_seconds）的间隔重试，文件变化后立即重试。
+
+        Args:
+            watch_dir: 监视目录，默认为配置中的 paths.input_dir
+            stop_event: 用于从其他线程停止监视的事件，未提供时运行至 Ctrl+C
+
+        Returns:
+            退出时的运行指标
+        """
+        watch_config = self.config.get('watch', {})
+        poll_interval = watch_config.get('poll_interval', 5.0)
+        settle_seconds = watch_config.get('settle_seconds', 10.0)
+        metrics_interval = watch_config.get('metrics_interval', 60.0)
+        pattern = watch_config.get('pattern', '*.dfsu')
+        retry_seconds = watch_config.get('retry_seconds', 30.0)
+        retry_max_seconds = watch_config.get('retry_max_seconds', 600.0)
+
+        input_dir = Path(watch_dir or self.config['paths']['input_dir'])
+        output_dir = Path(self.config['paths']['output_dir'])
+        output_dir.mkdir(exist_ok=True)
+
+        max_workers = self.config.get('processing', {}).get('parallel_workers') or (os.cpu_count() or 1)
+        if not self.config.get('processing', {}).get('enable_parallel', True):
+            max_workers = 1
+
+        stop_event = stop_event or threading.Event()
+        self._watch_metrics = {
+            '_started': time.monotonic(),
+            'queued': 0,
+            'running': 0,
+            'completed': 0,
+            'failed': 0,
+            'bytes_processed': 0,
+        }
+        metrics = self._watch_metrics
+
+        # 已处理文件的签名；启动时已存在的文件按配置决定是否转换
+        done: Dict[Path, Tuple[int, float]] = {}
+        if not watch_config.get('process_existing', False):
+            for path in input_dir.glob(pattern):
+                stat = path.stat()
+                done[path] = (stat.st_size, stat.st_mtime)
+        settle_state: Dict[Path, Tuple] = {}
+        # 转换失败的文件：路径 -> (失败次数, 下次重试时间, 失败时的文件签名)
+        retry: Dict[Path, Tuple[int, float, Tuple[int, float]]] = {}
+        in_flight: Dict = {}
+        last_report = time.monotonic()
+
+        def run_one(dfsu_path: Path, size: int) -> Dict:
+            with self._cache_lock:
+                metrics['queued'] -= 1
+                metrics['running'] += 1
+            try:
+                result = self.process_single_file(dfsu_path)
+            finally:
+                with self._cache_lock:
+                    metrics['running'] -= 1
+            with self._cache_lock:
+                if result['success']:
+                    metrics['completed'] += 1
+                    metrics['bytes_processed'] += size
+                else:
+                    metrics['failed'] += 1
+            return result
+
+        self.logger.info(f"👀 监视目录: {input_dir}（{pattern}，{max_workers} 个线程，稳定等待 {settle_seconds}s）")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                while not stop_event.is_set():
+                    busy = set(in_flight.values())
+                    for dfsu_path in sorted(input_dir.glob(pattern)):
+                        if dfsu_path in busy:
+                            continue
+                        try:
+                            stat = dfsu_path.stat()
+                        except OSError:
+                            continue
+                        signature = (stat.st_size, stat.st_mtime)
+                        if done.get(dfsu_path) == signature:
+                            continue
+                        if dfsu_path in retry:
+                            _, retry_at, failed_signature = retry[dfsu_path]
+                            if failed_signature == signature and time.monotonic() < retry_at:
+                                continue
+                        if not self._file_is_settled(dfsu_path, settle_state, settle_seconds):
+                            continue
+
+                        settle_state.pop(dfsu_path, None)
+                        done[dfsu_path] = signature
+                        with self._cache_lock:
+                            metrics['queued'] += 1
+                        in_flight[executor.submit(run_one, dfsu_path, stat.st_size)] = dfsu_path
+                        self.logger.info(f"📥 加入队列: {dfsu_path.name}")
+
+                    for future in [f for f in in_flight if f.done()]:
+                        dfsu_path = in_flight.pop(future)
+                        success = False
+                        try:
+                            result = future.result()
+                            success = result['success']
+                            if success:
+                                self.logger.info(f"🎯 完成文件: {result['file']}")
+                            else:
+                                self.logger.error(f"❌ 失败文件: {result['file']}")
+                        except Exception as e:
+                            self.logger.error(f"❌ 线程处理 {dfsu_path.name} 时出错: {e}")
+                        if success:
+                            retry.pop(dfsu_path, None)
+                            continue
+                        # 失败的文件保持待处理，间隔逐次加倍后重试
+                        attempts = retry.get(dfsu_path, (0,))[0] + 1
+                        delay = min(retry_seconds * 2 ** (attempts - 1), retry_max_seconds)
+                        retry[dfsu_path] = (attempts, time.monotonic() + delay, done.pop(dfsu_path, None))
+                        self.logger.warning(f"🔁 {dfsu_path.name} 第 {attempts} 次失败，{delay:.0f}s 后重试")
+
+                    if time.monotonic() - last_report >= metrics_interval:
+                        last_report = time.monotonic()
+                        m = self.watch_metrics()
+                        self.logger.info(
+                            f"📊 队列 {m['queued']} | 运行中 {m['running']} | 完成 {m['completed']} | "
+                            f"失败 {m['failed']} | {m['files_per_hour']:.1f} 文件/小时 | {m['mb_per_s']:.2f} MB/s")
+
+                    stop_event.wait(poll_interval)
+            except KeyboardInterrupt:
+                self.logger.info("收到中断信号，等待当前队列完成后退出...")
+
+        final = self.watch_metrics()
+        self.logger.info(f"监视结束: 完成 {final['completed']} 个文件，失败 {final['failed']} 个")
+        return final
+
+
+# 进程池工作进程内复用的转换器（保持DXF与网格缓存）
+_worker_converter: Optional[MIKE21Converter] = None
+
+
+def _process_file_worker(config: Dict, dfsu_path: str) -> Dict:
+    """进程池工作函数：在子进程中按传入的配置处理单个文件"""
+    global _worker_converter
+    if _worker_converter is None or _worker_converter.config != config:
+        _worker_converter = MIKE21Converter(config=config)
+    return _worker_converter.process_single_file(Path(dfsu_path))
+
+
+def build_arg_parser():
+    """构建命令行参数解析器"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MIKE21 DFSU 到 Tecplot 格式转换器")
+    parser.add_argument('inputs', nargs='*', metavar='INPUT',
+                        help="DFSU文件、目录或通配符（如 runs/*.dfsu），默认处理 paths.input_dir")
+    parser.add_argument('-c', '--config', default=None,
+                        help="配置文件路径（默认 config.yaml，不存在时使用内置默认配置）")
+    parser.add_argument('-o', '--output-dir', default=None, help="输出目录")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="并行工作数（1 为单线程）")
+    parser.add_argument('--backend', choices=['thread', 'process'], default=None, help="并行后端")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, nargs='+', default=None,
+                        help="输出格式，可同时指定多个（如 --format tecplot vtu）")
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default=None,
+                        help="计算与输出精度（float32 可减半内存占用）")
+    parser.add_argument('--compression', choices=list(COMPRESSION_SUFFIXES), default=None,
+                        help="ASCII Tecplot 输出的流式压缩方式（zstd 需要 zstandard）")
+    parser.add_argument('--full-field-mode', choices=FULL_FIELD_MODES, default=None,
+                        help="单元中心数据的全场输出方式：points 散点 / nodes 插值到节点 / cellcentered 单元中心FE分区")
+    parser.add_argument('--interpolation', choices=INTERPOLATION_SCHEMES, default=None,
+                        help="单元值到节点值的插值方法")
+    parser.add_argument('--time-index', type=int, default=None, help="只转换指定时间步")
+    parser.add_argument('--time-start', default=None,
+                        help="起始时间步（整数索引或日期时间，如 2024-01-01T06:00）")
+    parser.add_argument('--time-end', default=None, help="结束时间步（包含）")
+    parser.add_argument('--time-stride', type=int, default=None, help="每隔几个时间步取一个")
+    parser.add_argument('--time-interval', default=None,
+                        help="按时间间隔重采样（如 6h、30min），取最接近各整间隔时刻的时间步")
+    parser.add_argument('--regions', nargs='+', default=None, metavar='NAME',
+                        help="只输出配置中的指定区域")
+    parser.add_argument('--variables', nargs='+', default=None, metavar='NAME',
+                        help="输出的变量列（数据项或派生变量），默认 u v w velocity")
+    parser.add_argument('--derived', nargs='+', default=None, metavar='NAME',
+                        help="额外输出的派生变量，如 vorticity divergence froude")
+    parser.add_argument('--probes', default=None, metavar='CSV',
+                        help="测点CSV文件（名称,x,y），输出各测点的时间序列")
+    parser.add_argument('--clip-box', type=float, nargs=4, default=None, metavar=('XMIN', 'YMIN', 'XMAX', 'YMAX'),
+                        help="全场输出的裁剪范围（模型原始坐标）")
+    parser.add_argument('--no-full-field', action='store_true', help="不输出全场数据")
+    parser.add_argument('--no-regions', action='store_true', help="不输出区域数据")
+    parser.add_argument('--reader', choices=['mikeio', 'memmap'], default=None,
+                        help="动态数据读取方式：mikeio / memmap（内存映射零拷贝，布局不支持时自动回退）")
+    parser.add_argument('--incremental', action='store_true',
+                        help="增量运行：跳过自上次以相同配置转换后未变化的文件")
+    parser.add_argument('--profile', action='store_true', help="输出各处理阶段耗时统计")
+    parser.add_argument('-q', '--quiet', action='store_true', help="只输出警告和错误日志")
+    parser.add_argument('--watch', nargs='?', const='', default=None, metavar='DIR',
+                        help="监视模式：持续转换目录中新写入完成的DFSU文件（默认监视 paths.input_dir）")
+    parser.add_argument('--plan', action='store_true',
+                        help="只做资源预估（内存、输出体积、耗时），不转换；超出 limits 时返回非零退出码")
+    parser.add_argument('--diagnostics', action='store_true', help="输出启动导入耗时报告后退出")
+    return parser
+
+
+def _parse_time_arg(value: Optional[str]) -> Optional[Union[int, str]]:
+    """时间参数为整数时按索引处理，否则按日期时间字符串处理"""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def config_from_args(args) -> Dict:
+    """根据命令行参数生成配置字典"""
+    config_path = args.config or "config.yaml"
+    if args.config or Path(config_path).exists():
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = deep_update(copy.deepcopy(DEFAULT_CONFIG), yaml.safe_load(f) or {})
+    else:
+        config = copy.deepcopy(DEFAULT_CONFIG)
+
+    if args.output_dir:
+        config['paths']['output_dir'] = args.output_dir
+    if args.workers is not None:
+        config['processing']['parallel_workers'] = args.workers
+    if args.backend:
+        config['processing']['backend'] = args.backend
+    if args.format:
+        config['output_settings']['format'] = args.format if len(args.format) > 1 else args.format[0]
+    if args.dtype:
+        config['output_settings']['dtype'] = args.dtype
+    if args.compression:
+        config['output_settings']['compression'] = args.compression
+    if args.full_field_mode:
+        config['output_settings']['full_field_mode'] = args.full_field_mode
+    if args.interpolation:
+        config['output_settings']['interpolation'] = args.interpolation
+    if args.reader:
+        config['processing']['reader'] = args.reader
+    if args.incremental:
+        config['processing']['incremental'] = True
+    if args.profile:
+        config['processing']['profile'] = True
+    if args.quiet:
+        config['processing']['verbose'] = False
+    if args.clip_box:
+        config['output_settings']['clip'] = {'box': args.clip_box}
+    if args.no_full_field:
+        config['output_settings']['export_full_field'] = False
+    if args.no_regions:
+        config['output_settings']['export_regions'] = False
+
+    if args.time_index is not None:
+        config['time_settings']['time_index'] = args.time_index
+    elif any(a is not None for a in (args.time_start, args.time_end, args.time_stride, args.time_interval)):
+        config['time_settings']['time_index'] = None
+        config['time_settings']['start'] = _parse_time_arg(args.time_start)
+        config['time_settings']['end'] = _parse_time_arg(args.time_end)
+        config['time_settings']['stride'] = args.time_stride
+        config['time_settings']['interval'] = args.time_interval
+
+    if args.variables:
+        config['output_settings']['variables'] = args.variables
+    if args.derived:
+        config['output_settings']['derived'] = args.derived
+    if args.probes:
+        config['probes'] = dict(config.get('probes') or {}, csv=args.probes)
+
+    if args.regions:
+        missing = [name for name in args.regions if name not in config['regions']]
+        if missing:
+            raise ValueError(f"配置中没有以下区域: {', '.join(missing)}")
+        config['regions'] = {name: config['regions'][name] for name in args.regions}
+
+    return config
+
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    """展开命令行输入：目录取其中的 *.dfsu，通配符按glob展开"""
+    import glob
+
+    files = []
+    for item in inputs:
+        if Path(item).is_dir():
+            files.extend(str(p) for p in sorted(Path(item).glob("*.dfsu")))
+        elif glob.has_magic(item):
+            files.extend(sorted(glob.glob(item, recursive=True)))
+        else:
+            files.append(item)
+    # 去重并保持顺序
+    return list(dict.fromkeys(files))
+
+
 def main():
     """主函数"""
+    args = build_arg_parser().parse_args()
+
+    if args.diagnostics:
+        print(import_time_report())
+        return
+
     try:
-        converter = MIKE21Converter()
-        result = converter.run()
+        converter = MIKE21Converter(config=config_from_args(args))
+        if args.watch is not None:
+            converter.watch(args.watch or None)
+            return
+
+        input_files = expand_inputs(args.inputs) if args.inputs else None
+        if args.inputs and not input_files:
+            print("\n转换失败：未找到任何匹配的DFSU文件")
+            sys.exit(1)
+        if args.plan:
+            plan = converter.plan(input_files)
+            print("\n".join(converter.format_plan(plan)))
+            if plan['violations']:
+                sys.exit(1)
+            return
+        result = converter.run(input_files)
 
         if result['success']:
             print(f"\n转换完成！成功处理 {result['successful_files']}/{result['total_files']} 个文件")
+            if result.get('skipped_files'):
+                print(f"跳过 {result['skipped_files']} 个未变化的文件")
         else:
             print(f"\n转换失败：{result.get('message', '未知错误')}")
 
@@ -432,4 +3355,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
@@ -64,6 +64,9 @@ def create_simple_onedir():
         '--hidden-import=mikecore',
         '--hidden-import=numpy',
         '--hidden-import=pandas',
+        '--hidden-import=scipy.sparse',
+        '--hidden-import=shapely.geometry',
+        '--hidden-import=ezdxf',
         '--hidden-import=yaml',
         '--hidden-import=pathlib',
         '--hidden-import=threading',
@@ -133,6 +136,9 @@ def create_simple_onefile():
         '--hidden-import=mikecore',
         '--hidden-import=numpy',
         '--hidden-import=pandas',
+        '--hidden-import=scipy.sparse',
+        '--hidden-import=shapely.geometry',
+        '--hidden-import=ezdxf',
         '--hidden-import=yaml',
 
         # 收集数据
@@ -109,10 +109,12 @@ def create_directory_version():
         '--hidden-import=numpy',
         '--hidden-import=pandas',
         '--hidden-import=shapely',
+        '--hidden-import=shapely.geometry',
         '--hidden-import=ezdxf',
         '--hidden-import=yaml',
         '--hidden-import=matplotlib',
         '--hidden-import=scipy',
+        '--hidden-import=scipy.sparse',
         '--hidden-import=PIL',
         
         # 收集数据文件
@@ -185,10 +187,12 @@ def create_single_file_version():
         '--hidden-import=numpy',
         '--hidden-import=pandas',
         '--hidden-import=shapely',
+        '--hidden-import=shapely.geometry',
         '--hidden-import=ezdxf',
         '--hidden-import=yaml',
         '--hidden-import=matplotlib',
         '--hidden-import=scipy',
+        '--hidden-import=scipy.sparse',
         '--hidden-import=PIL',
         
         # 收集数据文件
@@ -200,10 +200,12 @@ def create_directory_version():
         '--hidden-import=numpy',
         '--hidden-import=pandas',
         '--hidden-import=shapely',
+        '--hidden-import=shapely.geometry',
         '--hidden-import=ezdxf',
         '--hidden-import=yaml',
         '--hidden-import=matplotlib',
         '--hidden-import=scipy',
+        '--hidden-import=scipy.sparse',
         '--hidden-import=PIL',
 
         # 收集模块
@@ -108,6 +108,7 @@ hiddenimports = [
     'matplotlib.backends',
     'matplotlib.backends.backend_tkagg',
     'scipy',
+    'scipy.sparse',
     'scipy.spatial',
     'sqlite3',
     'xml.etree.ElementTree',
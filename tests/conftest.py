@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""测试公共夹具：在临时目录中生成小型 dfsu 文件并创建转换器"""
+
+import copy
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+mikeio = pytest.importorskip("mikeio")
+pd = pytest.importorskip("pandas")
+
+import mike21_converter  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _work_dir(tmp_path_factory):
+    """转换器在当前目录写日志文件，测试期间切换到临时目录"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("work"))
+    yield
+    os.chdir(cwd)
+
+
+def write_dfsu(path: Path, nx: int = 9, ny: int = 7, n_steps: int = 6) -> Path:
+    """
+    生成规则三角形网格上的二维 dfsu 文件
+
+    流速为坐标的非线性函数（涡量、散度不为零），水深中有一个删除值。
+    """
+    x, y = np.meshgrid(np.arange(nx, dtype=float), np.arange(ny, dtype=float))
+    nodes = np.column_stack([x.ravel(), y.ravel(), -5.0 - 0.1 * x.ravel()])
+    elements = []
+    for j in range(ny - 1):
+        for i in range(nx - 1):
+            a = j * nx + i
+            elements += [[a, a + 1, a + nx + 1], [a, a + nx + 1, a + nx]]
+    geometry = mikeio.spatial.GeometryFM2D(nodes, np.array(elements), projection='NON-UTM')
+
+    ec = geometry.element_coordinates
+    phase = np.arange(n_steps)[:, np.newaxis] * 0.3
+    u = np.sin(0.4 * ec[:, 1] + phase) * (1 + 0.05 * ec[:, 0] ** 2)
+    v = np.cos(0.3 * ec[:, 0] - phase) * (1 + 0.1 * ec[:, 1])
+    h = 5.0 + 0.1 * ec[:, 0] + 0.2 * np.sin(phase)
+    h[2, 4] = np.nan
+
+    time = pd.date_range('2020-01-01', periods=n_steps, freq='h')
+    data_arrays = [mikeio.DataArray(values.astype(np.float32), time=time, geometry=geometry,
+                                    item=mikeio.ItemInfo(name))
+                   for name, values in (('U velocity', u), ('V velocity', v), ('Total water depth', h))]
+    mikeio.Dataset(data_arrays).to_dfs(str(path))
+    return path
+
+
+@pytest.fixture(scope="session")
+def dfsu_file(tmp_path_factory) -> Path:
+    return write_dfsu(tmp_path_factory.mktemp("input") / "case.dfsu")
+
+
+@pytest.fixture
+def make_converter(tmp_path):
+    """按覆盖项创建转换器，输出到 tmp_path 下的子目录"""
+    def factory(overrides=None, output_name="out"):
+        config = copy.deepcopy(mike21_converter.DEFAULT_CONFIG)
+        config['paths']['output_dir'] = str(tmp_path / output_name)
+        config['processing'].update(enable_parallel=False, verbose=False)
+        mike21_converter.deep_update(config, copy.deepcopy(overrides or {}))
+        return mike21_converter.MIKE21Converter(config=config)
+    return factory
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""多时间步输出：中断后从检查点继续，结果与一次运行完成的一致"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+import mike21_converter
+
+
+class _Killed(BaseException):
+    """模拟进程被终止：不被转换器按 Exception 捕获，检查点保留在输出目录中"""
+
+
+def _out_dir(converter, dfsu_file):
+    return Path(converter.config['paths']['output_dir']) / dfsu_file.stem
+
+
+def _trace_full_field(converter, kill_at=None):
+    """记录 process_full_field 处理的时间步后缀，第 kill_at 次调用时中断"""
+    calls = []
+    original = converter.process_full_field
+
+    def process_full_field(ds, dfsu_path, out_dir, suffix=""):
+        calls.append(suffix)
+        if len(calls) == kill_at:
+            raise _Killed()
+        return original(ds, dfsu_path, out_dir, suffix)
+
+    converter.process_full_field = process_full_field
+    return calls
+
+
+def _outputs(out_dir, pattern):
+    return {p.name: p.read_bytes() for p in sorted(out_dir.glob(pattern))}
+
+
+def _interrupted_run(make_converter, dfsu_file, overrides):
+    """一次完整运行作为参考，另一个输出目录在第 2 块的第 2 个时间步中断"""
+    reference = make_converter(overrides, 'reference')
+    assert reference.process_single_file(dfsu_file)['success']
+
+    converter = make_converter(overrides, 'resumed')
+    _trace_full_field(converter, kill_at=4)
+    with pytest.raises(_Killed):
+        converter.process_single_file(dfsu_file)
+    out_dir = _out_dir(converter, dfsu_file)
+    checkpoint = json.loads((out_dir / mike21_converter.CHECKPOINT_FILENAME).read_text(encoding='utf-8'))
+    assert checkpoint['outputs'] == {'full_field': 1}
+    return _out_dir(reference, dfsu_file), out_dir
+
+
+def test_resume_skips_finished_steps(make_converter, dfsu_file):
+    overrides = {'output_settings': {'format': 'tecplot'}, 'processing': {'checkpoint_steps': 2}}
+    reference_dir, out_dir = _interrupted_run(make_converter, dfsu_file, overrides)
+
+    converter = make_converter(overrides, 'resumed')
+    calls = _trace_full_field(converter)
+    assert converter.process_single_file(dfsu_file)['success']
+    assert calls == ['_t0002', '_t0003', '_t0004', '_t0005']
+
+    expected = _outputs(reference_dir, '*.dat')
+    assert len(expected) == 6
+    assert _outputs(out_dir, '*.dat') == expected
+    assert not list(out_dir.glob('*.part'))
+    assert not (out_dir / mike21_converter.CHECKPOINT_FILENAME).exists()
+
+
+@pytest.mark.parametrize("fmt, pattern", [('xdmf', '*.xmf'), ('parquet', '*.parquet')])
+def test_resume_series_formats_from_pieces(make_converter, dfsu_file, fmt, pattern):
+    pytest.importorskip("h5py" if fmt == 'xdmf' else "pyarrow")
+    overrides = {'output_settings': {'format': [fmt, 'tecplot']}, 'processing': {'checkpoint_steps': 2}}
+    reference_dir, out_dir = _interrupted_run(make_converter, dfsu_file, overrides)
+    checkpoint = json.loads((out_dir / mike21_converter.CHECKPOINT_FILENAME).read_text(encoding='utf-8'))
+    assert [len(names) for names in checkpoint['pieces'].values()] == [1]
+    assert not list(out_dir.glob(pattern))
+
+    converter = make_converter(overrides, 'resumed')
+    calls = _trace_full_field(converter)
+    assert converter.process_single_file(dfsu_file)['success']
+    assert calls == ['_t0002', '_t0003', '_t0004', '_t0005']
+
+    assert _outputs(out_dir, '*.dat') == _outputs(reference_dir, '*.dat')
+    assert _outputs(out_dir, pattern) == _outputs(reference_dir, pattern)
+    if fmt == 'xdmf':
+        import h5py
+        with h5py.File(out_dir / 'case_allfield.h5', 'r') as resumed, \
+                h5py.File(reference_dir / 'case_allfield.h5', 'r') as reference:
+            assert sorted(resumed['u']) == sorted(reference['u']) == [f'{k:06d}' for k in range(6)]
+            for name in ('geometry', 'u/000000', 'u/000005', 'velocity/000003'):
+                assert (resumed[name][()] == reference[name][()]).all()
+    assert not list(out_dir.glob('*.part')) and not list(out_dir.glob('*.piece'))
+    assert not (out_dir / mike21_converter.CHECKPOINT_FILENAME).exists()
+
+
+def test_uncommitted_pieces_are_discarded(make_converter, dfsu_file):
+    pytest.importorskip("pyarrow")
+    overrides = {'output_settings': {'format': 'parquet'}, 'processing': {'checkpoint_steps': 2}}
+    converter = make_converter(overrides, 'resumed')
+    out_dir = _out_dir(converter, dfsu_file)
+    out_dir.mkdir(parents=True)
+    stale = out_dir / 'case_allfield.parquet.000004.piece'
+    stale.write_bytes(b'stale')
+
+    assert converter.process_single_file(dfsu_file)['success']
+    assert not stale.exists()
+    assert [p.name for p in out_dir.iterdir()] == ['case_allfield.parquet']
+
+
+def test_committed_pieces_assembled_when_no_steps_remain(make_converter, dfsu_file):
+    pytest.importorskip("pyarrow")
+    overrides = {'output_settings': {'format': 'parquet'}, 'processing': {'checkpoint_steps': 2}}
+    reference = make_converter(overrides, 'reference')
+    assert reference.process_single_file(dfsu_file)['success']
+
+    # 最后一块的检查点已提交、时间序列尚未合并时中断
+    converter = make_converter(overrides, 'resumed')
+
+    def killed(*args, **kwargs):
+        raise _Killed()
+    converter._close_series = killed
+    with pytest.raises(_Killed):
+        converter.process_single_file(dfsu_file)
+    out_dir = _out_dir(converter, dfsu_file)
+    assert len(list(out_dir.glob('*.piece'))) == 3
+
+    converter = make_converter(overrides, 'resumed')
+    calls = _trace_full_field(converter)
+    assert converter.process_single_file(dfsu_file)['success']
+    assert calls == []
+    assert _outputs(out_dir, '*') == _outputs(_out_dir(reference, dfsu_file), '*')
+
+
+def test_checkpoint_does_not_drain_writer_per_chunk(make_converter, dfsu_file, monkeypatch):
+    flushes = []
+    original = mike21_converter._WriteBehind.flush
+
+    def flush(self):
+        flushes.append(self)
+        return original(self)
+    monkeypatch.setattr(mike21_converter._WriteBehind, 'flush', flush)
+
+    converter = make_converter({'output_settings': {'format': 'tecplot'},
+                                'processing': {'checkpoint_steps': 2, 'async_write': True}})
+    assert converter.process_single_file(dfsu_file)['success']
+    assert len(flushes) == 1
+    assert not (_out_dir(converter, dfsu_file) / mike21_converter.CHECKPOINT_FILENAME).exists()
+
+
+@pytest.mark.parametrize("checkpoint", ['{"source": [0, 0], "outputs": {"full_field": 3}}', 'not json'])
+def test_fresh_start_removes_stale_parts(make_converter, dfsu_file, checkpoint):
+    converter = make_converter({'output_settings': {'format': 'tecplot'}, 'processing': {'checkpoint_steps': 2}})
+    out_dir = _out_dir(converter, dfsu_file)
+    out_dir.mkdir(parents=True)
+    (out_dir / mike21_converter.CHECKPOINT_FILENAME).write_text(checkpoint, encoding='utf-8')
+    stale = [out_dir / 'case_allfield_t0003.vtu.part', out_dir / 'case_allfield.parquet.000002.piece']
+    for path in stale:
+        path.write_bytes(b'stale')
+
+    calls = _trace_full_field(converter)
+    assert converter.process_single_file(dfsu_file)['success']
+    assert len(calls) == 6
+    assert not any(path.exists() for path in stale)
+    assert sorted(p.name for p in out_dir.iterdir()) == [f'case_allfield_t{k:04d}.dat' for k in range(6)]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""派生变量与自定义表达式"""
+
+import pytest
+
+import derived
+
+ITEMS = ['U velocity', 'V velocity', 'Total water depth']
+
+
+@pytest.mark.parametrize("expression, variables", [
+    ("h * sqrt(u**2 + v**2)", ('h', 'u', 'v')),
+    ("where(h > 0.01, u / h, 0) * g", ('h', 'u')),
+    ("-vorticity + 2 * pi", ('vorticity',)),
+])
+def test_valid_expressions(expression, variables):
+    assert derived.compile_expression(expression, 'q')[1] == variables
+
+
+@pytest.mark.parametrize("expression", [
+    "u.__class__",
+    "().__class__.__bases__",
+    "__import__('os')",
+    "u[0]",
+    "clip(u, a_min=0)",
+    "np.sqrt(u)",
+    "(lambda: 1)()",
+    "'a' * 3",
+    "__builtins__",
+    "u +",
+])
+def test_rejected_expressions(expression):
+    with pytest.raises(ValueError):
+        derived.compile_expression(expression, 'q')
+
+
+def test_required_items_rejects_unsafe_expression():
+    with pytest.raises(ValueError):
+        derived.required_items(['q'], ITEMS, {'q': "u.__class__"})
+    assert derived.required_items(['q'], ITEMS, {'q': "vorticity * 2"}) == ['U velocity', 'V velocity']
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""内存映射读取与 mikeio 读取结果一致"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import dfsu_reader
+
+mikeio = pytest.importorskip("mikeio")
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {'time': [2]},
+    {'time': 3},
+    {'time': [0, 2, 4]},
+    {'time': [1, 2, 3], 'items': ['V velocity']},
+    {'items': [2], 'time': [1]},
+    {'elements': [4]},
+    {'elements': [1, 7, 9], 'time': [1]},
+    {'dtype': np.float64, 'time': [2]},
+])
+def test_memmap_read_matches_mikeio(dfsu_file, kwargs):
+    expected = mikeio.open(dfsu_file).read(**kwargs)
+    actual = dfsu_reader.MemmapDfsu(dfsu_file).read(**kwargs)
+
+    assert [da.name for da in actual] == [da.name for da in expected]
+    assert list(actual.time) == list(expected.time)
+    assert type(actual.geometry) is type(expected.geometry)
+    for a, e in zip(actual, expected):
+        assert a.values.dtype == e.values.dtype
+        np.testing.assert_array_equal(a.values, e.values)
+
+
+def test_memmap_contiguous_read_is_a_view(dfsu_file):
+    reader = dfsu_reader.MemmapDfsu(dfsu_file)
+    assert np.shares_memory(reader.read(items=['U velocity'], time=[1, 2])[0].values, reader._steps)
+
+
+def test_truncated_file_falls_back_to_mikeio(dfsu_file, tmp_path):
+    truncated = tmp_path / "truncated.dfsu"
+    truncated.write_bytes(dfsu_file.read_bytes()[:-10])
+    with pytest.raises(dfsu_reader.UnsupportedLayout):
+        dfsu_reader.MemmapDfsu(truncated)
+    assert not isinstance(dfsu_reader.open_dfsu(truncated), dfsu_reader.MemmapDfsu)
+
+
+def test_converter_output_matches_between_readers(make_converter, dfsu_file):
+    outputs = {}
+    for reader in ('mikeio', 'memmap'):
+        converter = make_converter({'processing': {'reader': reader}, 'probes': {'points': {'A': [2.3, 3.4]}},
+                                    'output_settings': {'derived': ['vorticity']}}, reader)
+        assert converter.process_single_file(dfsu_file)['success']
+        out_dir = converter.config['paths']['output_dir']
+        outputs[reader] = {p.name: p.read_bytes() for p in sorted((Path(out_dir) / dfsu_file.stem).glob('*.dat'))}
+    assert outputs['mikeio'] and outputs['mikeio'] == outputs['memmap']
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""启动导入耗时报告"""
+
+import sys
+
+import mike21_converter
+
+
+def test_import_time_report_lists_heavy_modules():
+    report = mike21_converter.import_time_report(top=200)
+    assert "总导入耗时" in report
+    # 每行为 "累计 自身  模块"，子模块按导入深度缩进
+    top_level = [line[21:] for line in report.splitlines()[3:] if not line[21:].startswith(' ')]
+    for name in ('mikeio', 'ezdxf'):
+        assert name in top_level
+
+
+def test_frozen_report_uses_first_import_timings(monkeypatch):
+    monkeypatch.setattr(sys, 'frozen', True, raising=False)
+    monkeypatch.setattr(mike21_converter, '_import_timings', {'mikeio': 1.25})
+    report = mike21_converter.import_time_report()
+    assert "    1.250s  mikeio" in report.splitlines()
+    assert "总导入耗时" not in report
+
+
+def test_lazy_module_rebinds_global(monkeypatch):
+    import json
+
+    proxy = mike21_converter._LazyModule('json', '_lazy_json')
+    monkeypatch.setattr(mike21_converter, '_lazy_json', proxy, raising=False)
+    assert mike21_converter._lazy_json.dumps([1]) == '[1]'
+    assert mike21_converter._lazy_json is json
+
+
+def test_warm_up_replaces_proxies():
+    import numpy
+
+    mike21_converter.warm_up_imports()
+    assert mike21_converter.np is numpy
+    assert not any(isinstance(value, mike21_converter._LazyModule) for value in vars(mike21_converter).values())
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""GUI 日志处理器：按线程限流"""
+
+import logging
+import threading
+
+import pytest
+
+gui = pytest.importorskip("gui")
+
+
+def _log_from_threads(handler, n_threads, n_messages):
+    logger = logging.getLogger(f"test_gui_log_{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    # 所有线程同时存活，线程编号互不相同
+    barrier = threading.Barrier(n_threads)
+
+    def work():
+        for _ in range(n_messages):
+            logger.info("x")
+        barrier.wait()
+
+    try:
+        threads = [threading.Thread(target=work) for _ in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_buckets_of_finished_threads_are_evicted(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(gui.time, 'monotonic', lambda: clock[0])
+    handler = gui.GUILogHandler(rate_per_thread=5)
+
+    _log_from_threads(handler, n_threads=8, n_messages=10)
+    assert len(handler._buckets) == 8
+    messages = handler.drain()
+    # 每个线程只通过桶容量内的消息，其余汇总提示
+    assert len(messages) == 8 * 5 + 1 and "40" in messages[-1]
+    assert len(handler._buckets) == 8
+
+    clock[0] += 1.0
+    handler.drain()
+    assert handler._buckets == {}
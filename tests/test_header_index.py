@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""文件头索引与增量运行"""
+
+import pytest
+
+
+@pytest.mark.parametrize("output_settings", [
+    {},
+    {'export_full_field': False},
+    {'export_full_field': False, 'export_regions': False},
+])
+def test_complete_run_marks_converted(make_converter, dfsu_file, output_settings):
+    converter = make_converter({'probes': {'points': {'A': [2.3, 3.4]}}, 'output_settings': output_settings,
+                                'time_settings': {'time_index': 0}})
+    result = converter.process_single_file(dfsu_file)
+    assert result['success'] and result['full_field'] is not False
+    assert converter.header_index().is_converted(dfsu_file, converter.config_signature())
+
+
+def test_changed_file_is_not_converted(make_converter, dfsu_file, tmp_path):
+    import shutil
+
+    from conftest import write_dfsu
+
+    copy = shutil.copy(dfsu_file, tmp_path / "copy.dfsu")
+    converter = make_converter({'time_settings': {'time_index': 0}})
+    assert converter.process_single_file(copy)['success']
+    index, signature = converter.header_index(), converter.config_signature()
+    assert index.is_converted(copy, signature)
+
+    write_dfsu(copy, n_steps=3)
+    assert not index.is_converted(copy, signature)
+    assert index.get(copy) is None
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""网格与 DXF 缓存：插值矩阵、梯度算子按输出精度区分，缓存的几何在线程间只读共用"""
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def mesh_converter(make_converter, dfsu_file):
+    mikeio = pytest.importorskip("mikeio")
+    converter = make_converter()
+    return converter, converter.get_mesh(mikeio.open(dfsu_file).geometry)
+
+
+def test_cached_operators_follow_output_dtype(mesh_converter):
+    converter, mesh = mesh_converter
+    xs, ys = np.linspace(0.5, 7.5, 5), np.linspace(0.5, 5.5, 4)
+    for dtype_name, dtype in (('float32', np.float32), ('float64', np.float64), ('float32', np.float32)):
+        converter.config['output_settings']['dtype'] = dtype_name
+        assert converter.node_interpolation(mesh)[2].dtype == dtype
+        assert all(g.dtype == dtype for g in converter.gradient_operator(mesh))
+        assert converter.grid_interpolation(mesh, xs, ys)[0].dtype == dtype
+
+
+def test_mesh_cache_is_bounded(make_converter, tmp_path):
+    from conftest import write_dfsu
+    mikeio = pytest.importorskip("mikeio")
+
+    converter = make_converter({'processing': {'mesh_cache_size': 2}})
+    geometries = [mikeio.open(write_dfsu(tmp_path / f"m{k}.dfsu", nx=4 + k, n_steps=3)).geometry for k in range(3)]
+    first = converter.get_mesh(geometries[0])
+    converter.get_mesh(geometries[1])
+    assert converter.get_mesh(geometries[0]) is first  # 最近使用，保留
+    converter.get_mesh(geometries[2])
+    assert len(converter._mesh_cache) == 2
+    assert converter.get_mesh(geometries[0]) is first
+    assert first['key'] in converter._mesh_cache and len(converter._mesh_cache) == 2
+
+
+def test_dxf_cache_drops_stale_versions(make_converter, tmp_path):
+    import os
+
+    converter = make_converter()
+    probe_csv = tmp_path / "probes.csv"
+    for k in range(3):
+        probe_csv.write_text(f"name,x,y\nA,{k}.5,1.5\n", encoding='utf-8')
+        os.utime(probe_csv, (1000 + k, 1000 + k))
+        converter.config['probes'] = {'csv': str(probe_csv)}
+        _, xy = converter.load_probes()
+        assert xy[0, 0] == k + 0.5
+    assert len(converter._dxf_cache) == 1
+
+
+def test_label_regions_does_not_prepare_shared_polygons(mesh_converter):
+    shapely = pytest.importorskip("shapely")
+    if not hasattr(shapely, 'prepare'):
+        pytest.skip("shapely < 2.0")
+    converter, mesh = mesh_converter
+    polygon = shapely.box(1.2, 0.8, 6.4, 4.3)
+    labels = converter.label_regions(mesh, {'a': polygon})['a']
+    assert not shapely.is_prepared(polygon)
+    inside = shapely.contains_xy(polygon, mesh['elem_xy'][:, 0], mesh['elem_xy'][:, 1])
+    assert labels.tolist() == np.flatnonzero(inside).tolist()
+
+
+def test_cached_region_polygons_are_prepared_once(make_converter, tmp_path):
+    shapely = pytest.importorskip("shapely")
+    ezdxf = pytest.importorskip("ezdxf")
+    if not hasattr(shapely, 'prepare'):
+        pytest.skip("shapely < 2.0")
+    doc = ezdxf.new()
+    doc.modelspace().add_lwpolyline([(0, 0), (4, 0), (4, 3), (0, 3)], close=True)
+    doc.saveas(tmp_path / "region.dxf")
+
+    converter = make_converter()
+    polygon = converter.load_closed_polyline(tmp_path / "region.dxf")
+    assert shapely.is_prepared(polygon)
+    assert converter.load_closed_polyline(tmp_path / "region.dxf") is polygon
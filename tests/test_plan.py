@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""资源预估（--plan）"""
+
+import pytest
+
+
+@pytest.mark.parametrize("clip", [{}, {'dxf': None}, {'description': '未设置范围'}])
+def test_plan_ignores_clip_without_range(make_converter, dfsu_file, clip):
+    plan = make_converter({'output_settings': {'clip': clip}}).plan([str(dfsu_file)])
+    full = make_converter().plan([str(dfsu_file)])
+    assert [f['output_bytes'] for f in plan['files']] == [f['output_bytes'] for f in full['files']]
+
+
+def test_plan_clip_box_reduces_output(make_converter, dfsu_file):
+    clipped = make_converter({'output_settings': {'clip': {'box': [0, 0, 4, 3]}}}).plan([str(dfsu_file)])
+    full = make_converter().plan([str(dfsu_file)])
+    assert 0 < clipped['output_bytes'] < full['output_bytes']
+
+
+def test_plan_memory_counts_chunked_reads(make_converter, dfsu_file):
+    def memory(overrides):
+        return make_converter(overrides).plan([str(dfsu_file)])['files'][0]['memory']
+
+    # 逐块读取时只有一块时间步同时在内存中
+    assert memory({'processing': {'checkpoint_steps': 2}}) < memory({'processing': {'checkpoint_steps': 6}})
+    assert memory({'processing': {'checkpoint_steps': 6}}) == memory({'processing': {'checkpoint_steps': 60}})
+    # 测点需要完整时间序列，整体读取
+    probes = {'probes': {'points': {'A': [3.3, 2.4]}}}
+    assert (memory({**probes, 'processing': {'checkpoint_steps': 2}})
+            == memory({**probes, 'processing': {'checkpoint_steps': 6}}))
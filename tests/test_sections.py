@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""断面线与网格的相交几何"""
+
+import numpy as np
+import pytest
+
+shapely_geometry = pytest.importorskip("shapely.geometry")
+
+
+@pytest.mark.parametrize("points", [
+    [(0.3, 0.2), (3.7, 4.1), (7.6, 1.3)],
+    [(0.5, 5.5), (1.2, 0.4), (4.45, 3.35), (6.9, 0.2), (7.7, 5.1)],
+])
+def test_bent_section_discharge(make_converter, dfsu_file, points):
+    mikeio = pytest.importorskip("mikeio")
+    converter = make_converter()
+    mesh = converter.get_mesh(mikeio.open(dfsu_file).geometry)
+    line = shapely_geometry.LineString(points)
+    section = converter.section_geometry(mesh, line)
+
+    np.testing.assert_allclose(section['length'].sum(), line.length, rtol=1e-9)
+    # 均匀流 (u, v) 穿过断面的单宽流量 ∫(u·n)ds = -u·Δy + v·Δx，与折线形状无关
+    u, v = 1.0, 0.5
+    discharge = (u * section['normal'][:, 0] + v * section['normal'][:, 1]) @ section['length']
+    (x0, y0), (x1, y1) = points[0], points[-1]
+    np.testing.assert_allclose(discharge, -u * (y1 - y0) + v * (x1 - x0), rtol=1e-9)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""只读取部分单元（测点、裁剪）时的输出必须与读取完整网格一致"""
+
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+PROBES = {'points': {'A': [2.3, 3.4], 'B': [6.6, 1.2], 'C': [4.1, 4.9]}}
+
+
+def _probe_table(make_converter, dfsu_file, output_name, overrides):
+    converter = make_converter(overrides, output_name)
+    result = converter.process_single_file(dfsu_file)
+    assert result['success'], result
+    out_dir = converter.config['paths']['output_dir']
+    return pq.read_table(f"{out_dir}/{dfsu_file.stem}/{dfsu_file.stem}_probes.parquet").to_pandas()
+
+
+@pytest.mark.parametrize("variables, expressions", [
+    (['u', 'v', 'velocity'], {}),
+    (['u', 'vorticity', 'divergence'], {}),
+    (['u', 'curl2'], {'curl2': 'vorticity * 2'}),
+])
+def test_probe_subset_matches_full_read(make_converter, dfsu_file, variables, expressions):
+    base = {'probes': PROBES, 'derived_variables': expressions,
+            'output_settings': {'format': 'parquet', 'variables': variables}}
+    subset = _probe_table(make_converter, dfsu_file, 'subset',
+                          {**base, 'output_settings': {**base['output_settings'], 'export_full_field': False}})
+    full = _probe_table(make_converter, dfsu_file, 'full', base)
+
+    assert list(subset.columns) == list(full.columns)
+    for name in variables:
+        np.testing.assert_allclose(subset[name].to_numpy(), full[name].to_numpy(), rtol=1e-6)
+    if 'vorticity' in variables:
+        assert np.abs(full['vorticity']).max() > 1e-3
+
+
+@pytest.mark.parametrize("time_settings", [{'time_index': None}, {'time_index': 2}])
+def test_single_probe_subset_matches_full_read(make_converter, dfsu_file, time_settings):
+    base = {'probes': {'points': {'A': [2.3, 3.4]}}, 'time_settings': time_settings,
+            'output_settings': {'format': 'parquet'}}
+    subset = _probe_table(make_converter, dfsu_file, 'subset',
+                          {**base, 'output_settings': {'format': 'parquet', 'export_full_field': False}})
+    full = _probe_table(make_converter, dfsu_file, 'full', base)
+    assert len(subset) == (1 if time_settings['time_index'] is not None else 6)
+    np.testing.assert_allclose(subset['u'].to_numpy(), full['u'].to_numpy(), rtol=1e-6)
+
+
+def test_probe_subset_skipped_for_mesh_variables(make_converter, dfsu_file):
+    converter = make_converter({'probes': PROBES, 'output_settings': {'variables': ['u', 'vorticity']}})
+    item_names = ['U velocity', 'V velocity', 'Total water depth']
+    assert converter._uses_mesh(item_names)
+    converter.config['output_settings']['variables'] = ['u', 'velocity', 'froude']
+    assert not converter._uses_mesh(item_names)
+    assert converter._uses_mesh(['U velocity', 'V velocity', 'Surface elevation'])
+
+
+def _write_line_dxf(path, points):
+    import ezdxf
+
+    doc = ezdxf.new()
+    doc.modelspace().add_lwpolyline(points)
+    doc.saveas(path)
+    return path
+
+
+def _outputs(converter, dfsu_file, pattern):
+    result = converter.process_single_file(dfsu_file)
+    assert result['success'], result
+    out_dir = converter.config['paths']['output_dir']
+    return {p.name: p.read_bytes() for p in sorted((Path(out_dir) / dfsu_file.stem).glob(pattern))}
+
+
+def test_probe_subset_keeps_sections(make_converter, dfsu_file, tmp_path):
+    pytest.importorskip("ezdxf")
+    line = _write_line_dxf(tmp_path / "section.dxf", [(1.5, 0.5), (1.5, 5.5)])
+    base = {'probes': PROBES, 'cross_sections': {'S1': {'line_dxf': str(line)}}}
+    subset = _outputs(make_converter({**base, 'output_settings': {'export_full_field': False}}, 'subset'),
+                      dfsu_file, '*discharge*')
+    full = _outputs(make_converter(base, 'full'), dfsu_file, '*discharge*')
+    assert subset and subset == full
+
+
+def test_probe_subset_keeps_grids(make_converter, dfsu_file):
+    base = {'probes': PROBES, 'grids': {'G': {'spacing': 0.5, 'extent': [0, 0, 8, 6]}}}
+    subset = _outputs(make_converter({**base, 'output_settings': {'export_full_field': False}}, 'subset'),
+                      dfsu_file, '*_G*')
+    full = _outputs(make_converter(base, 'full'), dfsu_file, '*_G*')
+    assert subset and subset == full
+
+
+@pytest.mark.parametrize("mode", ['points', 'cellcentered', 'nodes'])
+def test_clip_subset_keeps_original_ids(make_converter, dfsu_file, mode):
+    base = {'output_settings': {'format': 'parquet', 'full_field_mode': mode, 'clip': {'box': [2.2, 1.1, 6.4, 4.6]}},
+            'time_settings': {'time_index': 1}}
+    subset_converter = make_converter(base, 'subset')
+    subset = _outputs(subset_converter, dfsu_file, '*allfield*.parquet')
+    # 配置测点后不再只读取裁剪范围，作为完整读取的对照
+    full = _outputs(make_converter({**base, 'probes': PROBES}, 'full'), dfsu_file, '*allfield*.parquet')
+    assert subset.keys() == full.keys() == {'case_allfield.parquet'}
+
+    subset_table = pq.read_table(io.BytesIO(subset['case_allfield.parquet'])).to_pandas()
+    full_table = pq.read_table(io.BytesIO(full['case_allfield.parquet'])).to_pandas()
+    id_name = 'node_id' if mode == 'nodes' else 'element_id'
+    assert subset_table[id_name].min() > 0
+    for column in subset_table.columns:
+        np.testing.assert_allclose(subset_table[column].to_numpy(dtype=float),
+                                   full_table[column].to_numpy(dtype=float), rtol=1e-6)
+
+
+@pytest.mark.parametrize("mode", ['points', 'cellcentered'])
+@pytest.mark.parametrize("extra", [{}, {'probes': PROBES}], ids=['subset-read', 'full-read'])
+def test_clip_subset_mesh_variables_match_unclipped(make_converter, dfsu_file, mode, extra):
+    settings = {'format': 'parquet', 'full_field_mode': mode, 'variables': ['u', 'vorticity', 'divergence']}
+    base = {'output_settings': settings, 'time_settings': {'time_index': 1}}
+    clipped = _outputs(make_converter({**base, **extra, 'output_settings': {
+        **settings, 'clip': {'box': [2.2, 1.1, 6.4, 4.6]}}}, 'clipped'), dfsu_file, '*allfield*.parquet')
+    unclipped = _outputs(make_converter(base, 'unclipped'), dfsu_file, '*allfield*.parquet')
+
+    clipped_table = pq.read_table(io.BytesIO(clipped['case_allfield.parquet'])).to_pandas()
+    unclipped_table = pq.read_table(io.BytesIO(unclipped['case_allfield.parquet'])).to_pandas()
+    expected = unclipped_table.set_index('element_id').loc[clipped_table['element_id']]
+    assert 0 < len(clipped_table) < len(unclipped_table)
+    for column in ('u', 'vorticity', 'divergence'):
+        np.testing.assert_allclose(clipped_table[column].to_numpy(dtype=float),
+                                   expected[column].to_numpy(dtype=float), rtol=1e-5, atol=1e-6)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""多时间步输出：XDMF / Parquet 每个输出一个时间序列文件"""
+
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+
+def _out_dir(converter, dfsu_file):
+    return Path(converter.config['paths']['output_dir']) / dfsu_file.stem
+
+
+def test_xdmf_single_series_per_output(make_converter, dfsu_file):
+    h5py = pytest.importorskip("h5py")
+    converter = make_converter({'output_settings': {'format': ['xdmf', 'vtu']},
+                                'processing': {'checkpoint_steps': 4}})
+    assert converter.process_single_file(dfsu_file)['success']
+    out_dir = _out_dir(converter, dfsu_file)
+
+    assert [p.name for p in out_dir.glob('*.xmf')] == ['case_allfield.xmf']
+    assert len(list(out_dir.glob('case_allfield_t*.vtu'))) == 6
+    assert not list(out_dir.glob('*.part'))
+
+    root = ET.parse(out_dir / 'case_allfield.xmf').getroot()
+    times = [float(t.get('Value')) for t in root.iter('Time')]
+    assert times == [3600.0 * k for k in range(6)]
+    with h5py.File(out_dir / 'case_allfield.h5', 'r') as h5:
+        assert h5['geometry'].shape[1] == 2
+        assert sorted(h5['u']) == [f'{k:06d}' for k in range(6)]
+
+
+def test_parquet_single_series_per_output(make_converter, dfsu_file):
+    pq = pytest.importorskip("pyarrow.parquet")
+    converter = make_converter({'output_settings': {'format': 'parquet'},
+                                'processing': {'checkpoint_steps': 4}})
+    assert converter.process_single_file(dfsu_file)['success']
+    out_dir = _out_dir(converter, dfsu_file)
+
+    assert [p.name for p in out_dir.glob('*.parquet')] == ['case_allfield.parquet']
+    parquet_file = pq.ParquetFile(out_dir / 'case_allfield.parquet')
+    assert parquet_file.metadata.num_row_groups == 2
+    table = parquet_file.read().to_pandas()
+    assert table['time'].nunique() == 6
+    assert (table.groupby('time')['element_id'].apply(list).map(len) == 96).all()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""坐标变换：旋转、重投影时 u/v 分量随坐标一起变换"""
+
+import io
+
+import numpy as np
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _full_field(make_converter, dfsu_file, output_name, transform):
+    converter = make_converter({'coordinate_transform': transform, 'time_settings': {'time_index': 0},
+                                'output_settings': {'format': 'parquet'}}, output_name)
+    assert converter.process_single_file(dfsu_file)['success']
+    out_path = converter.config['paths']['output_dir'] + f"/{dfsu_file.stem}/{dfsu_file.stem}_allfield.parquet"
+    with open(out_path, 'rb') as f:
+        return pq.read_table(io.BytesIO(f.read())).to_pandas()
+
+
+def test_rotation_rotates_velocity_components(make_converter, dfsu_file):
+    model = _full_field(make_converter, dfsu_file, 'model', {})
+    rotated = _full_field(make_converter, dfsu_file, 'rotated', {'rotation': 90})
+
+    np.testing.assert_allclose(rotated['X'], -model['Y'], atol=1e-9)
+    np.testing.assert_allclose(rotated['Y'], model['X'], atol=1e-9)
+    np.testing.assert_allclose(rotated['u'], -model['v'], atol=1e-6)
+    np.testing.assert_allclose(rotated['v'], model['u'], atol=1e-6)
+    np.testing.assert_allclose(rotated['velocity'], model['velocity'])
+
+
+def test_reprojection_rotates_by_meridian_convergence(make_converter):
+    pyproj = pytest.importorskip("pyproj")
+    converter = make_converter({'coordinate_transform': {'source_crs': 'EPSG:32650', 'target_crs': 'EPSG:4326'}})
+    lon, lat = np.array([119.5, 115.2, 117.0]), np.array([30.0, 45.0, 20.0])
+    xy = np.column_stack(pyproj.Transformer.from_crs('EPSG:4326', 'EPSG:32650', always_xy=True).transform(lon, lat))
+
+    # 中央经线以东网格北偏向真北以东，模型坐标系中的矢量需顺时针旋转收敛角
+    convergence = pyproj.Proj('EPSG:32650').get_factors(lon, lat).meridian_convergence
+    np.testing.assert_allclose(np.rad2deg(converter.vector_rotation(xy)), -convergence, rtol=1e-2, atol=1e-6)
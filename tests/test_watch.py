@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""监视模式：转换失败的文件按退避间隔重试"""
+
+import shutil
+import threading
+import time
+
+
+def test_failed_file_is_retried(make_converter, dfsu_file, tmp_path):
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    shutil.copy(dfsu_file, watch_dir / dfsu_file.name)
+    converter = make_converter({'watch': {'poll_interval': 0.02, 'settle_seconds': 0, 'metrics_interval': 60,
+                                          'process_existing': True, 'retry_seconds': 0.2}})
+
+    calls = []
+
+    def process_single_file(dfsu_path):
+        calls.append(time.monotonic())
+        # 第一次模拟文件仍被占用
+        return {'file': dfsu_path.name, 'success': len(calls) > 1}
+    converter.process_single_file = process_single_file
+
+    stop = threading.Event()
+    thread = threading.Thread(target=lambda: converter.watch(str(watch_dir), stop))
+    thread.start()
+    deadline = time.monotonic() + 10
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    time.sleep(0.3)
+    stop.set()
+    thread.join()
+
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
+    metrics = converter.watch_metrics()
+    assert (metrics['failed'], metrics['completed']) == (1, 1)